@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, send_file
 from flask_cors import CORS
 import joblib
 import numpy as np
@@ -9,6 +9,21 @@ import os
 from datetime import datetime, timedelta
 import jwt
 from functools import wraps
+from db import DB_CONFIG, get_db_connection
+from risk_summary import USER_RISK_SUMMARY_DDL, record_assessment, record_symptom_log, fetch_summary
+from partitions import (PARTITIONED_TABLE_DDL, ensure_partitions, insert_partitioned, maintain_partitions,
+                        history_window)
+from feature_store import (STORE_RAW_INPUT, ensure_feature_store, model_version,
+                           register_model_version, feature_vector, vector_to_inputs,
+                           insert_prediction, VECTOR_SQL, JOIN_INPUTS_SQL)
+from exports import EXPORT_FORMATS, export_response, history_export_response
+from jobs import SCORE_JOBS_DDL, create_job, submit_job, job_status, job_result_path
+from feedback import PREDICTION_LABELS_DDL, parse_label, record_label
+from forest_scoring import coerce_features, compile_for_serving, score_row
+from sweep import sweep
+from risk_distribution import ProbabilityDistribution
+from similar_index import SimilarIndex, similar_cases
+from drift_monitor import DriftMonitor, drift_metrics
 
 app = Flask(__name__)
 # Allow CORS from localhost and network IP
@@ -20,25 +35,17 @@ CORS(app, supports_credentials=True, origins=[
 ])
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your-secret-key-change-this')
 
-# Database configuration
-DB_CONFIG = {
-    'host': os.environ.get('DB_HOST', 'localhost'),
-    'database': os.environ.get('DB_NAME', 'pcos_db'),
-    'user': os.environ.get('DB_USER', 'postgres'),
-    'password': os.environ.get('DB_PASSWORD', 'postgres'),
-    'port': os.environ.get('DB_PORT', '5432')
-}
-
 # Load model, scaler, and feature names
 try:
     model = joblib.load("pcos_model.pkl")
     scaler = joblib.load("pcos_scaler.pkl")
     feature_names = joblib.load("feature_names.pkl")
+    clinical_model_version = model_version('clinical', "pcos_model.pkl")
     print(f"✅ Clinical model loaded successfully with features: {feature_names}")
 except FileNotFoundError as e:
     print(f"❌ Error loading clinical model files: {e}")
     print("Please run train_model.py first to train the model.")
-    model, scaler, feature_names = None, None, None
+    model, scaler, feature_names, clinical_model_version = None, None, None, None
 
 # Load lifestyle prediction model
 try:
@@ -51,14 +58,37 @@ except FileNotFoundError as e:
     print("Please run train_lifestyle_model.py first.")
     lifestyle_model, lifestyle_scaler, lifestyle_features = None, None, None
 
-def get_db_connection():
-    """Create a database connection"""
-    try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        return conn
-    except Exception as e:
-        print(f"Database connection error: {e}")
-        return None
+# Forest models are served from float32 compiled arrays (same split decisions
+# as sklearn for the same request values) and can also be scored with early exit
+# (?early_exit=1), which returns the risk band only and stores nothing
+clinical_compiled = compile_for_serving(model, scaler) if model is not None else None
+lifestyle_compiled = compile_for_serving(lifestyle_model, lifestyle_scaler) if lifestyle_model is not None else None
+# Unset: exact bound (same risk band as the full forest); e.g. 0.001 trades a
+# 0.1% chance of a different band for far fewer trees
+EARLY_EXIT_DELTA = float(os.environ['EARLY_EXIT_DELTA']) if os.environ.get('EARLY_EXIT_DELTA') else None
+
+
+def early_exit_requested():
+    return request.args.get('early_exit', '').lower() in ('1', 'true', 'yes')
+
+# Stored probabilities per model version, for the percentile of each prediction
+probability_distribution = ProbabilityDistribution(get_db_connection)
+
+# Top up the monthly partitions in every worker (init_db only runs under __main__)
+maintain_partitions(get_db_connection)
+
+# Nearest stored cases, memory-mapped from the index that similar_index.py
+# builds. Clinical only: this app stores lifestyle results in
+# lifestyle_predictions, which the index does not read.
+similar_indexes = {
+    'clinical': SimilarIndex('clinical', scaler, list(feature_names)) if scaler is not None else None,
+}
+
+# Per-feature histograms of the scored inputs, compared with the training data
+drift_monitors = {
+    'clinical': DriftMonitor('clinical') if model is not None else None,
+    'lifestyle': DriftMonitor('lifestyle') if lifestyle_model is not None else None,
+}
 
 def init_db():
     """Initialize database tables"""
@@ -82,18 +112,12 @@ def init_db():
             )
         """)
         
-        # Create predictions table
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS predictions (
-                id SERIAL PRIMARY KEY,
-                user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
-                prediction_result INTEGER NOT NULL,
-                probability FLOAT NOT NULL,
-                risk_level VARCHAR(50),
-                input_data JSONB,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
+        # Create model_versions and prediction_inputs (referenced by predictions)
+        ensure_feature_store(cur)
+        
+        # Create predictions table (partitioned by month on created_at)
+        cur.execute(PARTITIONED_TABLE_DDL['predictions'])
+        ensure_partitions(cur, 'predictions')
         
         # Create user_profiles table
         cur.execute("""
@@ -111,26 +135,9 @@ def init_db():
             )
         """)
         
-        # Create symptom_logs table
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS symptom_logs (
-                id SERIAL PRIMARY KEY,
-                user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
-                log_date DATE NOT NULL,
-                acne_severity INTEGER DEFAULT 0,
-                hirsutism_score INTEGER DEFAULT 0,
-                hair_loss_score INTEGER DEFAULT 0,
-                fatigue_level INTEGER DEFAULT 0,
-                mood_swings INTEGER DEFAULT 0,
-                anxiety_level INTEGER DEFAULT 0,
-                sleep_quality INTEGER DEFAULT 5,
-                food_cravings INTEGER DEFAULT 0,
-                bloating INTEGER DEFAULT 0,
-                period_flow VARCHAR(20),
-                period_active BOOLEAN DEFAULT FALSE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
+        # Create symptom_logs table (partitioned by month on log_date)
+        cur.execute(PARTITIONED_TABLE_DDL['symptom_logs'])
+        ensure_partitions(cur, 'symptom_logs')
         
         # Create lifestyle_predictions table
         cur.execute("""
@@ -148,6 +155,18 @@ def init_db():
             )
         """)
         
+        # Create user_risk_summary table (one row per user, updated on write)
+        cur.execute(USER_RISK_SUMMARY_DDL)
+        
+        # Create score_jobs table (background batch scoring)
+        cur.execute(SCORE_JOBS_DDL)
+        
+        # Create prediction_labels table (confirmed diagnoses for stored predictions)
+        cur.execute(PREDICTION_LABELS_DDL)
+        
+        if clinical_model_version:
+            register_model_version(cur, clinical_model_version, 'clinical', feature_names)
+        
         conn.commit()
         print("✅ Database tables initialized successfully")
         return True
@@ -382,22 +401,32 @@ def predict(current_user_id):
         if not data:
             return jsonify({"error": "No data provided"}), 400
         
-        # Extract features in the correct order
+        # Extract features in the correct order, as one row
         try:
-            features_array = np.array([[data[feature] for feature in feature_names]])
+            features_array = coerce_features([data[feature] for feature in feature_names], feature_names)
         except KeyError as e:
             missing_feature = str(e).strip("'")
             return jsonify({
                 "error": f"Missing required feature: {missing_feature}",
-                "required_features": feature_names.tolist()
+                "required_features": list(feature_names)
             }), 400
-        
-        # Scale the features
-        features_scaled = scaler.transform(features_array)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        drift_monitors['clinical'].observe(features_array)
         
         # Make prediction
-        prediction = model.predict(features_scaled)[0]
-        probabilities = model.predict_proba(features_scaled)[0]
+        early_exit = clinical_compiled is not None and early_exit_requested()
+        prediction, probabilities, details = score_row(
+            model, scaler, features_array, clinical_compiled, early_exit, EARLY_EXIT_DELTA)
+        if early_exit:
+            # Only the band is exact, so there is no probability to return or store
+            return jsonify({
+                "prediction_id": None,
+                "risk_level": details['risk_level'],
+                "trees_evaluated": details['trees_evaluated'],
+                "early_exit": True,
+                "input_features": data
+            })
         
         # Calculate risk level
         pcos_probability = probabilities[1]
@@ -408,39 +437,93 @@ def predict(current_user_id):
         else:
             risk_level = "High"
         
+        # Rank among the predictions stored before this one
+        percentile = probability_distribution.percentile(clinical_model_version, pcos_probability)
+        
         # Save prediction to database
+        prediction_id = None
         conn = get_db_connection()
         if conn:
             try:
                 cur = conn.cursor()
-                cur.execute(
-                    """INSERT INTO predictions 
-                       (user_id, prediction_result, probability, risk_level, input_data) 
-                       VALUES (%s, %s, %s, %s, %s)""",
-                    (current_user_id, int(prediction), float(pcos_probability), risk_level, 
-                     psycopg2.extras.Json(data))
-                )
+                prediction_id = insert_prediction(cur, current_user_id, prediction, pcos_probability, risk_level,
+                                  feature_vector(data, feature_names), clinical_model_version, 'clinical',
+                                  psycopg2.extras.Json(data) if STORE_RAW_INPUT else None)
+                record_assessment(cur, current_user_id, pcos_probability, risk_level, 'clinical')
                 conn.commit()
                 cur.close()
                 conn.close()
+                probability_distribution.add(clinical_model_version, pcos_probability)
             except Exception as e:
                 print(f"Error saving prediction: {e}")
         
-        return jsonify({
+        result = {
+            "prediction_id": prediction_id,
             "pcos_risk": int(prediction),
             "probability": round(pcos_probability, 3),
             "healthy_probability": round(probabilities[0], 3),
             "risk_level": risk_level,
             "prediction_text": "PCOS Likely" if prediction == 1 else "Healthy",
             "confidence": round(max(probabilities), 3),
+            "percentile": percentile,
             "input_features": data
-        })
+        }
+        # Spread of the per-tree votes (forests; not with early exit)
+        if 'uncertainty' in details:
+            result["uncertainty"] = details['uncertainty']
+        return jsonify(result)
         
     except Exception as e:
         return jsonify({
             "error": f"Prediction failed: {str(e)}"
         }), 500
 
+@app.route("/predict/sweep", methods=["POST"])
+@token_required
+def predict_sweep(current_user_id):
+    """Risk over a grid of one or two features around a base profile (nothing is stored)"""
+    data = request.json or {}
+    model_type = data.get('model', 'clinical')
+    models = {
+        'clinical': (model, scaler, feature_names),
+        'lifestyle': (lifestyle_model, lifestyle_scaler, lifestyle_features),
+    }
+    if model_type not in models:
+        return jsonify({'error': "model must be 'clinical' or 'lifestyle'"}), 400
+    sweep_model, sweep_scaler, sweep_features = models[model_type]
+    if sweep_model is None:
+        return jsonify({'error': f'{model_type.capitalize()} model not loaded. Please train the model first.'}), 500
+    
+    try:
+        result = sweep(sweep_model, sweep_scaler, list(sweep_features), data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Sweep failed: {str(e)}'}), 500
+    return jsonify({'model': model_type, **result})
+
+@app.route("/predict/similar", methods=["POST"])
+@token_required
+def predict_similar(current_user_id):
+    """The most similar stored cases and their outcomes (anonymized, nothing is stored)"""
+    data = request.json or {}
+    model_type = data.get('model', 'clinical')
+    models = {'clinical': feature_names}
+    if model_type not in models:
+        return jsonify({'error': "model must be 'clinical' (lifestyle similar cases are only served by app_with_auth.py)"}), 400
+    if similar_indexes[model_type] is None:
+        return jsonify({'error': f'{model_type.capitalize()} model not loaded. Please train the model first.'}), 500
+    
+    try:
+        result = similar_cases(similar_indexes[model_type], list(models[model_type]), data)
+    except ValueError as e:
+        return jsonify({'error': str(e), 'required_features': list(models[model_type])}), 400
+    except Exception as e:
+        return jsonify({'error': f'Similar-case lookup failed: {str(e)}'}), 500
+    if result is None:
+        return jsonify({'error': f'No {model_type} similar-case index yet. Run similar_index.py --model {model_type}'}), 503
+    return jsonify({'model': model_type, **result})
+
 @app.route("/features", methods=["GET"])
 def get_features():
     """Get the list of required features for prediction"""
@@ -482,6 +565,11 @@ def health_check():
 @token_required
 def get_prediction_history(current_user_id):
     """Get user's prediction history"""
+    # ?since=YYYY-MM-DD (default: the last 12 months) lets Postgres skip older monthly partitions
+    try:
+        since, limit = history_window(request.args, default_limit=20)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     try:
         conn = get_db_connection()
         if not conn:
@@ -500,25 +588,34 @@ def get_prediction_history(current_user_id):
         # Only select columns that exist
         if 'prediction_result' in columns:
             cur.execute(
-                """SELECT id, prediction_result, probability, risk_level, 
-                          input_data, created_at 
-                   FROM predictions 
-                   WHERE user_id = %s 
-                   ORDER BY created_at DESC 
-                   LIMIT 20""",
-                (current_user_id,)
+                f"""SELECT p.id, p.prediction_result, p.probability, p.risk_level, 
+                          p.input_data, {VECTOR_SQL} AS feature_vector, mv.feature_names, p.created_at 
+                   FROM predictions p
+                   {JOIN_INPUTS_SQL}
+                   LEFT JOIN model_versions mv ON mv.version = p.model_version
+                   WHERE p.user_id = %s AND p.created_at >= %s
+                   ORDER BY p.created_at DESC 
+                   LIMIT %s""",
+                (current_user_id, since, limit)
             )
         else:
             # If predictions table doesn't have the expected structure, return empty
             return jsonify({'predictions': []}), 200
         
-        predictions = cur.fetchall()
+        predictions = []
+        for row in cur.fetchall():
+            p = dict(row)
+            vector = p.pop('feature_vector')
+            names = p.pop('feature_names')
+            if p['input_data'] is None:
+                p['input_data'] = vector_to_inputs(names, vector)
+            predictions.append(p)
         
         cur.close()
         conn.close()
         
         return jsonify({
-            'predictions': [dict(p) for p in predictions]
+            'predictions': predictions
         }), 200
         
     except Exception as e:
@@ -546,43 +643,65 @@ def lifestyle_assessment(current_user_id):
         required_fields = lifestyle_features
         
         # Build feature array
-        feature_values = []
         for feature in lifestyle_features:
             if feature not in data:
                 return jsonify({
                     "error": f"Missing required field: {feature}",
                     "required_fields": lifestyle_features
                 }), 400
-            feature_values.append(float(data[feature]))
+        try:
+            features_array = coerce_features([data[feature] for feature in lifestyle_features], lifestyle_features)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        drift_monitors['lifestyle'].observe(features_array)
         
         # Scale features and predict
-        features_array = np.array([feature_values])
-        features_scaled = lifestyle_scaler.transform(features_array)
-        
-        prediction = lifestyle_model.predict(features_scaled)[0]
-        probabilities = lifestyle_model.predict_proba(features_scaled)[0]
-        
-        pcos_probability = probabilities[1]
-        
-        # Determine risk level
-        if pcos_probability < 0.3:
-            risk_level = "Low"
-        elif pcos_probability < 0.7:
-            risk_level = "Moderate"
+        early_exit = lifestyle_compiled is not None and early_exit_requested()
+        prediction, probabilities, details = score_row(
+            lifestyle_model, lifestyle_scaler, features_array, lifestyle_compiled, early_exit, EARLY_EXIT_DELTA,
+            explain=True)
+        contributions = details.get('contributions')
+        
+        # Determine risk level (early exit only settles the band)
+        if early_exit:
+            risk_level = details['risk_level']
         else:
-            risk_level = "High"
+            pcos_probability = probabilities[1]
+            if pcos_probability < 0.3:
+                risk_level = "Low"
+            elif pcos_probability < 0.7:
+                risk_level = "Moderate"
+            else:
+                risk_level = "High"
         
         # Generate risk factors breakdown
         risk_factors = {}
-        feature_importance = lifestyle_model.feature_importances_
+        # Forests expose importances; a linear model (streaming training) its |coefficients|
+        feature_importance = getattr(lifestyle_model, 'feature_importances_', None)
+        if feature_importance is None:
+            weights = np.abs(lifestyle_model.coef_[0])
+            feature_importance = weights / weights.sum()
         for i, feature in enumerate(lifestyle_features):
             risk_factors[feature] = {
                 "value": float(data[feature]),
                 "importance": float(feature_importance[i])
             }
+            # This user's share of the probability (forests, full evaluation)
+            if contributions is not None:
+                risk_factors[feature]["contribution"] = round(float(contributions[i]), 4)
         
         # Generate recommendations based on risk factors
         recommendations = generate_recommendations(data, risk_level)
+        if early_exit:
+            # No probability to return or store
+            return jsonify({
+                "risk_level": risk_level,
+                "risk_factors": risk_factors,
+                "recommendations": recommendations,
+                "trees_evaluated": details['trees_evaluated'],
+                "early_exit": True,
+                "input_features": data
+            })
         
         # Save to database
         conn = get_db_connection()
@@ -614,6 +733,7 @@ def lifestyle_assessment(current_user_id):
                 """, (current_user_id, float(pcos_probability), risk_level,
                       float(max(probabilities)), psycopg2.extras.Json(risk_factors),
                       psycopg2.extras.Json(recommendations), '1.0', 'lifestyle'))
+                record_assessment(cur, current_user_id, pcos_probability, risk_level, 'lifestyle')
                 
                 conn.commit()
                 cur.close()
@@ -621,7 +741,7 @@ def lifestyle_assessment(current_user_id):
             except Exception as e:
                 print(f"Error saving lifestyle prediction: {e}")
         
-        return jsonify({
+        result = {
             "pcos_risk": int(prediction),
             "probability": round(pcos_probability, 3),
             "healthy_probability": round(probabilities[0], 3),
@@ -631,7 +751,13 @@ def lifestyle_assessment(current_user_id):
             "risk_factors": risk_factors,
             "recommendations": recommendations,
             "input_features": data
-        })
+        }
+        if contributions is not None:
+            # probability = baseline_probability + sum of the contributions
+            result["baseline_probability"] = round(lifestyle_compiled[0].base_rate, 4)
+        if 'uncertainty' in details:
+            result["uncertainty"] = details['uncertainty']
+        return jsonify(result)
         
     except Exception as e:
         return jsonify({
@@ -728,12 +854,13 @@ def save_symptom_log(current_user_id):
     """Save daily symptom log"""
     try:
         data = request.json
+        log_date = data.get('date', datetime.now().date())
         conn = get_db_connection()
         if not conn:
             return jsonify({'error': 'Database connection failed'}), 500
         
         cur = conn.cursor()
-        cur.execute("""
+        insert_partitioned(cur, 'symptom_logs', """
             INSERT INTO symptom_logs 
             (user_id, log_date, acne_severity, hirsutism_score, hair_loss_score,
              fatigue_level, mood_swings, anxiety_level, sleep_quality, 
@@ -741,7 +868,7 @@ def save_symptom_log(current_user_id):
             VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
         """, (
             current_user_id,
-            data.get('date', datetime.now().date()),
+            log_date,
             data.get('acne', 0),
             data.get('hirsutism', 0),
             data.get('hairLoss', 0),
@@ -753,7 +880,8 @@ def save_symptom_log(current_user_id):
             data.get('bloating', 0),
             data.get('periodFlow', 'None'),
             data.get('periodActive', False)
-        ))
+        ), log_date)
+        record_symptom_log(cur, current_user_id, log_date)
         
         conn.commit()
         cur.close()
@@ -796,6 +924,193 @@ def get_lifestyle_prediction_history(current_user_id):
         return jsonify({'error': f'Failed to get history: {str(e)}'}), 500
 
 
+@app.route("/summary", methods=["GET"])
+@token_required
+def get_summary(current_user_id):
+    """Get the user's dashboard summary (single-row lookup)"""
+    try:
+        conn = get_db_connection()
+        if not conn:
+            return jsonify({'error': 'Database connection failed'}), 500
+        
+        cur = conn.cursor()
+        summary = fetch_summary(cur, current_user_id)
+        cur.close()
+        conn.close()
+        
+        return jsonify({'summary': summary}), 200
+        
+    except Exception as e:
+        return jsonify({'error': f'Failed to get summary: {str(e)}'}), 500
+
+@app.route("/stats/distribution", methods=["GET"])
+@token_required
+def get_distribution(current_user_id):
+    """Distribution of stored probabilities for a model version (default: the clinical model's)"""
+    version = request.args.get('model_version', clinical_model_version)
+    summary = probability_distribution.summary(version)
+    if summary is None:
+        return jsonify({'error': f'No stored predictions for model version {version}'}), 404
+    return jsonify(summary), 200
+
+@app.route("/metrics/drift", methods=["GET"])
+@token_required
+def get_drift(current_user_id):
+    """Drift of the scored inputs from the training data, per model (?model= for one)"""
+    try:
+        return jsonify(drift_metrics(drift_monitors, request.args.get('model'))), 200
+    except KeyError:
+        return jsonify({'error': "model must be 'clinical' or 'lifestyle'"}), 400
+
+
+SYMPTOM_LOG_EXPORT_COLUMNS = [
+    'id', 'log_date', 'acne_severity', 'hirsutism_score', 'hair_loss_score',
+    'fatigue_level', 'mood_swings', 'anxiety_level', 'sleep_quality',
+    'food_cravings', 'bloating', 'period_flow', 'period_active', 'created_at'
+]
+
+
+@app.route("/export/history", methods=["GET"])
+@token_required
+def export_history(current_user_id):
+    """Stream the user's full prediction history as NDJSON or CSV (?format=)"""
+    fmt = request.args.get('format', 'ndjson').lower()
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': f'Unsupported format, use one of {list(EXPORT_FORMATS)}'}), 400
+    
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'error': 'Database connection failed'}), 500
+    
+    return history_export_response(conn, current_user_id, fmt, request.args.get('since'))
+
+
+@app.route("/export/symptom-logs", methods=["GET"])
+@token_required
+def export_symptom_logs(current_user_id):
+    """Stream all of the user's symptom logs as NDJSON or CSV (?format=)"""
+    fmt = request.args.get('format', 'ndjson').lower()
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': f'Unsupported format, use one of {list(EXPORT_FORMATS)}'}), 400
+    
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'error': 'Database connection failed'}), 500
+    
+    return export_response(
+        conn,
+        f"SELECT {', '.join(SYMPTOM_LOG_EXPORT_COLUMNS)} FROM symptom_logs WHERE user_id = %s ORDER BY log_date",
+        (current_user_id,), SYMPTOM_LOG_EXPORT_COLUMNS, fmt, 'pcos_symptom_logs'
+    )
+
+
+@app.route("/jobs/score", methods=["POST"])
+@token_required
+def create_score_job(current_user_id):
+    """Queue a CSV file for background scoring; poll /jobs/<id> for progress"""
+    upload = request.files.get('file')
+    if upload is None:
+        return jsonify({'error': "No file uploaded (multipart field 'file')"}), 400
+    
+    try:
+        conn = get_db_connection()
+        if not conn:
+            return jsonify({'error': 'Database connection failed'}), 500
+        
+        cur = conn.cursor()
+        try:
+            job_id = create_job(cur, current_user_id, request.form.get('model', 'clinical'),
+                                upload, request.form.get('id_column'))
+        except ValueError as e:
+            conn.close()
+            return jsonify({'error': str(e)}), 400
+        conn.commit()
+        cur.close()
+        conn.close()
+        
+        submit_job(DB_CONFIG, job_id)
+        return jsonify({
+            'job_id': job_id,
+            'status': 'queued',
+            'status_url': f'/jobs/{job_id}'
+        }), 202
+        
+    except Exception as e:
+        return jsonify({'error': f'Failed to create job: {str(e)}'}), 500
+
+
+@app.route("/jobs/<int:job_id>", methods=["GET"])
+@token_required
+def get_score_job(current_user_id, job_id):
+    """Get the status and progress of a scoring job"""
+    try:
+        conn = get_db_connection()
+        if not conn:
+            return jsonify({'error': 'Database connection failed'}), 500
+        
+        cur = conn.cursor()
+        status = job_status(cur, current_user_id, job_id)
+        cur.close()
+        conn.close()
+        
+        if status is None:
+            return jsonify({'error': 'Job not found'}), 404
+        return jsonify(status), 200
+        
+    except Exception as e:
+        return jsonify({'error': f'Failed to get job: {str(e)}'}), 500
+
+
+@app.route("/jobs/<int:job_id>/result", methods=["GET"])
+@token_required
+def get_score_job_result(current_user_id, job_id):
+    """Download the scored CSV of a finished job"""
+    try:
+        conn = get_db_connection()
+        if not conn:
+            return jsonify({'error': 'Database connection failed'}), 500
+        
+        cur = conn.cursor()
+        path = job_result_path(cur, current_user_id, job_id)
+        cur.close()
+        conn.close()
+        
+    except Exception as e:
+        return jsonify({'error': f'Failed to get job: {str(e)}'}), 500
+    
+    if path is None or not os.path.exists(path):
+        return jsonify({'error': 'Result not available'}), 404
+    return send_file(path, mimetype='text/csv', as_attachment=True,
+                     download_name=f'score_job_{job_id}.csv')
+
+
+@app.route("/predictions/<int:prediction_id>/feedback", methods=["POST"])
+@token_required
+def submit_prediction_feedback(current_user_id, prediction_id):
+    """Record the confirmed diagnosis (label 0/1) for one of the user's predictions"""
+    label = parse_label(request.json or {})
+    if label is None:
+        return jsonify({'error': 'label must be 0 (no PCOS) or 1 (PCOS)'}), 400
+    
+    try:
+        conn = get_db_connection()
+        if not conn:
+            return jsonify({'error': 'Database connection failed'}), 500
+        
+        cur = conn.cursor()
+        label_id = record_label(cur, current_user_id, prediction_id, label)
+        conn.commit()
+        cur.close()
+        conn.close()
+        
+        if label_id is None:
+            return jsonify({'error': 'Prediction not found'}), 404
+        return jsonify({'prediction_id': prediction_id, 'label': label}), 200
+        
+    except Exception as e:
+        return jsonify({'error': f'Failed to save feedback: {str(e)}'}), 500
+
+
 if __name__ == "__main__":
     # Initialize database on startup
     init_db()
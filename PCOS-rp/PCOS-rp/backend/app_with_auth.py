@@ -1,15 +1,28 @@
 # app_with_auth.py
-from flask import Flask, request, jsonify, make_response, Response
+from flask import Flask, request, jsonify, make_response, Response, send_file
 from flask_cors import CORS
 import joblib
-import numpy as np
-import psycopg2
 from psycopg2.extras import RealDictCursor, Json
 from werkzeug.security import generate_password_hash, check_password_hash
 import os
 from datetime import datetime, timedelta
 import jwt
 from functools import wraps
+from db import DB_CONFIG, get_db_connection
+from risk_summary import USER_RISK_SUMMARY_DDL, record_assessment, record_symptom_log, fetch_summary
+from partitions import PARTITIONED_TABLE_DDL, ensure_partitions, history_window
+from feature_store import (STORE_RAW_INPUT, ensure_feature_store, model_version,
+                           register_model_version, feature_vector, vector_to_inputs,
+                           insert_prediction, VECTOR_SQL, JOIN_INPUTS_SQL, HISTORY_SQL,
+                           LIFESTYLE_RULES_VERSION)
+from exports import EXPORT_FORMATS, export_response, history_export_response
+from jobs import SCORE_JOBS_DDL, create_job, submit_job, job_status, job_result_path
+from feedback import PREDICTION_LABELS_DDL, parse_label, record_label
+from forest_scoring import coerce_features, compile_for_serving, score_row
+from sweep import sweep
+from risk_distribution import ProbabilityDistribution
+from similar_index import SimilarIndex, similar_cases
+from drift_monitor import DriftMonitor, drift_metrics
 
 # ---------------- APP ----------------
 # ---------------- APP ----------------
@@ -76,34 +89,10 @@ CORS(
 #         resp = make_response('', 200)
 #         return attach_cors_headers(resp)
 
-# ---------------- DATABASE CONFIG ----------------
-DB_CONFIG = {
-    'host': os.environ.get('DB_HOST', 'localhost'),
-    'database': os.environ.get('DB_NAME', 'pcos_db'),
-    'user': os.environ.get('DB_USER', 'postgres'),
-    'password': os.environ.get('DB_PASSWORD', 'postgres'),
-    'port': os.environ.get('DB_PORT', '5432')
-}
-
-DATABASE_URL = os.environ.get("DATABASE_URL")
-if DATABASE_URL:
-    try:
-        from urllib.parse import urlparse, unquote
-        url = urlparse(DATABASE_URL)
-        DB_CONFIG = {
-            'host': url.hostname,
-            'database': url.path.lstrip('/'),
-            'user': unquote(url.username) if url.username else None,
-            'password': unquote(url.password) if url.password else None,
-            'port': str(url.port) if url.port else '5432'
-        }
-        print("Using DATABASE_URL from env for DB connection")
-    except Exception as e:
-        print("Failed to parse DATABASE_URL:", e)
-
 # ---------------- MODEL LOADING ----------------
 model = scaler = None
 feature_names = []
+clinical_model_version = None
 
 try:
     model = joblib.load("pcos_model.pkl")
@@ -113,19 +102,52 @@ try:
         feature_names = feature_names.tolist()
     except Exception:
         feature_names = list(feature_names)
+    clinical_model_version = model_version("clinical", "pcos_model.pkl")
     print("✅ Model loaded with features:", feature_names)
 except Exception as e:
     print("❌ Failed to load model or features on startup:", e)
-    model, scaler, feature_names = None, None, []
+    model, scaler, feature_names, clinical_model_version = None, None, [], None
+
+# A forest is served from float32 compiled arrays; other models go through sklearn
+clinical_compiled = compile_for_serving(model, scaler) if model is not None else None
+
+# The lifestyle endpoint scores with the trained lifestyle model when it is
+# available and falls back to rules otherwise; inputs are stored in the
+# lifestyle model's feature order, rule results under LIFESTYLE_RULES_VERSION.
+try:
+    lifestyle_feature_names = list(joblib.load("lifestyle_features.pkl"))
+except Exception:
+    lifestyle_feature_names = ["BMI", "ExerciseFrequency", "Hirsutism"]
+
+lifestyle_model = lifestyle_scaler = lifestyle_compiled = lifestyle_model_version = None
+try:
+    lifestyle_model = joblib.load("lifestyle_pcos_model.pkl")
+    lifestyle_scaler = joblib.load("lifestyle_scaler.pkl")
+    lifestyle_model_version = model_version("lifestyle", "lifestyle_pcos_model.pkl")
+    lifestyle_compiled = compile_for_serving(lifestyle_model, lifestyle_scaler)
+    print("✅ Lifestyle model loaded")
+except Exception as e:
+    print("⚠️ Lifestyle model not loaded, using rule-based assessment:", e)
+    lifestyle_model = lifestyle_scaler = lifestyle_compiled = lifestyle_model_version = None
 
 # ---------------- DB HELPERS ----------------
-def get_db_connection():
-    try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        return conn
-    except Exception as e:
-        print("❌ Database connection error:", e)
-        return None
+
+# Stored probabilities per model version, for the percentile of each prediction
+probability_distribution = ProbabilityDistribution(get_db_connection)
+
+# Nearest stored cases per model type, memory-mapped from the index that
+# similar_index.py builds
+similar_indexes = {
+    "clinical": SimilarIndex("clinical", scaler, list(feature_names)) if scaler is not None else None,
+    "lifestyle": (SimilarIndex("lifestyle", lifestyle_scaler, list(lifestyle_feature_names))
+                  if lifestyle_scaler is not None else None),
+}
+
+# Per-feature histograms of the scored inputs, compared with the training data
+drift_monitors = {
+    "clinical": DriftMonitor("clinical") if model is not None else None,
+    "lifestyle": DriftMonitor("lifestyle") if lifestyle_model is not None else None,
+}
 
 def init_db():
     conn = get_db_connection()
@@ -145,17 +167,19 @@ def init_db():
                 last_login TIMESTAMP
             )
         """)
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS predictions (
-                id SERIAL PRIMARY KEY,
-                user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
-                prediction_result INTEGER NOT NULL,
-                probability FLOAT NOT NULL,
-                risk_level VARCHAR(50),
-                input_data JSONB,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
+        # model_versions and prediction_inputs first: predictions references them
+        ensure_feature_store(cur)
+        # predictions is partitioned by month on created_at (see partitions.py)
+        cur.execute(PARTITIONED_TABLE_DDL['predictions'])
+        ensure_partitions(cur, 'predictions')
+        cur.execute(USER_RISK_SUMMARY_DDL)
+        cur.execute(SCORE_JOBS_DDL)
+        cur.execute(PREDICTION_LABELS_DDL)
+        if clinical_model_version:
+            register_model_version(cur, clinical_model_version, "clinical", feature_names)
+        register_model_version(cur, LIFESTYLE_RULES_VERSION, "lifestyle", lifestyle_feature_names)
+        if lifestyle_model_version:
+            register_model_version(cur, lifestyle_model_version, "lifestyle", lifestyle_feature_names)
         conn.commit()
         print("✅ Database ready (tables ensured)")
     except Exception as e:
@@ -354,10 +378,12 @@ def predict(user_id):
         missing = str(e)
         return jsonify({"error": f"Missing feature: {missing}"}), 400
 
-    X = np.array([values])
-    X_scaled = scaler.transform(X)
-    pred = model.predict(X_scaled)[0]
-    probs = model.predict_proba(X_scaled)[0]
+    try:
+        X = coerce_features(values, feature_names)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    drift_monitors["clinical"].observe(X)
+    pred, probs, details = score_row(model, scaler, X, clinical_compiled)
     p_pcos = float(probs[1])
 
     if p_pcos < 0.3:
@@ -367,38 +393,101 @@ def predict(user_id):
     else:
         risk = "High"
 
+    # Rank among the predictions stored before this one
+    percentile = probability_distribution.percentile(clinical_model_version, p_pcos)
+
+    prediction_id = None
     conn = get_db_connection()
     if conn:
         try:
             cur = conn.cursor()
-            cur.execute(
-                """INSERT INTO predictions (user_id, prediction_result, probability, risk_level, input_data)
-                   VALUES (%s, %s, %s, %s, %s)""",
-                (user_id, int(pred), float(p_pcos), risk, Json(data))
-            )
+            prediction_id = insert_prediction(cur, user_id, pred, p_pcos, risk,
+                              feature_vector(data, feature_names), clinical_model_version, 'clinical',
+                              Json(data) if STORE_RAW_INPUT else None)
+            record_assessment(cur, user_id, p_pcos, risk, 'clinical')
             conn.commit()
             cur.close()
             conn.close()
+            probability_distribution.add(clinical_model_version, p_pcos)
         except Exception as e:
             print(f"Error saving prediction: {e}")
 
-    return jsonify({
+    result = {
+        "prediction_id": prediction_id,
         "pcos_risk": int(pred),
         "probability": round(p_pcos, 3),
         "risk_level": risk,
+        "percentile": percentile,
         "input": data
-    })
+    }
+    # Spread of the per-tree votes when the clinical model is a forest
+    if "uncertainty" in details:
+        result["uncertainty"] = details["uncertainty"]
+    return jsonify(result)
+
+@app.route("/predict/sweep", methods=["POST"])
+@token_required
+def predict_sweep(user_id):
+    """Risk over a grid of one or two features around a base profile (nothing is stored)"""
+    data = request.json or {}
+    model_type = data.get("model", "clinical")
+    models = {
+        "clinical": (model, scaler, feature_names),
+        "lifestyle": (lifestyle_model, lifestyle_scaler, lifestyle_feature_names),
+    }
+    if model_type not in models:
+        return jsonify({"error": "model must be 'clinical' or 'lifestyle'"}), 400
+    sweep_model, sweep_scaler, sweep_features = models[model_type]
+    if sweep_model is None:
+        return jsonify({"error": f"{model_type.capitalize()} model not loaded"}), 500
+
+    try:
+        result = sweep(sweep_model, sweep_scaler, sweep_features, data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print("Sweep error:", e)
+        return jsonify({"error": "Sweep failed"}), 500
+    return jsonify({"model": model_type, **result})
+
+@app.route("/predict/similar", methods=["POST"])
+@token_required
+def predict_similar(user_id):
+    """The most similar stored cases and their outcomes (anonymized, nothing is stored)"""
+    data = request.json or {}
+    model_type = data.get("model", "clinical")
+    models = {"clinical": feature_names, "lifestyle": lifestyle_feature_names}
+    if model_type not in models:
+        return jsonify({"error": "model must be 'clinical' or 'lifestyle'"}), 400
+    if similar_indexes[model_type] is None:
+        return jsonify({"error": f"{model_type.capitalize()} model not loaded"}), 500
+
+    try:
+        result = similar_cases(similar_indexes[model_type], list(models[model_type]), data)
+    except ValueError as e:
+        return jsonify({"error": str(e), "required_features": list(models[model_type])}), 400
+    except Exception as e:
+        print("Similar-case lookup error:", e)
+        return jsonify({"error": "Similar-case lookup failed"}), 500
+    if result is None:
+        return jsonify({"error": f"No {model_type} similar-case index yet"}), 503
+    return jsonify({"model": model_type, **result})
 
 @app.route("/predictions/history", methods=["GET"])
 @token_required
 def history(user_id):
+    # ?since=YYYY-MM-DD (default: the last 12 months) lets Postgres skip older monthly partitions
+    try:
+        since, limit = history_window(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     conn = get_db_connection()
     if not conn:
         return jsonify({'error': 'Database connection failed'}), 500
 
     try:
         cur = conn.cursor(cursor_factory=RealDictCursor)
-        cur.execute("SELECT * FROM predictions WHERE user_id=%s ORDER BY created_at DESC", (user_id,))
+        cur.execute(HISTORY_SQL, (user_id, since, limit))
         rows = cur.fetchall()
         cur.close()
         conn.close()
@@ -406,7 +495,17 @@ def history(user_id):
         print("History DB error:", e)
         return jsonify({'error': 'Failed to fetch history'}), 500
 
-    return jsonify({"history": rows})
+    history_rows = []
+    for r in rows:
+        r = dict(r)
+        names = r.pop("feature_names", None)
+        r.pop("feature_vector", None)
+        vector = r.pop("stored_vector", None)
+        if r.get("input_data") is None:
+            r["input_data"] = vector_to_inputs(names, vector)
+        history_rows.append(r)
+
+    return jsonify({"history": history_rows})
 
 @app.route("/features", methods=["GET"])
 def get_features():
@@ -457,6 +556,20 @@ except Exception as e:
     print("Warning: ensure_symptom_logs_table failed:", e)
 
 
+# Fixed parts of the lifestyle result (the confidence only for rule-based results)
+LIFESTYLE_CONFIDENCE = 0.78
+LIFESTYLE_PREDICTION_TEXT = "This is a lifestyle screening estimate — not a clinical diagnosis."
+LIFESTYLE_RECOMMENDATIONS = [
+    {
+        "category": "Lifestyle",
+        "priority": 1,
+        "title": "Increase physical activity",
+        "description": "Aim for 30 minutes of moderate exercise at least 4 days a week.",
+        "actions": ["Walk 30 mins", "Home cardio sessions", "Begin a light strength program"]
+    }
+]
+
+
 # Lifestyle assessment endpoint
 @app.route("/lifestyle/assess", methods=["POST"])
 @token_required
@@ -464,11 +577,64 @@ def lifestyle_assess(user_id):
     """
     Accepts lifestyle assessment payload and returns:
     { risk_level, probability, confidence, prediction_text, recommendations, input }
-    Minimal rule-based stub — replace with your real logic later.
+    Scored by the lifestyle model when it is loaded and every feature is
+    given (plus the spread of its tree votes as `uncertainty` for a forest),
+    by the rule-based stub otherwise.
     """
     data = request.json or {}
 
-    # Basic stub scoring (replace with your model)
+    if lifestyle_model is not None and all(f in data for f in lifestyle_feature_names):
+        try:
+            X = coerce_features([data[f] for f in lifestyle_feature_names], lifestyle_feature_names)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        drift_monitors["lifestyle"].observe(X)
+        _, probs, details = score_row(lifestyle_model, lifestyle_scaler, X, lifestyle_compiled)
+        prob, confidence, version = float(probs[1]), round(float(max(probs)), 3), lifestyle_model_version
+    else:
+        prob, details = rule_based_lifestyle_probability(data), {}
+        confidence, version = LIFESTYLE_CONFIDENCE, LIFESTYLE_RULES_VERSION
+
+    if prob < 0.3:
+        risk_level = "Low"
+    elif prob < 0.7:
+        risk_level = "Moderate"
+    else:
+        risk_level = "High"
+
+    result = {
+        "prediction_id": None,
+        "risk_level": risk_level,
+        "probability": round(prob, 3),
+        "confidence": confidence,
+        "prediction_text": LIFESTYLE_PREDICTION_TEXT,
+        "recommendations": LIFESTYLE_RECOMMENDATIONS,
+        "input": data
+    }
+    if "uncertainty" in details:
+        result["uncertainty"] = details["uncertainty"]
+
+    # Try to persist into predictions table for unified history (non-fatal).
+    # Only the inputs are stored; the fixed text/recommendations are rebuilt on read.
+    try:
+        conn = get_db_connection()
+        if conn:
+            cur = conn.cursor()
+            result["prediction_id"] = insert_prediction(cur, user_id, 1 if prob >= 0.5 else 0, prob, risk_level,
+                              feature_vector(data, lifestyle_feature_names), version, 'lifestyle',
+                              Json(data) if STORE_RAW_INPUT else None)
+            record_assessment(cur, user_id, prob, risk_level, 'lifestyle')
+            conn.commit()
+            cur.close()
+            conn.close()
+    except Exception as e:
+        print("Warning: failed to persist lifestyle assessment:", e)
+
+    return jsonify(result), 200
+
+
+def rule_based_lifestyle_probability(data):
+    """Minimal rule-based stub, used when the lifestyle model is not available"""
     prob = 0.05
     try:
         BMI = float(data.get("BMI", 0) or 0)
@@ -495,51 +661,7 @@ def lifestyle_assess(user_id):
         prob += 0.08
 
     # clamp
-    prob = min(max(prob, 0.0), 0.99)
-
-    if prob < 0.3:
-        risk_level = "Low"
-    elif prob < 0.7:
-        risk_level = "Moderate"
-    else:
-        risk_level = "High"
-
-    recommendations = [
-        {
-            "category": "Lifestyle",
-            "priority": 1,
-            "title": "Increase physical activity",
-            "description": "Aim for 30 minutes of moderate exercise at least 4 days a week.",
-            "actions": ["Walk 30 mins", "Home cardio sessions", "Begin a light strength program"]
-        }
-    ]
-
-    result = {
-        "risk_level": risk_level,
-        "probability": round(prob, 3),
-        "confidence": 0.78,
-        "prediction_text": "This is a lifestyle screening estimate — not a clinical diagnosis.",
-        "recommendations": recommendations,
-        "input": data
-    }
-
-    # Try to persist into predictions table for unified history (non-fatal)
-    try:
-        conn = get_db_connection()
-        if conn:
-            cur = conn.cursor()
-            cur.execute(
-                """INSERT INTO predictions (user_id, prediction_result, probability, risk_level, input_data)
-                   VALUES (%s, %s, %s, %s, %s)""",
-                (user_id, 1 if prob >= 0.5 else 0, float(prob), risk_level, Json(result))
-            )
-            conn.commit()
-            cur.close()
-            conn.close()
-    except Exception as e:
-        print("Warning: failed to persist lifestyle assessment:", e)
-
-    return jsonify(result), 200
+    return min(max(prob, 0.0), 0.99)
 
 
 # Save symptom log (SymptomTracker)
@@ -557,6 +679,7 @@ def save_symptom_log(user_id):
             "INSERT INTO symptom_logs (user_id, log_data) VALUES (%s, %s)",
             (user_id, Json(data))
         )
+        record_symptom_log(cur, user_id, data.get("date") or datetime.now().date())
         conn.commit()
         cur.close()
         conn.close()
@@ -566,10 +689,20 @@ def save_symptom_log(user_id):
         return jsonify({"ok": False, "message": "Failed to save symptom log"}), 500
 
 
+def lifestyle_confidence(version, probability):
+    if version in (None, LIFESTYLE_RULES_VERSION) or probability is None:
+        return LIFESTYLE_CONFIDENCE
+    return round(max(probability, 1 - probability), 3)
+
+
 # Lifestyle prediction history endpoint (frontend expects { predictions: [...] })
 @app.route("/lifestyle/prediction-history", methods=["GET"])
 @token_required
 def lifestyle_prediction_history(user_id):
+    try:
+        since, limit = history_window(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     conn = get_db_connection()
     if not conn:
         return jsonify({"predictions": []}), 200
@@ -577,20 +710,37 @@ def lifestyle_prediction_history(user_id):
     try:
         cur = conn.cursor(cursor_factory=RealDictCursor)
         # Fetch predictions for the user (we stored lifestyle assess result in input_data)
-        cur.execute("""
-            SELECT id, probability, risk_level, input_data, created_at
-            FROM predictions
-            WHERE user_id=%s
-            ORDER BY created_at DESC
-        """, (user_id,))
+        cur.execute(f"""
+            SELECT p.id, p.probability, p.risk_level, p.input_data, p.prediction_type, p.model_version,
+                   {VECTOR_SQL} AS feature_vector, mv.feature_names, p.created_at
+            FROM predictions p
+            {JOIN_INPUTS_SQL}
+            LEFT JOIN model_versions mv ON mv.version = p.model_version
+            WHERE p.user_id=%s AND p.created_at >= %s
+            ORDER BY p.created_at DESC
+            LIMIT %s
+        """, (user_id, since, limit))
         rows = cur.fetchall()
         cur.close()
         conn.close()
 
         mapped = []
         for r in rows:
-            input_data = r.get("input_data") or {}
-            if isinstance(input_data, dict) and "prediction_text" in input_data:
+            input_data = r.get("input_data") or vector_to_inputs(r.get("feature_names"), r.get("feature_vector")) or {}
+            if r.get("prediction_type") == "lifestyle" and "prediction_text" not in input_data:
+                mapped_item = {
+                    "id": r.get("id"),
+                    "risk_level": r.get("risk_level"),
+                    "probability": r.get("probability"),
+                    "confidence": lifestyle_confidence(r.get("model_version"), r.get("probability")),
+                    "prediction_text": LIFESTYLE_PREDICTION_TEXT,
+                    "recommendations": LIFESTYLE_RECOMMENDATIONS,
+                    "risk_score": r.get("probability"),
+                    "risk_factors": None,
+                    "created_at": r.get("created_at"),
+                    "input": input_data
+                }
+            elif isinstance(input_data, dict) and "prediction_text" in input_data:
                 mapped_item = {
                     "id": r.get("id"),
                     "risk_level": r.get("risk_level") or input_data.get("risk_level"),
@@ -624,13 +774,26 @@ def lifestyle_prediction_history(user_id):
 @app.route("/predictions/history", methods=["GET"])
 @token_required
 def predictions_history_for_frontend(user_id):
+    try:
+        since, limit = history_window(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     conn = get_db_connection()
     if not conn:
         return jsonify({'predictions': []}), 200
 
     try:
         cur = conn.cursor(cursor_factory=RealDictCursor)
-        cur.execute("SELECT id, user_id, prediction_result, probability, risk_level, input_data, created_at FROM predictions WHERE user_id=%s ORDER BY created_at DESC", (user_id,))
+        cur.execute(f"""
+            SELECT p.id, p.user_id, p.prediction_result, p.probability, p.risk_level, p.input_data,
+                   {VECTOR_SQL} AS feature_vector, mv.feature_names, p.created_at
+            FROM predictions p
+            {JOIN_INPUTS_SQL}
+            LEFT JOIN model_versions mv ON mv.version = p.model_version
+            WHERE p.user_id=%s AND p.created_at >= %s
+            ORDER BY p.created_at DESC
+            LIMIT %s
+        """, (user_id, since, limit))
         rows = cur.fetchall()
         cur.close()
         conn.close()
@@ -642,7 +805,7 @@ def predictions_history_for_frontend(user_id):
                 "prediction_result": r.get("prediction_result"),
                 "probability": r.get("probability"),
                 "risk_level": r.get("risk_level"),
-                "input_data": r.get("input_data"),
+                "input_data": r.get("input_data") or vector_to_inputs(r.get("feature_names"), r.get("feature_vector")),
                 "created_at": r.get("created_at")
             })
 
@@ -651,6 +814,174 @@ def predictions_history_for_frontend(user_id):
         print("predictions/history DB error:", e)
         return jsonify({'predictions': []}), 200
 
+
+# Distribution of stored probabilities for a model version (default: the clinical model's)
+@app.route("/stats/distribution", methods=["GET"])
+@token_required
+def distribution(user_id):
+    version = request.args.get("model_version", clinical_model_version)
+    summary = probability_distribution.summary(version)
+    if summary is None:
+        return jsonify({"error": f"No stored predictions for model version {version}"}), 404
+    return jsonify(summary), 200
+
+
+@app.route("/metrics/drift", methods=["GET"])
+@token_required
+def drift(user_id):
+    try:
+        return jsonify(drift_metrics(drift_monitors, request.args.get("model"))), 200
+    except KeyError:
+        return jsonify({"error": "model must be 'clinical' or 'lifestyle'"}), 400
+
+
+# Dashboard summary (one row per user, maintained by the write paths above)
+@app.route("/summary", methods=["GET"])
+@token_required
+def summary(user_id):
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({"error": "Database not connected"}), 500
+
+    try:
+        cur = conn.cursor()
+        result = fetch_summary(cur, user_id)
+        cur.close()
+        conn.close()
+    except Exception as e:
+        print("summary DB error:", e)
+        return jsonify({"error": "Failed to fetch summary"}), 500
+
+    return jsonify({"summary": result}), 200
+
+# Full history exports, streamed from a server-side cursor (?format=ndjson|csv)
+@app.route("/export/history", methods=["GET"])
+@token_required
+def export_history(user_id):
+    fmt = request.args.get("format", "ndjson").lower()
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"error": f"Unsupported format, use one of {list(EXPORT_FORMATS)}"}), 400
+
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({"error": "Database not connected"}), 500
+
+    return history_export_response(conn, user_id, fmt, request.args.get("since"))
+
+@app.route("/export/symptom-logs", methods=["GET"])
+@token_required
+def export_symptom_logs(user_id):
+    fmt = request.args.get("format", "ndjson").lower()
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"error": f"Unsupported format, use one of {list(EXPORT_FORMATS)}"}), 400
+
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({"error": "Database not connected"}), 500
+
+    return export_response(
+        conn,
+        "SELECT id, created_at, log_data FROM symptom_logs WHERE user_id=%s ORDER BY created_at",
+        (user_id,), ["id", "created_at", "log_data"], fmt, "pcos_symptom_logs"
+    )
+
+# Background batch scoring: upload a CSV, poll the job, download the result
+@app.route("/jobs/score", methods=["POST"])
+@token_required
+def create_score_job(user_id):
+    upload = request.files.get("file")
+    if upload is None:
+        return jsonify({"error": "No file uploaded (multipart field 'file')"}), 400
+
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({"error": "Database not connected"}), 500
+
+    try:
+        cur = conn.cursor()
+        job_id = create_job(cur, user_id, request.form.get("model", "clinical"), upload,
+                            request.form.get("id_column"))
+        conn.commit()
+        cur.close()
+    except ValueError as e:
+        conn.close()
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        conn.close()
+        print("score job DB error:", e)
+        return jsonify({"error": "Failed to create job"}), 500
+    conn.close()
+
+    submit_job(DB_CONFIG, job_id)
+    return jsonify({"job_id": job_id, "status": "queued", "status_url": f"/jobs/{job_id}"}), 202
+
+@app.route("/jobs/<int:job_id>", methods=["GET"])
+@token_required
+def score_job_status(user_id, job_id):
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({"error": "Database not connected"}), 500
+
+    try:
+        cur = conn.cursor()
+        status = job_status(cur, user_id, job_id)
+        cur.close()
+        conn.close()
+    except Exception as e:
+        print("score job status DB error:", e)
+        return jsonify({"error": "Failed to fetch job"}), 500
+
+    if status is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(status), 200
+
+@app.route("/jobs/<int:job_id>/result", methods=["GET"])
+@token_required
+def score_job_result(user_id, job_id):
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({"error": "Database not connected"}), 500
+
+    try:
+        cur = conn.cursor()
+        path = job_result_path(cur, user_id, job_id)
+        cur.close()
+        conn.close()
+    except Exception as e:
+        print("score job result DB error:", e)
+        return jsonify({"error": "Failed to fetch job"}), 500
+
+    if path is None or not os.path.exists(path):
+        return jsonify({"error": "Result not available"}), 404
+    return send_file(path, mimetype="text/csv", as_attachment=True,
+                     download_name=f"score_job_{job_id}.csv")
+
+# Ground-truth feedback: the confirmed diagnosis for a stored prediction
+@app.route("/predictions/<int:prediction_id>/feedback", methods=["POST"])
+@token_required
+def prediction_feedback(user_id, prediction_id):
+    label = parse_label(request.json or {})
+    if label is None:
+        return jsonify({"error": "label must be 0 (no PCOS) or 1 (PCOS)"}), 400
+
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({"error": "Database not connected"}), 500
+
+    try:
+        cur = conn.cursor()
+        label_id = record_label(cur, user_id, prediction_id, label)
+        conn.commit()
+        cur.close()
+        conn.close()
+    except Exception as e:
+        print("feedback DB error:", e)
+        return jsonify({"error": "Failed to save feedback"}), 500
+
+    if label_id is None:
+        return jsonify({"error": "Prediction not found"}), 404
+    return jsonify({"prediction_id": prediction_id, "label": label}), 200
+
 # ---------- End pasted block ----------
 
 # ---------------- START (local dev) ----------------
@@ -8,45 +8,7 @@ from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import (accuracy_score, precision_score, recall_score, 
                            f1_score, roc_auc_score, classification_report, 
                            confusion_matrix)
-
-def generate_test_data(n_samples=1000):
-    """Generate synthetic PCOS data for testing"""
-    np.random.seed(42)
-    
-    n_healthy = int(n_samples * 0.7)
-    n_pcos = n_samples - n_healthy
-    
-    # Healthy samples - lower risk values
-    healthy_data = np.column_stack([
-        np.random.normal(28, 6, n_healthy),      # Age
-        np.random.normal(23, 3, n_healthy),      # BMI (normal)
-        np.random.normal(12, 4, n_healthy),      # Insulin (normal)
-        np.random.normal(35, 10, n_healthy),     # Testosterone (normal)
-        np.random.normal(6, 2, n_healthy),       # LH (normal)
-        np.random.normal(7, 2, n_healthy),       # FSH (normal)
-        np.random.normal(90, 10, n_healthy),     # Glucose (normal)
-        np.random.normal(180, 30, n_healthy),    # Cholesterol (normal)
-    ])
-    healthy_labels = np.zeros(n_healthy)
-    
-    # PCOS samples - higher risk values
-    pcos_data = np.column_stack([
-        np.random.normal(26, 5, n_pcos),         # Age
-        np.random.normal(28, 5, n_pcos),         # BMI (higher)
-        np.random.normal(18, 6, n_pcos),         # Insulin (elevated)
-        np.random.normal(55, 15, n_pcos),        # Testosterone (elevated)
-        np.random.normal(12, 4, n_pcos),         # LH (elevated)
-        np.random.normal(6, 2, n_pcos),          # FSH
-        np.random.normal(105, 15, n_pcos),       # Glucose (higher)
-        np.random.normal(200, 40, n_pcos),       # Cholesterol (higher)
-    ])
-    pcos_labels = np.ones(n_pcos)
-    
-    X = np.vstack([healthy_data, pcos_data])
-    y = np.concatenate([healthy_labels, pcos_labels])
-    feature_names = ['Age', 'BMI', 'Insulin', 'Testosterone', 'LH', 'FSH', 'Glucose', 'Cholesterol']
-    
-    return X, y, feature_names
+from training_data import load_dataset
 
 def train_and_evaluate():
     """Train models and show comprehensive accuracy metrics"""
@@ -55,7 +17,7 @@ def train_and_evaluate():
     
     # Generate data
     print("📊 Generating synthetic PCOS dataset...")
-    X, y, feature_names = generate_test_data(1000)
+    X, y, feature_names = load_dataset('clinical', n_samples=1000)
     
     print(f"Dataset: {X.shape[0]} samples, {X.shape[1]} features")
     print(f"PCOS cases: {np.sum(y)} ({np.mean(y)*100:.1f}%)")
@@ -0,0 +1,221 @@
+"""
+Shrink a fitted random forest within an accuracy budget.
+
+Trees are picked greedily: starting from none, each step adds the tree that
+gives the highest held-out ROC-AUC for the averaged probabilities, until the
+subset is within `tolerance` of the full forest's ROC-AUC. The held-out set
+is split in two halves: trees are picked on one and the report is measured on
+the other, so the reported drop is not fitted to its own rows. At least
+`min_trees` trees are kept, because a handful of trees picked on a small set
+generalizes worse than the picking ROC-AUC suggests. With max_depth the
+forest is first refitted with that depth cap (this needs the training data),
+and the trees are then picked from it.
+
+The compressed model is written next to the original as <name>_compressed.pkl,
+with a <name>_compression.json report of trees, nodes, pickled size,
+single-row and batch latency, and ROC-AUC before and after.
+
+Usage:
+    python compress_forest.py [--model lifestyle|clinical] [--tolerance 0.005] [--max-depth 10]
+        [--min-trees 10] [--samples 2000]
+
+train_lifestyle_model.py and train_model.py run it on their test split with --compress.
+"""
+
+import argparse
+import copy
+import json
+import os
+import pickle
+import time
+
+import joblib
+import numpy as np
+from scipy.stats import rankdata
+from sklearn.base import clone
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import train_test_split
+
+from score_csv import BACKEND_DIR, MODEL_ARTIFACTS
+
+DEFAULT_TOLERANCE = 0.005
+DEFAULT_MIN_TREES = 10
+
+
+def _roc_auc_rows(scores, y):
+    """ROC-AUC of every row of `scores` (candidates x samples) against y, via ranks"""
+    positive = y == 1
+    n_pos, n_neg = positive.sum(), (~positive).sum()
+    ranks = rankdata(scores, axis=1)
+    return (ranks[:, positive].sum(axis=1) - n_pos * (n_pos + 1) / 2) / (n_pos * n_neg)
+
+
+def select_trees(model, X_val, y_val, tolerance=DEFAULT_TOLERANCE, min_trees=DEFAULT_MIN_TREES):
+    """Indices of the greedily chosen trees and the ROC-AUC they reach"""
+    y_val = np.asarray(y_val)
+    positive = list(model.classes_).index(1)
+    per_tree = np.array([tree.predict_proba(X_val)[:, positive] for tree in model.estimators_])
+    target = roc_auc_score(y_val, per_tree.mean(axis=0)) - tolerance
+
+    chosen, total = [], np.zeros(per_tree.shape[1])
+    remaining = list(range(len(per_tree)))
+    auc = 0.0
+    while remaining:
+        candidates = total + per_tree[remaining]
+        scores = _roc_auc_rows(candidates, y_val)
+        best = int(np.argmax(scores))
+        auc = float(scores[best])
+        total = candidates[best]
+        chosen.append(remaining.pop(best))
+        if auc >= target and len(chosen) >= min_trees:
+            break
+    return chosen, auc
+
+
+def subset_forest(model, indices):
+    compressed = copy.deepcopy(model)
+    compressed.estimators_ = [compressed.estimators_[i] for i in indices]
+    compressed.n_estimators = len(indices)
+    return compressed
+
+
+def _latency_ms(model, X, repeats=200):
+    """Median single-row and full-batch predict_proba times in ms"""
+    single = []
+    for i in range(repeats):
+        row = X[i % len(X):i % len(X) + 1]
+        started = time.perf_counter()
+        model.predict_proba(row)
+        single.append(time.perf_counter() - started)
+    started = time.perf_counter()
+    model.predict_proba(X)
+    return float(np.median(single) * 1000), (time.perf_counter() - started) * 1000
+
+
+def _profile(model, X_val, y_val):
+    single_ms, batch_ms = _latency_ms(model, X_val)
+    positive = list(model.classes_).index(1)
+    return {
+        'trees': len(model.estimators_),
+        'nodes': int(sum(tree.tree_.node_count for tree in model.estimators_)),
+        'max_depth': int(max(tree.tree_.max_depth for tree in model.estimators_)),
+        'size_kb': round(len(pickle.dumps(model)) / 1024, 1),
+        'single_row_ms': round(single_ms, 3),
+        'batch_ms': round(batch_ms, 3),
+        'roc_auc': float(roc_auc_score(y_val, model.predict_proba(X_val)[:, positive])),
+    }
+
+
+def compress_forest(model, X_val, y_val, tolerance=DEFAULT_TOLERANCE, max_depth=None,
+                    X_train=None, y_train=None, min_trees=DEFAULT_MIN_TREES):
+    """
+    Return (compressed model, report). X_val/y_val is the held-out set the
+    trees are chosen on; X_train/y_train are needed only with max_depth.
+    """
+    if not isinstance(model, RandomForestClassifier):
+        raise TypeError(f"{type(model).__name__} is not a random forest")
+
+    source = model
+    if max_depth is not None:
+        if X_train is None:
+            raise ValueError("max_depth needs the training data to refit the forest")
+        source = clone(model).set_params(max_depth=max_depth).fit(X_train, y_train)
+
+    X_select, X_report, y_select, y_report = train_test_split(
+        np.asarray(X_val), np.asarray(y_val), test_size=0.5, random_state=42, stratify=y_val
+    )
+    indices, _ = select_trees(source, X_select, y_select, tolerance, min_trees)
+    compressed = subset_forest(source, indices)
+
+    before, after = _profile(model, X_report, y_report), _profile(compressed, X_report, y_report)
+    report = {
+        'tolerance': tolerance,
+        'max_depth_cap': max_depth,
+        'selection_rows': len(y_select),
+        'report_rows': len(y_report),
+        'full': before,
+        'compressed': after,
+        'roc_auc_drop': round(before['roc_auc'] - after['roc_auc'], 4),
+        'within_tolerance': before['roc_auc'] - after['roc_auc'] <= tolerance,
+        'size_saved_pct': round(100 * (1 - after['size_kb'] / before['size_kb']), 1),
+        'single_row_speedup': round(before['single_row_ms'] / after['single_row_ms'], 2),
+        'batch_speedup': round(before['batch_ms'] / after['batch_ms'], 2),
+    }
+    return compressed, report
+
+
+def save_compressed(compressed, report, model_path):
+    """Write <name>_compressed.pkl and <name>_compression.json next to model_path"""
+    stem = os.path.splitext(model_path)[0]
+    joblib.dump(compressed, f"{stem}_compressed.pkl")
+    with open(f"{stem}_compression.json", 'w') as f:
+        json.dump(report, f, indent=2)
+    return f"{stem}_compressed.pkl", f"{stem}_compression.json"
+
+
+def print_report(report):
+    full, small = report['full'], report['compressed']
+    print(f"\n🗜️  Forest compression (ROC-AUC tolerance {report['tolerance']}):")
+    print(f"  Trees:       {full['trees']} -> {small['trees']} (max depth {full['max_depth']} -> {small['max_depth']})")
+    print(f"  Nodes:       {full['nodes']:,} -> {small['nodes']:,}")
+    print(f"  Size:        {full['size_kb']:.0f} KB -> {small['size_kb']:.0f} KB ({report['size_saved_pct']}% saved)")
+    print(f"  Single row:  {full['single_row_ms']:.2f} ms -> {small['single_row_ms']:.2f} ms "
+          f"(x{report['single_row_speedup']})")
+    print(f"  Batch:       {full['batch_ms']:.1f} ms -> {small['batch_ms']:.1f} ms (x{report['batch_speedup']})")
+    print(f"  ROC-AUC:     {full['roc_auc']:.4f} -> {small['roc_auc']:.4f} (drop {report['roc_auc_drop']})")
+    if not report['within_tolerance']:
+        print("  ⚠️  The drop exceeds the tolerance on the report half; use more held-out rows or more trees")
+
+
+def compress_and_save(model, scaler, model_path, X_val, y_val, tolerance=DEFAULT_TOLERANCE,
+                      max_depth=None, X_train=None, y_train=None, min_trees=DEFAULT_MIN_TREES):
+    """Compress, print the report and save; the training scripts' --compress step"""
+    X_val = scaler.transform(X_val)
+    if X_train is not None:
+        X_train = scaler.transform(X_train)
+    compressed, report = compress_forest(model, X_val, y_val, tolerance, max_depth, X_train, y_train,
+                                         min_trees)
+    print_report(report)
+    for path in save_compressed(compressed, report, model_path):
+        print(f"   - {path}")
+    return compressed, report
+
+
+def main():
+    from training_data import load_dataset
+
+    parser = argparse.ArgumentParser(description="Compress a trained PCOS forest within a ROC-AUC tolerance")
+    parser.add_argument('--model', choices=list(MODEL_ARTIFACTS), default='lifestyle')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='allowed ROC-AUC drop on the held-out set')
+    parser.add_argument('--max-depth', type=int, help='also refit the forest with this depth cap')
+    parser.add_argument('--min-trees', type=int, default=DEFAULT_MIN_TREES)
+    parser.add_argument('--samples', type=int, default=2000, help='synthetic held-out (and refit) rows')
+    args = parser.parse_args()
+
+    model_path, scaler_path, _ = MODEL_ARTIFACTS[args.model]
+    model = joblib.load(os.path.join(BACKEND_DIR, model_path))
+    scaler = joblib.load(os.path.join(BACKEND_DIR, scaler_path))
+    if not isinstance(model, RandomForestClassifier):
+        print(f"❌ {model_path} is a {type(model).__name__}, not a random forest")
+        return
+
+    def frame(X, names):
+        if hasattr(scaler, 'feature_names_in_'):
+            import pandas as pd
+            return pd.DataFrame(np.asarray(X), columns=names)
+        return np.asarray(X)
+
+    # Held-out rows come from a seed the training scripts do not use
+    X_val, y_val, names = load_dataset(args.model, n_samples=args.samples, seed=4242)
+    X_train = y_train = None
+    if args.max_depth is not None:
+        X_train, y_train, _ = load_dataset(args.model, n_samples=args.samples, seed=42)
+        X_train = frame(X_train, names)
+    compress_and_save(model, scaler, os.path.join(BACKEND_DIR, model_path), frame(X_val, names), y_val,
+                      args.tolerance, args.max_depth, X_train, y_train, args.min_trees)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Database settings shared by both apps and the maintenance scripts.
+
+Importing this module only reads the environment: the scripts get a
+connection without loading the models or running any DDL of the apps.
+"""
+
+import os
+from urllib.parse import urlparse, unquote
+
+import psycopg2
+
+DB_CONFIG = {
+    'host': os.environ.get('DB_HOST', 'localhost'),
+    'database': os.environ.get('DB_NAME', 'pcos_db'),
+    'user': os.environ.get('DB_USER', 'postgres'),
+    'password': os.environ.get('DB_PASSWORD', 'postgres'),
+    'port': os.environ.get('DB_PORT', '5432')
+}
+
+DATABASE_URL = os.environ.get("DATABASE_URL")
+if DATABASE_URL:
+    try:
+        url = urlparse(DATABASE_URL)
+        DB_CONFIG = {
+            'host': url.hostname,
+            'database': url.path.lstrip('/'),
+            'user': unquote(url.username) if url.username else None,
+            'password': unquote(url.password) if url.password else None,
+            'port': str(url.port) if url.port else '5432'
+        }
+        print("Using DATABASE_URL from env for DB connection")
+    except Exception as e:
+        print("Failed to parse DATABASE_URL:", e)
+
+
+def get_db_connection():
+    """Create a database connection, or None if the database is unreachable"""
+    try:
+        return psycopg2.connect(**DB_CONFIG)
+    except Exception as e:
+        print(f"❌ Database connection error: {e}")
+        return None
@@ -0,0 +1,161 @@
+"""
+Move stored feature vectors into the content-addressed prediction_inputs table
+and report how much space the deduplication saves.
+
+`migrate` walks predictions that still carry their own feature_vector in
+id-ordered batches, upserts each distinct (model_version, vector) into
+prediction_inputs, points the rows at it through input_id and clears the
+inline copy. Every batch commits on its own, so the run can be stopped and
+resumed. Run migrate_feature_vectors.py first for rows that only have JSON.
+
+`report` compares what the vectors take today (the inline ones, the whole
+prediction_inputs table and the input_id references) with what they would
+take stored inline on every prediction row.
+
+Usage:
+    python dedup_inputs.py migrate [--batch-size 5000]
+    python dedup_inputs.py report
+"""
+
+import argparse
+import time
+
+from psycopg2.extras import execute_values
+
+from db import get_db_connection
+from feature_store import input_hash
+
+UPSERT_INPUTS_SQL = """
+    INSERT INTO prediction_inputs (input_hash, model_version, feature_vector)
+    VALUES %s
+    ON CONFLICT (input_hash) DO NOTHING
+"""
+
+LINK_PREDICTIONS_SQL = """
+    UPDATE predictions p
+    SET input_id = pi.id, feature_vector = NULL
+    FROM (VALUES %s) AS v(id, input_hash)
+    JOIN prediction_inputs pi ON pi.input_hash = v.input_hash
+    WHERE p.id = v.id
+"""
+
+REPORT_SQL = """
+    SELECT
+        (SELECT COUNT(*) FROM predictions) AS predictions,
+        (SELECT COUNT(*) FROM predictions WHERE input_id IS NOT NULL) AS linked,
+        (SELECT COUNT(*) FROM prediction_inputs) AS distinct_inputs,
+        (SELECT COALESCE(SUM(pg_column_size(feature_vector)), 0) FROM predictions) AS inline_bytes,
+        (SELECT COALESCE(SUM(pg_column_size(feature_vector)), 0) FROM prediction_inputs) AS input_bytes,
+        (SELECT COALESCE(SUM(pg_column_size(pi.feature_vector)), 0)
+         FROM predictions p JOIN prediction_inputs pi ON pi.id = p.input_id) AS undeduplicated_bytes,
+        (SELECT COUNT(*) * 8 FROM predictions WHERE input_id IS NOT NULL) AS reference_bytes,
+        pg_total_relation_size('prediction_inputs') AS inputs_table_bytes,
+        pg_indexes_size('prediction_inputs') AS inputs_index_bytes
+"""
+
+
+def migrate(batch_size):
+    conn = get_db_connection()
+    if not conn:
+        print("❌ Could not connect to database")
+        return
+
+    cur = conn.cursor()
+    last_id = 0
+    moved = 0
+    started = time.time()
+    try:
+        while True:
+            cur.execute("""
+                SELECT id, model_version, feature_vector FROM predictions
+                WHERE id > %s AND input_id IS NULL
+                  AND feature_vector IS NOT NULL AND model_version IS NOT NULL
+                ORDER BY id
+                LIMIT %s
+            """, (last_id, batch_size))
+            rows = cur.fetchall()
+            if not rows:
+                break
+
+            inputs = {}
+            links = []
+            for prediction_id, version, vector in rows:
+                digest = input_hash(version, vector)
+                inputs[digest] = (digest, version, vector)
+                links.append((prediction_id, digest))
+
+            execute_values(cur, UPSERT_INPUTS_SQL, list(inputs.values()),
+                           template="(%s, %s, %s::real[])")
+            execute_values(cur, LINK_PREDICTIONS_SQL, links, template="(%s, %s::bytea)")
+            conn.commit()
+
+            moved += len(rows)
+            last_id = rows[-1][0]
+            print(f"  linked up to id {last_id}: {moved} rows")
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Migration failed after id {last_id}: {e}")
+        return
+    finally:
+        cur.close()
+        conn.close()
+
+    print(f"\n✅ Linked {moved} predictions to prediction_inputs in {time.time() - started:.1f}s")
+    print("   Run VACUUM on predictions to reclaim the space of the cleared vectors.")
+
+
+def _fmt_bytes(n):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if abs(n) < 1024 or unit == 'GB':
+            return f"{n:,.0f} {unit}" if unit == 'B' else f"{n:,.1f} {unit}"
+        n /= 1024
+
+
+def report():
+    conn = get_db_connection()
+    if not conn:
+        print("❌ Could not connect to database")
+        return
+
+    cur = conn.cursor()
+    try:
+        cur.execute(REPORT_SQL)
+        (predictions, linked, distinct_inputs, inline_bytes, input_bytes,
+         undeduplicated_bytes, reference_bytes, table_bytes, index_bytes) = cur.fetchone()
+    finally:
+        cur.close()
+        conn.close()
+
+    # Without dedup every linked row would carry its own vector inline. With
+    # it, the whole prediction_inputs table counts (row headers, hashes,
+    # versions, timestamps, TOAST and indexes), not just its vectors
+    without = inline_bytes + undeduplicated_bytes
+    with_dedup = inline_bytes + table_bytes + reference_bytes
+    saved = without - with_dedup
+
+    print("📊 Prediction input deduplication")
+    print(f"  predictions:            {predictions:,} ({linked:,} linked to prediction_inputs)")
+    print(f"  distinct inputs:        {distinct_inputs:,}"
+          + (f" ({linked / distinct_inputs:.2f} predictions per input)" if distinct_inputs else ""))
+    print(f"  vectors inline:         {_fmt_bytes(inline_bytes)}")
+    print(f"  vectors deduplicated:   {_fmt_bytes(input_bytes)}")
+    print(f"  input_id references:    {_fmt_bytes(reference_bytes)}")
+    print(f"  prediction_inputs size: {_fmt_bytes(table_bytes)} (indexes {_fmt_bytes(index_bytes)})")
+    print(f"\n  without dedup:          {_fmt_bytes(without)}")
+    print(f"  with dedup:             {_fmt_bytes(with_dedup)}")
+    if without:
+        print(f"  saved:                  {_fmt_bytes(saved)} ({saved / without:.1%})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Deduplicate stored prediction inputs")
+    sub = parser.add_subparsers(dest='command', required=True)
+    migrate_parser = sub.add_parser('migrate', help='move inline feature vectors into prediction_inputs')
+    migrate_parser.add_argument('--batch-size', type=int, default=5000)
+    sub.add_parser('report', help='storage used with and without deduplication')
+    args = parser.parse_args()
+
+    if args.command == 'migrate':
+        migrate(args.batch_size)
+    else:
+        report()
@@ -0,0 +1,168 @@
+"""
+Distill a trained PCOS model (the teacher) into a small, fast student.
+
+The student is trained on the teacher's predict_proba over a large synthetic
+sample (training_data.load_dataset) rather than on hard labels, in the same
+scaled feature space, so it is a drop-in replacement for the model file and
+keeps using the existing scaler. Students:
+
+  - logistic: degree-2 polynomial features + LogisticRegression, trained on
+    soft labels (each row twice, as label 1 with weight p and label 0 with
+    weight 1 - p, which is exactly cross-entropy against p);
+  - hgb: a shallow HistGradientBoostingRegressor fitted to the teacher's logits.
+
+Fidelity is measured on a fresh synthetic sample against the teacher
+(probability error, label and risk band agreement) and against the true
+labels, together with single-row and batch latency. The student is saved as
+<model>_student.pkl with the metrics in <model>_student.json; to serve it,
+copy it over the model file (the scaler and feature list stay as they are).
+
+Usage:
+    python distill.py [--model lifestyle|clinical] [--student logistic|hgb] [--samples 200000]
+"""
+
+import argparse
+import json
+import os
+import time
+
+import joblib
+import numpy as np
+from sklearn.ensemble import HistGradientBoostingRegressor
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import roc_auc_score
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import PolynomialFeatures
+
+from score_csv import BACKEND_DIR, MODEL_ARTIFACTS, load_scoring_model, risk_levels, scale_features
+from training_data import load_dataset
+
+
+class DistilledClassifier:
+    """
+    Serving wrapper around a student: the predict/predict_proba/classes_
+    interface the API uses, plus the teacher's feature_importances_ when it
+    had them (app.py reports them as risk factors).
+    """
+
+    def __init__(self, student, kind, feature_importances=None):
+        self.student = student
+        self.kind = kind
+        self.classes_ = np.array([0, 1])
+        if feature_importances is not None:
+            self.feature_importances_ = np.asarray(feature_importances)
+
+    def predict_proba(self, X):
+        if self.kind == 'hgb':
+            p = 1 / (1 + np.exp(-self.student.predict(X)))
+        else:
+            p = self.student.predict_proba(X)[:, 1]
+        return np.column_stack([1 - p, p])
+
+    def predict(self, X):
+        return (self.predict_proba(X)[:, 1] >= 0.5).astype(np.int64)
+
+
+def teacher_probabilities(model, X_scaled):
+    positive = list(model.classes_).index(1)
+    return model.predict_proba(X_scaled)[:, positive]
+
+
+def fit_student(kind, X_scaled, p):
+    if kind == 'hgb':
+        p = np.clip(p, 1e-4, 1 - 1e-4)
+        student = HistGradientBoostingRegressor(max_depth=3, max_iter=150, learning_rate=0.1, random_state=42)
+        return student.fit(X_scaled, np.log(p / (1 - p)))
+
+    student = make_pipeline(PolynomialFeatures(degree=2, include_bias=False),
+                            LogisticRegression(C=10, max_iter=2000))
+    X2 = np.vstack([X_scaled, X_scaled])
+    y2 = np.concatenate([np.ones(len(p)), np.zeros(len(p))])
+    weights = np.concatenate([p, 1 - p])
+    return student.fit(X2, y2, logisticregression__sample_weight=weights)
+
+
+def _single_row_us(model, X, repeats=300):
+    times = []
+    for i in range(repeats):
+        row = X[i % len(X):i % len(X) + 1]
+        started = time.perf_counter()
+        model.predict_proba(row)
+        times.append(time.perf_counter() - started)
+    return float(np.median(times) * 1e6)
+
+
+def _batch_us_per_row(model, X):
+    started = time.perf_counter()
+    model.predict_proba(X)
+    return (time.perf_counter() - started) * 1e6 / len(X)
+
+
+def fidelity(teacher, student, X_scaled, y):
+    p_teacher = teacher_probabilities(teacher, X_scaled)
+    p_student = student.predict_proba(X_scaled)[:, 1]
+    error = np.abs(p_teacher - p_student)
+    return {
+        'rows': len(y),
+        'mean_abs_error': float(error.mean()),
+        'p99_abs_error': float(np.quantile(error, 0.99)),
+        'max_abs_error': float(error.max()),
+        'label_agreement': float(((p_teacher >= 0.5) == (p_student >= 0.5)).mean()),
+        'risk_band_agreement': float((risk_levels(p_teacher) == risk_levels(p_student)).mean()),
+        'teacher_roc_auc': float(roc_auc_score(y, p_teacher)),
+        'student_roc_auc': float(roc_auc_score(y, p_student)),
+        'teacher_single_row_us': _single_row_us(teacher, X_scaled),
+        'student_single_row_us': _single_row_us(student, X_scaled),
+        'teacher_batch_us_per_row': _batch_us_per_row(teacher, X_scaled),
+        'student_batch_us_per_row': _batch_us_per_row(student, X_scaled),
+    }
+
+
+def distill(model_type='lifestyle', kind='logistic', n_samples=200_000, eval_samples=20_000):
+    teacher, scaler, _ = load_scoring_model(model_type)
+    print(f"🎓 Distilling {MODEL_ARTIFACTS[model_type][0]} ({type(teacher).__name__}) into a {kind} student...")
+
+    started = time.perf_counter()
+    X, _, _ = load_dataset(model_type, n_samples=n_samples, seed=1234)
+    X_scaled = scale_features(scaler, X)
+    p = teacher_probabilities(teacher, X_scaled)
+    print(f"  Teacher labelled {n_samples:,} synthetic rows in {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    student = DistilledClassifier(fit_student(kind, X_scaled, p), kind,
+                                  getattr(teacher, 'feature_importances_', None))
+    print(f"  Student fitted in {time.perf_counter() - started:.1f}s")
+
+    X_eval, y_eval, _ = load_dataset(model_type, n_samples=eval_samples, seed=5678)
+    metrics = fidelity(teacher, student, scale_features(scaler, X_eval), np.asarray(y_eval))
+    metrics.update({'teacher': MODEL_ARTIFACTS[model_type][0], 'student': kind, 'train_rows': n_samples})
+
+    print(f"\n📊 Fidelity on {metrics['rows']:,} fresh rows:")
+    print(f"  |p_student - p_teacher|: mean {metrics['mean_abs_error']:.4f}, "
+          f"p99 {metrics['p99_abs_error']:.4f}, max {metrics['max_abs_error']:.4f}")
+    print(f"  Label agreement: {metrics['label_agreement']*100:.2f}%, "
+          f"risk band agreement: {metrics['risk_band_agreement']*100:.2f}%")
+    print(f"  ROC-AUC: teacher {metrics['teacher_roc_auc']:.4f}, student {metrics['student_roc_auc']:.4f}")
+    print(f"  Single row: {metrics['teacher_single_row_us']:.0f} µs -> {metrics['student_single_row_us']:.0f} µs")
+    print(f"  Batch: {metrics['teacher_batch_us_per_row']:.2f} µs/row -> "
+          f"{metrics['student_batch_us_per_row']:.2f} µs/row")
+
+    stem = os.path.join(BACKEND_DIR, os.path.splitext(MODEL_ARTIFACTS[model_type][0])[0])
+    joblib.dump(student, f"{stem}_student.pkl")
+    with open(f"{stem}_student.json", 'w') as f:
+        json.dump(metrics, f, indent=2)
+    print(f"\n💾 Saved {stem}_student.pkl (serves with {MODEL_ARTIFACTS[model_type][1]}) and {stem}_student.json")
+    return student, metrics
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Distill a PCOS model into a fast student model")
+    parser.add_argument('--model', choices=list(MODEL_ARTIFACTS), default='lifestyle')
+    parser.add_argument('--student', choices=['logistic', 'hgb'], default='logistic')
+    parser.add_argument('--samples', type=int, default=200_000, help='synthetic rows labelled by the teacher')
+    parser.add_argument('--eval-samples', type=int, default=20_000)
+    args = parser.parse_args()
+
+    # Through the module, so the pickle refers to distill.DistilledClassifier, not __main__
+    import distill as module
+    module.distill(args.model, args.student, args.samples, args.eval_samples)
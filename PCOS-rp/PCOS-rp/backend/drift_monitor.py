@@ -0,0 +1,435 @@
+"""
+Input drift against the training distribution: GET /metrics/drift.
+
+When a model is trained, save_reference() writes <model>_drift_reference.pkl
+next to it. This holds per-feature bin edges at the training data's quantiles
+(DRIFT_BINS equal-mass bins, open-ended at both sides) and the training
+counts per bin.
+
+On the serving path, observe() finds the bin of each feature of the scored
+row with one comparison against the edge matrix and adds 1 to those counters.
+The counters are a memory-mapped int64 file per web worker process:
+
+    drift_counts/<model_type>/<reference id>/<host>-<pid>.i64
+
+Each file has a single writer, so no lock is needed. The in-place numpy
+increment runs under the GIL, so threads of one worker do not interleave
+inside it. Other processes read the counts straight from the shared pages.
+The drift job folds the files of exited workers on this host into
+compacted.json and deletes them, so restarts do not pile up files.
+
+The drift job sums every worker's file and compares the live histograms with
+the reference. It reports, per feature:
+
+- PSI, which is stable below 0.1, moderate below 0.25, otherwise significant
+- the KS statistic of the binned CDFs and its asymptotic p-value (on binned
+  data this underestimates the exact KS statistic)
+
+It does this for all traffic since the reference was deployed, and for the
+latest window of at least DRIFT_WINDOW_MIN rows. The result is written to
+report.json in the same directory, under an exclusive lock on .lock there
+(flock; msvcrt.locking on Windows), since the window bookkeeping is read back
+from the previous report. The job runs from cron:
+
+    python drift_monitor.py [--model clinical|lifestyle]
+    python drift_monitor.py --reference          # (re)write the reference files from the training data
+    python drift_monitor.py --benchmark          # cost of observe()
+
+GET /metrics/drift also starts it, in a background thread, once the report is
+DRIFT_INTERVAL_SECONDS old; observe() never does, so scoring requests do not
+pay for it.
+"""
+
+import argparse
+import contextlib
+import glob
+import hashlib
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import joblib
+import numpy as np
+from scipy.special import kolmogorov
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DRIFT_COUNTS_DIR = os.environ.get('DRIFT_COUNTS_DIR', os.path.join(BACKEND_DIR, 'drift_counts'))
+DRIFT_INTERVAL_SECONDS = int(os.environ.get('DRIFT_INTERVAL_SECONDS', '300'))
+DRIFT_WINDOW_MIN = int(os.environ.get('DRIFT_WINDOW_MIN', '200'))
+DRIFT_BINS = 10
+DRIFT_REFERENCES = {
+    'clinical': 'pcos_drift_reference.pkl',
+    'lifestyle': 'lifestyle_drift_reference.pkl',
+}
+PSI_LEVELS = ((0.1, 'stable'), (0.25, 'moderate'), (np.inf, 'significant'))
+PSI_FLOOR = 1e-4   # share used for an empty bin, so that PSI stays finite
+
+
+def bin_edges(X, bins=DRIFT_BINS):
+    """(features x bins-1) inner edges at the quantiles of X, padded with +inf where values repeat"""
+    X = np.asarray(X, dtype=np.float64)
+    edges = np.full((X.shape[1], bins - 1), np.inf)
+    for j in range(X.shape[1]):
+        unique = np.unique(np.quantile(X[:, j], np.linspace(0, 1, bins + 1)[1:-1]))
+        edges[j, :len(unique)] = unique
+    return edges
+
+
+def bin_counts(X, edges):
+    """(features x bins) histogram; a value's bin is the number of edges at or below it"""
+    X = np.asarray(X, dtype=np.float64)
+    bins = (edges[None, :, :] <= X[:, :, None]).sum(axis=2)
+    counts = np.zeros((edges.shape[0], edges.shape[1] + 1), dtype=np.int64)
+    for j in range(edges.shape[0]):
+        counts[j] = np.bincount(bins[:, j], minlength=counts.shape[1])
+    return counts
+
+
+def save_reference(model_type, X_train, feature_names, path=None):
+    """Write the training histograms the drift monitor compares traffic with"""
+    path = path or os.path.join(BACKEND_DIR, DRIFT_REFERENCES[model_type])
+    edges = bin_edges(X_train)
+    reference = {
+        'model_type': model_type,
+        'feature_names': list(feature_names),
+        'edges': edges,
+        'counts': bin_counts(X_train, edges),
+        'n': len(X_train),
+        'created_at': datetime.now().isoformat(),
+    }
+    joblib.dump(reference, path)
+    print(f"📐 Drift reference for {len(reference['feature_names'])} features saved to {os.path.basename(path)}")
+    return reference
+
+
+def reference_id(reference):
+    digest = hashlib.sha256(json.dumps(reference['feature_names']).encode())
+    digest.update(np.ascontiguousarray(reference['edges']).tobytes())
+    return digest.hexdigest()[:12]
+
+
+def psi_status(psi):
+    return next(name for limit, name in PSI_LEVELS if psi < limit)
+
+
+def compare(reference, counts):
+    """Per-feature PSI and binned KS of live counts against the reference"""
+    expected = reference['counts'] / reference['n']
+    n = int(counts[0].sum())
+    observed = counts / n
+    e, o = np.maximum(expected, PSI_FLOOR), np.maximum(observed, PSI_FLOOR)
+    psi = ((o - e) * np.log(o / e)).sum(axis=1)
+    ks = np.abs(np.cumsum(observed, axis=1) - np.cumsum(expected, axis=1)).max(axis=1)
+    ks_p = kolmogorov(np.sqrt(n * reference['n'] / (n + reference['n'])) * ks)
+    features = [{
+        'feature': name,
+        'psi': round(float(psi[j]), 4),
+        'ks': round(float(ks[j]), 4),
+        'ks_p_value': round(float(ks_p[j]), 4),
+        'status': psi_status(psi[j]),
+        'expected': np.round(expected[j], 3).tolist(),
+        'observed': np.round(observed[j], 3).tolist(),
+    } for j, name in enumerate(reference['feature_names'])]
+    worst = max(features, key=lambda f: f['psi'])
+    return {'n': n, 'status': worst['status'], 'max_psi_feature': worst['feature'], 'features': features}
+
+
+def _write_json(path, data):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+
+class DriftMonitor:
+    def __init__(self, model_type, reference_path=None, directory=None, interval=DRIFT_INTERVAL_SECONDS):
+        self.model_type = model_type
+        self.interval = interval
+        try:
+            self.reference = joblib.load(reference_path or os.path.join(BACKEND_DIR, DRIFT_REFERENCES[model_type]))
+        except FileNotFoundError:
+            print(f"⚠️  No {model_type} drift reference; run drift_monitor.py --reference")
+            self.reference = None
+            return
+        self.directory = os.path.join(directory or DRIFT_COUNTS_DIR, model_type, reference_id(self.reference))
+        edges = self.reference['edges']
+        self._shape = (edges.shape[0], edges.shape[1] + 1)
+        # (bins-1 x features), compared with a (1 x features) row as is; inf padding stays inf
+        self._edges = np.ascontiguousarray(edges.T, dtype=np.float64)
+        # Flat counter index of bin 0 of each feature
+        self._offsets = np.arange(edges.shape[0]) * self._shape[1]
+        self._counts = None
+        self._pid = None
+        self._job_started = None
+        self._job_running = False
+        self._lock = threading.Lock()
+
+    def _open_counts(self):
+        """This process's counter file, created after gunicorn forks the worker"""
+        self._pid, self._counts = os.getpid(), None
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f"{socket.gethostname()}-{self._pid}.i64")
+            mode = 'r+' if os.path.exists(path) else 'w+'
+            self._mapped = np.memmap(path, dtype=np.int64, mode=mode, shape=(self._shape[0] * self._shape[1],))
+        except OSError as e:
+            # Predictions go on without drift counts
+            print(f"Warning: drift counters unavailable: {e}")
+            return
+        # Plain ndarray view of the same pages: skips np.memmap's per-operation overhead
+        self._counts = self._mapped.view(np.ndarray)
+
+    def observe(self, row):
+        """Count one scored (1 x features) row; the serving-path hook"""
+        if self.reference is None:
+            return
+        if self._pid != os.getpid():
+            self._open_counts()
+        if self._counts is None:
+            return
+        bins = (self._edges <= row).sum(axis=0)
+        self._counts[self._offsets + bins] += 1
+
+    @property
+    def compacted_path(self):
+        return os.path.join(self.directory, 'compacted.json')
+
+    def _load_compacted(self):
+        try:
+            with open(self.compacted_path) as f:
+                compacted = json.load(f)
+        except FileNotFoundError:
+            return np.zeros(self._shape, dtype=np.int64), []
+        return np.asarray(compacted['counts'], dtype=np.int64), compacted['folded']
+
+    def totals(self):
+        """Counts summed over every worker's file and the compacted counts of exited workers"""
+        total, folded = self._load_compacted()
+        for path in glob.glob(os.path.join(self.directory, '*.i64')):
+            if os.path.basename(path) in folded:
+                continue
+            counts = np.fromfile(path, dtype=np.int64)
+            if counts.size == total.size:
+                total += counts.reshape(self._shape)
+        return total
+
+    def compact(self):
+        """Fold the counter files of exited workers on this host into compacted.json; call under _job_lock"""
+        counts, folded = self._load_compacted()
+        # Files folded by a run that stopped before deleting them are already counted
+        for name in folded:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(os.path.join(self.directory, name))
+        prefix = f"{socket.gethostname()}-"
+        dead = []
+        for path in glob.glob(os.path.join(self.directory, prefix + '*.i64')):
+            pid = os.path.basename(path)[len(prefix):-len('.i64')]
+            if not pid.isdigit() or int(pid) == os.getpid() or _pid_alive(int(pid)):
+                continue
+            file_counts = np.fromfile(path, dtype=np.int64)
+            if file_counts.size == counts.size:
+                counts += file_counts.reshape(self._shape)
+            dead.append(path)
+        if not dead:
+            return 0
+        _write_json(self.compacted_path, {'counts': counts.tolist(),
+                                          'folded': [os.path.basename(p) for p in dead]})
+        for path in dead:
+            os.remove(path)
+        return len(dead)
+
+    @contextlib.contextmanager
+    def _job_lock(self):
+        """Exclusive across the processes that share the counter directory"""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, '.lock'), 'a+b') as f:
+            try:
+                import fcntl
+            except ImportError:  # Windows
+                import msvcrt
+                f.seek(0)
+                # Retries for about 10 seconds, then raises OSError and this run is skipped
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                try:
+                    yield
+                finally:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+                return
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    @property
+    def report_path(self):
+        return os.path.join(self.directory, 'report.json')
+
+    def load_report(self):
+        try:
+            with open(self.report_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _report_age(self):
+        try:
+            return time.time() - os.path.getmtime(self.report_path)
+        except FileNotFoundError:
+            return np.inf
+
+    def run_job(self, min_age=0):
+        """
+        Compare all traffic and the latest full window with the reference; writes report.json.
+        Returns the existing report instead if it is younger than min_age seconds.
+        """
+        with self._job_lock():
+            # Another worker may have just run it
+            if min_age and self._report_age() < min_age:
+                return self.load_report()
+            self.compact()
+            return self._run_job()
+
+    def _run_job(self):
+        previous = self.load_report() or {}
+        totals = self.totals()
+        now = datetime.now().isoformat()
+
+        window_start = np.asarray(previous.get('window_start_counts', np.zeros_like(totals)))
+        window_counts = totals - window_start
+        window = previous.get('window')
+        window_started_at = previous.get('window_started_at', previous.get('computed_at', now))
+        if window_counts[0].sum() >= DRIFT_WINDOW_MIN:
+            window = {'from': window_started_at, 'to': now, **compare(self.reference, window_counts)}
+            window_start, window_started_at = totals, now
+
+        report = {
+            'model_type': self.model_type,
+            'reference': {'id': reference_id(self.reference), 'n': self.reference['n'],
+                          'created_at': self.reference['created_at']},
+            'computed_at': now,
+            'cumulative': compare(self.reference, totals) if totals[0].sum() else None,
+            'window': window,
+            'window_started_at': window_started_at,
+            'window_start_counts': np.asarray(window_start).tolist(),
+        }
+        _write_json(self.report_path, report)
+        return report
+
+    def run_job_if_stale(self):
+        """Start the drift job in a background thread once the report is older than the interval"""
+        now = time.monotonic()
+        if self._job_started is not None and now - self._job_started < self.interval:
+            return
+        with self._lock:
+            if self._job_running or (self._job_started is not None and now - self._job_started < self.interval):
+                return
+            self._job_running, self._job_started = True, now
+
+        def run():
+            try:
+                if self._report_age() >= self.interval:
+                    self.run_job(min_age=self.interval)
+            except Exception as e:
+                print(f"Warning: drift job failed: {e}")
+            finally:
+                self._job_running = False
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def report(self):
+        """The latest report without the window bookkeeping, or None before any traffic"""
+        if self.reference is None:
+            return None
+        self.run_job_if_stale()
+        report = self.load_report()
+        if report is None:
+            return None
+        return {k: v for k, v in report.items() if k not in ('window_start_counts', 'window_started_at')}
+
+
+def _pid_alive(pid):
+    if os.name == 'nt':
+        # os.kill would terminate the process there; its file is left alone
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def drift_metrics(monitors, model_type=None):
+    """The /metrics/drift response for all monitors, or one model type (KeyError if unknown)"""
+    selected = {model_type: monitors[model_type]} if model_type else monitors
+    return {'models': {name: monitor.report() if monitor is not None else None
+                       for name, monitor in selected.items()}}
+
+
+def _write_references():
+    from training_data import load_dataset
+    from sklearn.model_selection import train_test_split
+    for model_type, n_samples in (('clinical', 1000), ('lifestyle', 2000)):
+        X, y, feature_names = load_dataset(model_type, n_samples=n_samples)
+        # The same training split as train_model.py / train_lifestyle_model.py
+        X_train, _, _, _ = train_test_split(np.asarray(X), np.asarray(y), test_size=0.2,
+                                            random_state=42, stratify=y)
+        save_reference(model_type, X_train, feature_names)
+
+
+def _benchmark(model_type, n=100_000):
+    with tempfile.TemporaryDirectory() as directory:
+        monitor = DriftMonitor(model_type, directory=directory, interval=10 ** 9)
+        width = monitor._shape[0]
+        rows = np.random.default_rng(0).normal(size=(n, 1, width))
+        monitor.observe(rows[0])
+        started = time.perf_counter()
+        for row in rows:
+            monitor.observe(row)
+        per_row = (time.perf_counter() - started) / n
+        assert monitor.totals()[0].sum() == n + 1
+        started = time.perf_counter()
+        monitor.run_job()
+        job = time.perf_counter() - started
+    print(f"⏱️  {model_type}: observe() {per_row * 1e6:.1f} µs per row, drift job {job * 1000:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare live model inputs with the training distribution")
+    parser.add_argument('--model', choices=list(DRIFT_REFERENCES), help='default: every model')
+    parser.add_argument('--reference', action='store_true', help='write the reference histograms from the training data')
+    parser.add_argument('--benchmark', action='store_true', help='time the serving-path update')
+    args = parser.parse_args()
+    models = [args.model] if args.model else list(DRIFT_REFERENCES)
+
+    if args.reference:
+        _write_references()
+        return
+    for model_type in models:
+        if args.benchmark:
+            _benchmark(model_type)
+            continue
+        monitor = DriftMonitor(model_type)
+        if monitor.reference is None:
+            continue
+        report = monitor.run_job()
+        cumulative = report['cumulative']
+        if cumulative is None:
+            print(f"📭 {model_type}: no traffic since the reference was deployed")
+            continue
+        print(f"📊 {model_type}: {cumulative['n']:,} rows, {cumulative['status']} "
+              f"(max PSI {max(f['psi'] for f in cumulative['features']):.3f} on {cumulative['max_psi_feature']})")
+        for feature in cumulative['features']:
+            print(f"   {feature['feature']:<22} PSI {feature['psi']:.3f}  KS {feature['ks']:.3f} "
+                  f"(p={feature['ks_p_value']:.3f})  {feature['status']}")
+
+
+if __name__ == "__main__":
+    main()
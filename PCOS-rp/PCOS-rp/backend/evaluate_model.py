@@ -5,6 +5,7 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 from sklearn.metrics import classification_report, confusion_matrix, roc_curve, roc_auc_score
 from sklearn.model_selection import learning_curve
+from training_data import load_dataset
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -23,8 +24,7 @@ def evaluate_model_performance():
     
     # Generate test data (same as training for consistency)
     print("\n🔄 Generating test dataset...")
-    from train_model import generate_synthetic_pcos_data
-    X, y, _ = generate_synthetic_pcos_data(500)  # Fresh test set
+    X, y, _ = load_dataset('clinical', n_samples=500)  # Fresh test set
     
     # Scale the data
     X_scaled = scaler.transform(X)
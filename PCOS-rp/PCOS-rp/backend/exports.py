@@ -0,0 +1,149 @@
+"""
+Streaming exports of a user's full history.
+
+Rows are read through a named (server-side) cursor, so Postgres hands them
+over `itersize` at a time, and are written to the client as they arrive by a
+Response generator. The worker holds one batch at most, whatever the size of
+the history.
+
+Formats: NDJSON (one JSON object per line, the default) and CSV. Nested
+values such as input_data are written as JSON strings in CSV.
+"""
+
+import csv
+import io
+import json
+import uuid
+from datetime import date, datetime
+
+from flask import Response, jsonify
+
+from feature_store import VECTOR_SQL, JOIN_INPUTS_SQL, vector_to_inputs
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+# Rows fetched per round trip, and rows per chunk written to the client
+EXPORT_ITERSIZE = 2000
+
+# Prediction history, oldest first, with the inputs rebuilt from the stored vector
+HISTORY_EXPORT_SQL = f"""
+    SELECT p.id, p.created_at, p.prediction_type, p.model_version, p.prediction_result,
+           p.probability, p.risk_level, p.input_data, {VECTOR_SQL}, mv.feature_names
+    FROM predictions p
+    {JOIN_INPUTS_SQL}
+    LEFT JOIN model_versions mv ON mv.version = p.model_version
+    WHERE p.user_id = %s {{since_clause}}
+    ORDER BY p.created_at
+"""
+HISTORY_EXPORT_COLUMNS = ['id', 'created_at', 'prediction_type', 'model_version', 'prediction_result',
+                          'probability', 'risk_level', 'input_data', 'feature_vector', 'feature_names']
+HISTORY_EXPORT_FIELDS = HISTORY_EXPORT_COLUMNS[:-2]
+
+
+def history_export_row(record):
+    vector = record.pop('feature_vector')
+    names = record.pop('feature_names')
+    if record['input_data'] is None:
+        record['input_data'] = vector_to_inputs(names, vector)
+    return record
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def _csv_value(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=_json_default)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _encode_ndjson(records):
+    return ''.join(json.dumps(r, default=_json_default) + '\n' for r in records)
+
+
+def _encode_csv(records, columns, header=False):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(columns)
+    writer.writerows([_csv_value(r.get(c)) for c in columns] for r in records)
+    return buffer.getvalue()
+
+
+def _close(conn, cur):
+    try:
+        cur.close()
+        conn.rollback()
+    finally:
+        conn.close()
+
+
+def stream_query(conn, cur, columns, fmt, transform=None, fields=None):
+    """
+    Yield the rows of an executed named cursor, encoded, one batch of
+    `cur.itersize` rows per chunk. `columns` names the selected columns in
+    order; `transform` may rewrite each row dict into the exported `fields`
+    (default: `columns`). Closes `conn` when the stream ends or the client
+    goes away.
+    """
+    fields = fields or columns
+    try:
+        if fmt == 'csv':
+            yield _encode_csv([], fields, header=True)
+
+        batch = []
+        for row in cur:
+            record = dict(zip(columns, row))
+            batch.append(transform(record) if transform else record)
+            if len(batch) >= cur.itersize:
+                yield _encode_csv(batch, fields) if fmt == 'csv' else _encode_ndjson(batch)
+                batch = []
+        if batch:
+            yield _encode_csv(batch, fields) if fmt == 'csv' else _encode_ndjson(batch)
+    except Exception as e:
+        # Headers are already sent, so the best we can do is end the stream early
+        print(f"Export stream error: {e}")
+    finally:
+        _close(conn, cur)
+
+
+def export_response(conn, sql, params, columns, fmt, filename, transform=None, fields=None,
+                    itersize=EXPORT_ITERSIZE):
+    """
+    Streaming attachment Response for `sql` in the requested format. The
+    query is declared up front, so errors still become a JSON 500.
+    """
+    cur = conn.cursor(name=f"export_{uuid.uuid4().hex}")
+    cur.itersize = itersize
+    try:
+        cur.execute(sql, params)
+    except Exception as e:
+        print(f"Export query error: {e}")
+        _close(conn, cur)
+        return jsonify({'error': 'Failed to export data'}), 500
+
+    return Response(
+        stream_query(conn, cur, columns, fmt, transform, fields),
+        mimetype=EXPORT_FORMATS[fmt],
+        headers={
+            'Content-Disposition': f'attachment; filename="{filename}.{fmt}"',
+            'X-Accel-Buffering': 'no',
+        },
+    )
+
+
+def history_export_response(conn, user_id, fmt, since=None):
+    """Export of the user's predictions, optionally from `since` onwards"""
+    since_clause = "AND p.created_at >= %s" if since else ""
+    params = (user_id, since) if since else (user_id,)
+    return export_response(conn, HISTORY_EXPORT_SQL.format(since_clause=since_clause), params,
+                           HISTORY_EXPORT_COLUMNS, fmt, 'pcos_history',
+                           transform=history_export_row, fields=HISTORY_EXPORT_FIELDS)
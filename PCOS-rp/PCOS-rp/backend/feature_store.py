@@ -0,0 +1,188 @@
+"""
+Compact storage of scored feature vectors.
+
+Instead of persisting the whole request body as JSONB, the scored inputs are
+stored as a fixed-order REAL[] plus the model_version whose feature list
+defines that order. The feature lists live once in model_versions, and the raw
+JSON is only kept when STORE_RAW_INPUT=1.
+
+Vectors are content-addressed: prediction_inputs holds each distinct
+(model_version, vector) once, keyed by its SHA-256, and predictions point at
+it through input_id. A user re-running the same form adds a prediction row
+but no new vector.
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from partitions import insert_partitioned
+
+# Keep the full request JSON in predictions.input_data as well (off by default)
+STORE_RAW_INPUT = os.environ.get('STORE_RAW_INPUT', '0') == '1'
+
+MODEL_VERSIONS_DDL = """
+    CREATE TABLE IF NOT EXISTS model_versions (
+        version VARCHAR(64) PRIMARY KEY,
+        model_type VARCHAR(20) NOT NULL,
+        feature_names TEXT[] NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+PREDICTION_INPUTS_DDL = """
+    CREATE TABLE IF NOT EXISTS prediction_inputs (
+        id BIGSERIAL PRIMARY KEY,
+        input_hash BYTEA UNIQUE NOT NULL,
+        model_version VARCHAR(64) NOT NULL,
+        feature_vector REAL[] NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+# Columns added to predictions on top of the original schema. feature_vector
+# is only set on rows that predate prediction_inputs.
+PREDICTION_VECTOR_COLUMNS = [
+    "ALTER TABLE predictions ADD COLUMN IF NOT EXISTS feature_vector REAL[]",
+    "ALTER TABLE predictions ADD COLUMN IF NOT EXISTS model_version VARCHAR(64)",
+    "ALTER TABLE predictions ADD COLUMN IF NOT EXISTS prediction_type VARCHAR(20) DEFAULT 'clinical'",
+    "ALTER TABLE predictions ADD COLUMN IF NOT EXISTS input_id BIGINT REFERENCES prediction_inputs(id)",
+]
+
+# Upsert the input and insert the prediction in one statement. If a
+# concurrent transaction commits the same input between our snapshot and the
+# conflict check, neither branch of input_row sees it and nothing is inserted;
+# insert_prediction() then simply runs the statement again.
+_INSERT_PREDICTION_SQL = """
+    WITH new_input AS (
+        INSERT INTO prediction_inputs (input_hash, model_version, feature_vector)
+        VALUES (%(input_hash)s, %(model_version)s, %(feature_vector)s::real[])
+        ON CONFLICT (input_hash) DO NOTHING
+        RETURNING id
+    ), input_row AS (
+        SELECT id FROM new_input
+        UNION ALL
+        SELECT id FROM prediction_inputs WHERE input_hash = %(input_hash)s
+        LIMIT 1
+    )
+    INSERT INTO predictions
+        (user_id, prediction_result, probability, risk_level, input_data,
+         input_id, model_version, prediction_type)
+    SELECT %(user_id)s, %(prediction_result)s, %(probability)s, %(risk_level)s, %(input_data)s,
+           input_row.id, %(model_version)s, %(prediction_type)s
+    FROM input_row
+    RETURNING id
+"""
+
+# SQL expression for a prediction's vector, whichever table holds it
+VECTOR_SQL = "COALESCE(pi.feature_vector, p.feature_vector)"
+JOIN_INPUTS_SQL = "LEFT JOIN prediction_inputs pi ON pi.id = p.input_id"
+
+# /predictions/history: a user's newest predictions since a date, with the
+# stored vector and the feature names to rebuild input_data from
+HISTORY_SQL = f"""
+    SELECT p.*, {VECTOR_SQL} AS stored_vector, mv.feature_names
+    FROM predictions p
+    {JOIN_INPUTS_SQL}
+    LEFT JOIN model_versions mv ON mv.version = p.model_version
+    WHERE p.user_id=%s AND p.created_at >= %s
+    ORDER BY p.created_at DESC
+    LIMIT %s
+"""
+
+
+def ensure_feature_store(cur):
+    """
+    Create model_versions and prediction_inputs, and add the new columns to an
+    existing predictions table. Call before creating predictions, whose
+    partitioned DDL already includes the columns and references prediction_inputs.
+    """
+    cur.execute(MODEL_VERSIONS_DDL)
+    cur.execute(PREDICTION_INPUTS_DDL)
+    cur.execute("SELECT to_regclass('predictions') IS NOT NULL")
+    if cur.fetchone()[0]:
+        for statement in PREDICTION_VECTOR_COLUMNS:
+            cur.execute(statement)
+
+
+def model_version(model_type, model_path):
+    """Version id for a model artifact: its type plus a short hash of the file"""
+    digest = hashlib.sha256()
+    with open(model_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return f"{model_type}-{digest.hexdigest()[:12]}"
+
+
+# Version id of results from the rule-based lifestyle assessment
+LIFESTYLE_RULES_VERSION = "lifestyle-rules-1"
+
+
+def legacy_model_version(feature_names):
+    """
+    Version id for rows scored before model versions were recorded, by a model
+    that no longer exists: 'legacy-' plus a short hash of the feature list
+    """
+    return f"legacy-{hashlib.sha256(json.dumps(list(feature_names)).encode()).hexdigest()[:12]}"
+
+
+def register_model_version(cur, version, model_type, feature_names):
+    cur.execute("""
+        INSERT INTO model_versions (version, model_type, feature_names)
+        VALUES (%s, %s, %s)
+        ON CONFLICT (version) DO NOTHING
+    """, (version, model_type, list(feature_names)))
+
+
+def feature_vector(data, feature_names):
+    """
+    Fixed-order list of the inputs as stored in REAL[]; features that are
+    missing or not numeric are stored as NULL elements.
+    """
+    vector = []
+    for name in feature_names:
+        try:
+            vector.append(float(data[name]))
+        except (KeyError, TypeError, ValueError):
+            vector.append(None)
+    return vector
+
+
+def input_hash(model_version, vector):
+    """
+    Content address of an input: SHA-256 over the model version and the
+    vector's float32 bytes (NULL elements hashed as NaN), i.e. exactly the
+    values REAL[] stores.
+    """
+    values = np.array([np.nan if v is None else v for v in vector], dtype='<f4')
+    return hashlib.sha256(model_version.encode() + b'\0' + values.tobytes()).digest()
+
+
+def insert_prediction(cur, user_id, prediction_result, probability, risk_level,
+                      vector, version, prediction_type, input_data=None):
+    """Store one prediction and its (deduplicated) input vector; returns the prediction id"""
+    params = {
+        'input_hash': input_hash(version, vector),
+        'model_version': version,
+        'feature_vector': vector,
+        'user_id': user_id,
+        'prediction_result': int(prediction_result),
+        'probability': float(probability),
+        'risk_level': risk_level,
+        'input_data': input_data,
+        'prediction_type': prediction_type,
+    }
+    for _ in range(2):
+        row = insert_partitioned(cur, 'predictions', _INSERT_PREDICTION_SQL, params)
+        if row is not None:
+            return row[0]
+    raise RuntimeError("could not store prediction input")
+
+
+def vector_to_inputs(feature_names, vector):
+    """Rebuild the {feature: value} dict from a stored vector"""
+    if not feature_names or vector is None:
+        return None
+    return dict(zip(feature_names, vector))
@@ -0,0 +1,53 @@
+"""
+Ground-truth labels for stored predictions.
+
+POST /predictions/<id>/feedback records a confirmed diagnosis (label 0/1)
+for one of the user's own predictions in prediction_labels. A correction
+replaces the earlier label and takes a new id, so incremental_train.py, which
+reads labels in id order from a checkpoint, sees it again.
+"""
+
+PREDICTION_LABELS_DDL = """
+    CREATE TABLE IF NOT EXISTS prediction_labels (
+        id BIGSERIAL PRIMARY KEY,
+        prediction_id INTEGER UNIQUE NOT NULL,
+        user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+        label SMALLINT NOT NULL CHECK (label IN (0, 1)),
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+# Label values accepted in the request body
+LABEL_VALUES = {
+    0: 0, 1: 1, False: 0, True: 1,
+    '0': 0, '1': 1, 'no_pcos': 0, 'pcos': 1, 'healthy': 0,
+}
+
+
+def parse_label(data):
+    """0/1 from a {"label": ...} body, or None if it is missing or invalid"""
+    value = data.get('label')
+    if isinstance(value, str):
+        value = value.strip().lower()
+    try:
+        return LABEL_VALUES.get(value)
+    except TypeError:  # unhashable, e.g. a list
+        return None
+
+
+def record_label(cur, user_id, prediction_id, label):
+    """
+    Upsert the label of one of the user's predictions. Returns the label row
+    id, or None if the prediction does not exist or belongs to someone else.
+    """
+    cur.execute("""
+        INSERT INTO prediction_labels (prediction_id, user_id, label)
+        SELECT p.id, p.user_id, %s FROM predictions p
+        WHERE p.id = %s AND p.user_id = %s
+        LIMIT 1
+        ON CONFLICT (prediction_id) DO UPDATE
+        SET label = EXCLUDED.label, id = DEFAULT, created_at = CURRENT_TIMESTAMP
+        RETURNING id
+    """, (label, prediction_id, user_id))
+    row = cur.fetchone()
+    return row[0] if row else None
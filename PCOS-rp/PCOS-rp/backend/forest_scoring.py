@@ -0,0 +1,434 @@
+"""
+Vectorized scoring of a fitted RandomForestClassifier.
+
+CompiledForest copies the trees of a forest into padded (trees x nodes)
+arrays: split feature, threshold, children and the positive-class fraction
+of every node. Leaves point to themselves, so a batch of rows walks any set
+of trees in `depth` numpy steps and the leaf values give every tree's vote.
+Rows are cast to float32 before the comparisons, as sklearn's trees do, so
+split decisions and probabilities match predict_proba.
+
+Early exit: predict_risk_early_exit() evaluates the trees in blocks, in a
+fixed order. After k of T trees with vote sum S, the final probability can
+only lie in [S / T, (S + T - k) / T], since every remaining vote is in [0, 1].
+A row stops as soon as both ends of that interval fall in the same
+Low/Moderate/High band, so its band is exactly the full forest's. That bound
+assumes the worst about every remaining tree and rarely saves more than a
+third of them; with `delta` the interval is also narrowed by Serfling's
+inequality (the trees of a forest are exchangeable, so the votes seen are a
+sample drawn without replacement), and a row's band then differs from the
+full forest's with probability at most delta. Only the band is settled: the
+mean of the trees seen so far is not the forest's probability and can even
+fall on the other side of 0.5, so score_row() returns no probability then.
+
+float32 serving: CompiledForest(model, dtype=np.float32) stores thresholds,
+leaf values and node indices in 32 bits. A float32 threshold is the largest
+float32 not above the float64 one, so `x <= t32` and `x <= t64` agree for
+every float32 x. Request values are coerced once to a contiguous float64 row
+(coerce_features); Float32Scaler standardizes it in float64 and casts the
+result to float32 once, which is what predict_proba(scaler.transform(row))
+feeds the trees. The split decisions, and so the probabilities, are then
+exactly sklearn's for the same request values.
+
+Contributions: explain() splits each probability Saabas-style into the
+forest's base rate (the mean root value) plus one term per feature, the
+summed value change of every split on that feature along the row's paths,
+averaged over the trees. The change for each (node, child) edge is stored
+with the children, so the traversal adds it into a (rows x features) total
+with one bincount per level: O(trees x depth), no second pass.
+
+Uncertainty: score() returns every tree's vote, the same (rows x trees)
+matrix the probability is averaged from, so vote_dispersion() reads the
+spread of the votes (standard deviation, quantiles, share of trees agreeing
+with the forest's label) without walking the forest again.
+
+Usage (benchmarks on synthetic rows):
+    python forest_scoring.py early-exit [--model lifestyle|clinical] [--samples 10000] [--block 10]
+        [--delta 0.001]
+    python forest_scoring.py float32 [--model lifestyle|clinical] [--samples 10000]
+    python forest_scoring.py contributions [--model lifestyle|clinical]
+"""
+
+import argparse
+import pickle
+import time
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+# Same cut-offs as the API's risk levels
+RISK_THRESHOLDS = np.array([0.3, 0.7])
+RISK_LEVEL_NAMES = np.array(['Low', 'Moderate', 'High'], dtype=object)
+
+DEFAULT_BLOCK = 10
+VOTE_QUANTILES = (0.1, 0.5, 0.9)
+
+
+def risk_bands(probabilities):
+    """0/1/2 (Low/Moderate/High) for each probability"""
+    return np.searchsorted(RISK_THRESHOLDS, probabilities, side='right')
+
+
+def is_forest(model):
+    return isinstance(model, RandomForestClassifier)
+
+
+def vote_dispersion(votes, quantiles=VOTE_QUANTILES):
+    """
+    Spread of the (rows x trees) votes: (standard deviation, (rows x
+    quantiles) vote quantiles, share of trees on the forest's side of 0.5)
+    """
+    p = votes.mean(axis=1, keepdims=True)
+    agreement = ((votes > 0.5) == (p > 0.5)).mean(axis=1)
+    return votes.std(axis=1), np.quantile(votes, quantiles, axis=1).T, agreement
+
+
+def coerce_features(values, feature_names=None):
+    """
+    One request's feature values as a contiguous (1 x n) float64 row. Raises
+    ValueError naming the first value that is not a finite number.
+    """
+    try:
+        row = np.ascontiguousarray(np.asarray(values, dtype=np.float64).reshape(1, -1))
+    except (TypeError, ValueError):
+        row = None
+    if row is None or row.shape[1] != len(values) or not np.isfinite(row).all():
+        for i, value in enumerate(values):
+            try:
+                ok = np.isfinite(np.float64(value)) and not isinstance(value, (list, dict))
+            except (TypeError, ValueError):
+                ok = False
+            if not ok:
+                name = feature_names[i] if feature_names is not None else f"#{i}"
+                raise ValueError(f"Feature {name} must be a number, got {value!r}")
+    return row
+
+
+def float32_thresholds(threshold):
+    """Largest float32 <= each float64 threshold (x <= t32 iff x <= t64 for float32 x)"""
+    rounded = threshold.astype(np.float32)
+    return np.where(rounded > threshold, np.nextafter(rounded, np.float32(-np.inf)), rounded)
+
+
+class Float32Scaler:
+    """
+    A fitted StandardScaler's transform, computed in float64 as sklearn does
+    and cast to float32 once, as sklearn's trees do with their input
+    """
+
+    def __init__(self, scaler):
+        self.mean = np.asarray(scaler.mean_ if scaler.with_mean else 0, dtype=np.float64)
+        self.scale = np.asarray(scaler.scale_ if scaler.with_std else 1, dtype=np.float64)
+
+    def transform(self, X):
+        return ((np.asarray(X, dtype=np.float64) - self.mean) / self.scale).astype(np.float32)
+
+
+class CompiledForest:
+    def __init__(self, model, dtype=np.float64):
+        if not is_forest(model):
+            raise TypeError(f"{type(model).__name__} is not a random forest")
+        trees = [estimator.tree_ for estimator in model.estimators_]
+        positive = list(model.classes_).index(1)
+        n_trees, n_nodes = len(trees), max(tree.node_count for tree in trees)
+        self.dtype = np.dtype(dtype)
+        index = np.int32 if self.dtype == np.float32 else np.intp
+
+        self.n_trees = n_trees
+        self.n_features = model.n_features_in_
+        self.depth = max(tree.max_depth for tree in trees)
+        self.feature = np.zeros((n_trees, n_nodes), dtype=index)
+        self.threshold = np.full((n_trees, n_nodes), np.inf, dtype=self.dtype)
+        self.value = np.zeros((n_trees, n_nodes), dtype=self.dtype)
+        # (left, right) child of every node as a flat index tree * n_nodes + node
+        own = np.arange(n_trees, dtype=index)[:, None] * n_nodes + np.arange(n_nodes, dtype=index)
+        self.children = np.stack([own, own], axis=-1)
+
+        for i, tree in enumerate(trees):
+            n = tree.node_count
+            internal = tree.children_left != -1
+            self.feature[i, :n] = np.where(internal, tree.feature, 0)
+            threshold = float32_thresholds(tree.threshold) if self.dtype == np.float32 else tree.threshold
+            self.threshold[i, :n] = np.where(internal, threshold, np.inf)
+            self.children[i, :n, 0] = np.where(internal, i * n_nodes + tree.children_left, own[i, :n])
+            self.children[i, :n, 1] = np.where(internal, i * n_nodes + tree.children_right, own[i, :n])
+            # Class fractions of each node (sklearn >= 1.4 stores them normalized)
+            values = tree.value[:, 0, :]
+            self.value[i, :n] = values[:, positive] / values.sum(axis=1)
+
+        # Value change along each (node, left) and (node, right) edge; 0 at leaves
+        flat_value = self.value.ravel()
+        self.deltas = flat_value[self.children] - flat_value[own][..., None]
+        self.base_rate = float(self.value[:, 0].mean())
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.feature, self.threshold, self.children, self.value, self.deltas))
+
+    def leaves(self, X, trees=None):
+        """(rows x trees) leaf index of every row in each of `trees` (default: all)"""
+        return self._walk(X, trees)[0]
+
+    def _walk(self, X, trees=None, contributions=False):
+        """Leaf indices and, optionally, the (rows x features) sum of the edge deltas taken"""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        trees = np.arange(self.n_trees) if trees is None else np.asarray(trees)
+        # Flat indices: node i of tree t is t * width + i, feature j of row r is r * n_features + j
+        width = self.threshold.shape[1]
+        base = (trees * width)[None, :]
+        row_base = (np.arange(len(X)) * X.shape[1])[:, None]
+        feature, threshold, values = self.feature.ravel(), self.threshold.ravel(), X.ravel()
+        children, deltas = self.children.ravel(), self.deltas.ravel()
+        totals = np.zeros(X.size) if contributions else None
+
+        node = np.broadcast_to(base, (len(X), len(trees))).copy()
+        for _ in range(self.depth):
+            split = row_base + feature[node]
+            edge = 2 * node + (values[split] > threshold[node])
+            if contributions:
+                totals += np.bincount(split.ravel(), weights=deltas[edge].ravel(), minlength=X.size)
+            node = children[edge]
+        node -= base
+        return node, None if totals is None else totals.reshape(X.shape)
+
+    def tree_probabilities(self, X, trees=None):
+        """(rows x trees) positive-class vote of each tree"""
+        trees = np.arange(self.n_trees) if trees is None else np.asarray(trees)
+        return self.value[trees[None, :], self.leaves(X, trees)]
+
+    def predict_proba(self, X):
+        p = self.tree_probabilities(X).mean(axis=1, dtype=np.float64)
+        return np.column_stack([1 - p, p])
+
+    def score(self, X, explain=False):
+        """
+        One traversal: the (rows x trees) votes and, with explain, the
+        (rows x features) contributions (None otherwise)
+        """
+        trees = np.arange(self.n_trees)
+        node, totals = self._walk(X, trees, contributions=explain)
+        return self.value[trees[None, :], node], None if totals is None else totals / self.n_trees
+
+    def explain(self, X):
+        """
+        (positive-class probabilities, (rows x features) contributions); each
+        row's contributions sum to its probability minus base_rate.
+        """
+        votes, contributions = self.score(X, explain=True)
+        return votes.mean(axis=1, dtype=np.float64), contributions
+
+    def predict_risk_early_exit(self, X, block=DEFAULT_BLOCK, delta=None):
+        """
+        Risk band of every row, stopping each row once its band is settled
+        (exactly, or with probability 1 - delta). Returns (probability
+        estimates, bands, trees evaluated per row). The estimate is the mean
+        vote of the evaluated trees, exact for rows that needed every tree.
+        """
+        n, T = len(X), self.n_trees
+        X = np.asarray(X, dtype=np.float32)
+        votes = np.zeros(n)
+        evaluated = np.zeros(n, dtype=np.int64)
+        estimate = np.zeros(n)
+        bands = np.zeros(n, dtype=np.int64)
+        active = np.arange(n)
+
+        for start in range(0, T, block):
+            trees = np.arange(start, min(start + block, T))
+            cumulative = votes[active, None] + np.cumsum(self.tree_probabilities(X[active], trees), axis=1)
+            seen = start + np.arange(1, len(trees) + 1)
+            lower, upper = cumulative / T, (cumulative + (T - seen)) / T
+            if delta is not None:
+                # Serfling: |mean of seen - mean of all| <= margin with probability 1 - delta
+                mean = cumulative / seen
+                margin = np.sqrt((1 - (seen - 1) / T) * np.log(2 / delta) / (2 * seen))
+                lower, upper = np.maximum(lower, mean - margin), np.minimum(upper, mean + margin)
+            lower_band = risk_bands(lower)
+            settled = lower_band == risk_bands(upper)
+
+            done = settled.any(axis=1)
+            first = np.argmax(settled, axis=1)
+            finished = active[done]
+            bands[finished] = lower_band[done, first[done]]
+            estimate[finished] = cumulative[done, first[done]] / seen[first[done]]
+            evaluated[active] = trees[-1] + 1
+
+            votes[active] = cumulative[:, -1]
+            active = active[~done]
+            if not len(active):
+                break
+
+        return estimate, bands, evaluated
+
+
+def compile_for_serving(model, scaler):
+    """(float32 CompiledForest, Float32Scaler) for a forest, None for other models"""
+    if not is_forest(model):
+        return None
+    return CompiledForest(model, dtype=np.float32), Float32Scaler(scaler)
+
+
+def score_row(model, scaler, row, compiled=None, early_exit=False, delta=None, explain=False):
+    """
+    (prediction, [healthy, pcos] probabilities, details) for one coerced row.
+    Forests compiled with compile_for_serving are scored from their float32
+    arrays and fill details with 'trees_evaluated' and, from the same pass,
+    the vote 'uncertainty' and with explain the per-feature 'contributions'
+    (both need every tree, so neither comes with early_exit). Other models go
+    through sklearn and return empty details.
+
+    With early_exit only the risk band is exact: the result is (None, None,
+    details) with details['risk_level'], since the mean of the trees seen so
+    far can sit on the other side of 0.5 than the full forest's probability.
+    """
+    if compiled is None:
+        X = scaler.transform(row)
+        return int(model.predict(X)[0]), model.predict_proba(X)[0], {}
+    forest, forest_scaler = compiled
+    X = forest_scaler.transform(row)
+    details = {'trees_evaluated': forest.n_trees}
+    if early_exit:
+        _, bands, evaluated = forest.predict_risk_early_exit(X, delta=delta)
+        details['trees_evaluated'] = int(evaluated[0])
+        details['risk_level'] = RISK_LEVEL_NAMES[bands[0]]
+        return None, None, details
+    else:
+        votes, contributions = forest.score(X, explain)
+        p = float(votes[0].mean(dtype=np.float64))
+        std, quantiles, agreement = vote_dispersion(votes)
+        details['uncertainty'] = {
+            'vote_std': round(float(std[0]), 4),
+            **{f'vote_p{round(q * 100)}': round(float(v), 4) for q, v in zip(VOTE_QUANTILES, quantiles[0])},
+            'tree_agreement': round(float(agreement[0]), 4),
+        }
+        if explain:
+            details['contributions'] = contributions[0]
+    # predict() picks class 0 on a tie, as sklearn's argmax does
+    return int(p > 0.5), np.array([1 - p, p]), details
+
+
+def _benchmark_early_exit(model_type, n_samples, block, delta):
+    from score_csv import load_scoring_model, scale_features
+    from training_data import load_dataset
+
+    model, scaler, _ = load_scoring_model(model_type)
+    if not is_forest(model):
+        print(f"❌ The {model_type} model is a {type(model).__name__}, not a random forest")
+        return
+    forest = CompiledForest(model)
+    X, _, _ = load_dataset(model_type, n_samples=n_samples, seed=2024)
+    X_scaled = scale_features(scaler, X)
+
+    started = time.perf_counter()
+    full = model.predict_proba(X_scaled)[:, list(model.classes_).index(1)]
+    full_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    _, bands, evaluated = forest.predict_risk_early_exit(X_scaled, block, delta)
+    early_seconds = time.perf_counter() - started
+
+    agreement = (bands == risk_bands(full)).mean()
+    bound = f"Serfling, delta={delta}" if delta is not None else "exact"
+    print(f"⚡ Early-exit scoring of {n_samples:,} rows ({forest.n_trees} trees, blocks of {block}, {bound} bound):")
+    print(f"  Trees evaluated: {evaluated.mean():.1f} on average "
+          f"({evaluated.mean() / forest.n_trees * 100:.0f}% of the forest), median {np.median(evaluated):.0f}")
+    print(f"  Risk band agreement with full evaluation: {agreement * 100:.2f}%")
+    print(f"  Time: predict_proba {full_seconds * 1000:.0f} ms, early exit {early_seconds * 1000:.0f} ms")
+
+
+def _per_call_us(fn, X, repeats):
+    times = []
+    for i in range(repeats):
+        started = time.perf_counter()
+        fn(X[i % len(X):i % len(X) + 1] if len(X) > 1 and repeats > 1 else X)
+        times.append(time.perf_counter() - started)
+    return float(np.median(times) * 1e6)
+
+
+def _benchmark_float32(model_type, n_samples):
+    from score_csv import load_scoring_model, scale_features
+    from training_data import load_dataset
+
+    model, scaler, _ = load_scoring_model(model_type)
+    if not is_forest(model):
+        print(f"❌ The {model_type} model is a {type(model).__name__}, not a random forest")
+        return
+    X, _, _ = load_dataset(model_type, n_samples=n_samples, seed=2024)
+    X = np.asarray(X, dtype=np.float64)
+    forest64, forest32 = CompiledForest(model), CompiledForest(model, dtype=np.float32)
+    scaler32 = Float32Scaler(scaler)
+
+    X_scaled = scale_features(scaler, X)
+    reference = model.predict_proba(X_scaled)[:, 1]
+    exact = forest32.predict_proba(X_scaled)[:, 1]
+    served = forest32.predict_proba(scaler32.transform(coerce_features(X.ravel()).reshape(X.shape)))[:, 1]
+
+    paths = {
+        'sklearn float64': lambda rows: model.predict_proba(scale_features(scaler, rows)),
+        'compiled float64': lambda rows: forest64.predict_proba(scaler.transform(rows)),
+        'compiled float32': lambda rows: forest32.predict_proba(scaler32.transform(rows)),
+    }
+    X32 = np.ascontiguousarray(X, dtype=np.float32)
+    print(f"🧮 float32 inference, {model_type} forest ({forest32.n_trees} trees, {n_samples:,} rows):")
+    print(f"  Split decisions vs predict_proba (same scaled input): max |dp| {np.abs(exact - reference).max():.2e}")
+    print(f"  End to end with the float32 scaler: max |dp| {np.abs(served - reference).max():.2e}, "
+          f"risk band agreement {(risk_bands(served) == risk_bands(reference)).mean() * 100:.2f}%")
+    print(f"  Model memory: sklearn pickle {len(pickle.dumps(model)) / 1024:.0f} KB, "
+          f"compiled float64 {forest64.nbytes / 1024:.0f} KB, float32 {forest32.nbytes / 1024:.0f} KB")
+    print(f"  Batch of {n_samples:,} rows: input {X.nbytes / 1024:.0f} KB -> {X32.nbytes / 1024:.0f} KB, "
+          f"traversal state {n_samples * forest32.n_trees * 8 / 2**20:.1f} MB -> "
+          f"{n_samples * forest32.n_trees * 4 / 2**20:.1f} MB")
+    for name, fn in paths.items():
+        rows = X32 if 'float32' in name else X
+        single = _per_call_us(fn, rows, 300)
+        batch = _per_call_us(fn, rows, 1)
+        print(f"  {name:<17} single row {single:7.0f} µs, batch {batch / 1000:7.1f} ms "
+              f"({n_samples / batch * 1e6:,.0f} rows/s)")
+
+
+def _benchmark_contributions(model_type, sizes=(1, 10, 100, 1000, 10_000)):
+    from score_csv import load_scoring_model, scale_features
+    from training_data import load_dataset
+
+    model, scaler, _ = load_scoring_model(model_type)
+    if not is_forest(model):
+        print(f"❌ The {model_type} model is a {type(model).__name__}, not a random forest")
+        return
+    forest = CompiledForest(model, dtype=np.float32)
+    X, _, _ = load_dataset(model_type, n_samples=max(sizes), seed=2024)
+    X_scaled = scale_features(scaler, X).astype(np.float32)
+
+    p, contributions = forest.explain(X_scaled)
+    print(f"🔍 Per-row feature contributions, {model_type} forest ({forest.n_trees} trees, depth {forest.depth}):")
+    print(f"  |base rate + sum of contributions - p|: max {np.abs(forest.base_rate + contributions.sum(axis=1) - p).max():.1e}")
+    print(f"  {'rows':>6}  {'sklearn proba':>14}  {'compiled proba':>15}  {'with contributions':>19}  overhead")
+    for size in sizes:
+        rows = X_scaled[:size]
+        repeats = max(3, min(200, 20_000 // size))
+        timings = [_per_call_us(fn, rows, 1) for fn in (model.predict_proba, forest.predict_proba, forest.explain)
+                   for _ in range(repeats)]
+        sklearn_us, proba_us, explain_us = (float(np.median(timings[i * repeats:(i + 1) * repeats]))
+                                            for i in range(3))
+        print(f"  {size:>6,}  {sklearn_us / 1000:>11.2f} ms  {proba_us / 1000:>12.2f} ms  "
+              f"{explain_us / 1000:>16.2f} ms  {(explain_us / proba_us - 1) * 100:+6.0f}%")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vectorized forest scoring benchmarks")
+    sub = parser.add_subparsers(dest='command', required=True)
+    early = sub.add_parser('early-exit', help='trees evaluated and band agreement of early-exit scoring')
+    early.add_argument('--model', choices=['lifestyle', 'clinical'], default='lifestyle')
+    early.add_argument('--samples', type=int, default=10_000)
+    early.add_argument('--block', type=int, default=DEFAULT_BLOCK)
+    early.add_argument('--delta', type=float, help='allowed band error probability (default: exact bound)')
+    precision = sub.add_parser('float32', help='accuracy, memory and speed of the float32 path')
+    precision.add_argument('--model', choices=['lifestyle', 'clinical'], default='lifestyle')
+    precision.add_argument('--samples', type=int, default=10_000)
+    explain = sub.add_parser('contributions', help='cost of per-row contributions for batch sizes 1 to 10k')
+    explain.add_argument('--model', choices=['lifestyle', 'clinical'], default='lifestyle')
+    args = parser.parse_args()
+
+    if args.command == 'early-exit':
+        _benchmark_early_exit(args.model, args.samples, args.block, args.delta)
+    elif args.command == 'float32':
+        _benchmark_float32(args.model, args.samples)
+    elif args.command == 'contributions':
+        _benchmark_contributions(args.model)
@@ -5,52 +5,19 @@ from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import accuracy_score
 import joblib
+from training_data import load_dataset
 
 print("🎯 PCOS Model Accuracy Calculator")
 print("=" * 40)
 
-# Generate synthetic PCOS data
-np.random.seed(42)
-n_samples = 1000
-
-# Create realistic PCOS vs Healthy data
+# Shared synthetic PCOS data (cached on disk after the first run)
 print("📊 Creating dataset...")
-
-# Healthy patients (70%)
-n_healthy = 700
-healthy_features = np.column_stack([
-    np.random.normal(28, 6, n_healthy),      # Age
-    np.random.normal(23, 3, n_healthy),      # BMI (normal)
-    np.random.normal(12, 4, n_healthy),      # Insulin (normal)
-    np.random.normal(35, 10, n_healthy),     # Testosterone (normal)
-    np.random.normal(6, 2, n_healthy),       # LH (normal)
-    np.random.normal(7, 2, n_healthy),       # FSH (normal)
-    np.random.normal(90, 10, n_healthy),     # Glucose (normal)
-    np.random.normal(180, 30, n_healthy),    # Cholesterol (normal)
-])
-healthy_labels = np.zeros(n_healthy)
-
-# PCOS patients (30%)
-n_pcos = 300
-pcos_features = np.column_stack([
-    np.random.normal(26, 5, n_pcos),         # Age
-    np.random.normal(28, 5, n_pcos),         # BMI (higher)
-    np.random.normal(18, 6, n_pcos),         # Insulin (elevated)
-    np.random.normal(55, 15, n_pcos),        # Testosterone (elevated)
-    np.random.normal(12, 4, n_pcos),         # LH (elevated)
-    np.random.normal(6, 2, n_pcos),          # FSH
-    np.random.normal(105, 15, n_pcos),       # Glucose (higher)
-    np.random.normal(200, 40, n_pcos),       # Cholesterol (higher)
-])
-pcos_labels = np.ones(n_pcos)
-
-# Combine data
-X = np.vstack([healthy_features, pcos_features])
-y = np.concatenate([healthy_labels, pcos_labels])
+X, y, feature_names = load_dataset('clinical', n_samples=1000)
+n_healthy, n_pcos = int(np.sum(y == 0)), int(np.sum(y == 1))
 
 print(f"✅ Dataset created: {len(X)} samples")
-print(f"   Healthy: {len(healthy_labels)} patients")
-print(f"   PCOS: {len(pcos_labels)} patients")
+print(f"   Healthy: {n_healthy} patients")
+print(f"   PCOS: {n_pcos} patients")
 
 # Split into train and test sets
 X_train, X_test, y_train, y_test = train_test_split(
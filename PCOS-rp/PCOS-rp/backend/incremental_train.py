@@ -0,0 +1,197 @@
+"""
+Update a model with the labels collected through /predictions/<id>/feedback.
+
+Labeled predictions are read in label-id order from a per-model checkpoint,
+in keyset batches, and their stored feature vectors are scaled with the
+existing scaler. Each batch is scored before it is learned (so the printed
+accuracy is measured on unseen labels) and then:
+
+  - models with partial_fit are updated in place;
+  - LogisticRegression (the clinical model) has no partial_fit, so it is
+    turned into an SGDClassifier with log loss that starts from its
+    coefficients, and that model is updated from then on;
+  - RandomForestClassifier (the lifestyle model) grows --trees-per-batch
+    extra trees fitted on the batch with warm_start. A forest batch needs
+    both labels, so a one-sided batch is held back until more labels arrive.
+
+The updated model replaces the artifact and the checkpoint is moved in the
+same run, so new predictions are stored under a new model version.
+
+Usage:
+    python incremental_train.py [--model clinical|lifestyle] [--batch-size 500]
+        [--trees-per-batch 10] [--dry-run]
+"""
+
+import argparse
+import os
+import warnings
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.exceptions import ConvergenceWarning
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+from sklearn.metrics import accuracy_score
+
+from db import get_db_connection
+from feature_store import VECTOR_SQL, JOIN_INPUTS_SQL, model_version
+from feedback import PREDICTION_LABELS_DDL
+from rescore_predictions import rebuild_matrix
+from score_csv import BACKEND_DIR, MODEL_ARTIFACTS, load_scoring_model
+
+FEEDBACK_CHECKPOINTS_DDL = """
+    CREATE TABLE IF NOT EXISTS feedback_checkpoints (
+        model_type VARCHAR(20) PRIMARY KEY,
+        last_label_id BIGINT NOT NULL DEFAULT 0,
+        rows_learned BIGINT NOT NULL DEFAULT 0,
+        model_version VARCHAR(64),
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+LABELED_BATCH_SQL = f"""
+    SELECT l.id, p.input_data, {VECTOR_SQL}, mv.feature_names, l.label
+    FROM prediction_labels l
+    JOIN predictions p ON p.id = l.prediction_id
+    {JOIN_INPUTS_SQL}
+    LEFT JOIN model_versions mv ON mv.version = p.model_version
+    WHERE l.id > %s AND COALESCE(p.prediction_type, 'clinical') = %s
+    ORDER BY l.id
+    LIMIT %s
+"""
+
+
+def to_incremental(model, X, y):
+    """
+    Learn the first batch and return a model that later batches can update.
+    LogisticRegression becomes an SGDClassifier seeded with its coefficients.
+    """
+    if isinstance(model, LogisticRegression):
+        sgd = SGDClassifier(loss='log_loss', alpha=1.0 / (model.C * max(len(y), 1)),
+                            learning_rate='constant', eta0=0.01, max_iter=1, tol=None,
+                            random_state=42)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', ConvergenceWarning)
+            # One epoch over the batch, starting from the fitted coefficients
+            return sgd.fit(X, y, coef_init=model.coef_, intercept_init=model.intercept_)
+    return update(model, X, y)
+
+
+def update(model, X, y, trees_per_batch=10):
+    if hasattr(model, 'partial_fit'):
+        model.partial_fit(X, y, classes=np.array([0, 1]))
+    elif isinstance(model, RandomForestClassifier):
+        model.set_params(warm_start=True, n_estimators=len(model.estimators_) + trees_per_batch)
+        with warnings.catch_warnings():
+            # class_weight='balanced' weights the new trees by their own batch, which is intended
+            warnings.simplefilter('ignore', UserWarning)
+            model.fit(X, y)
+    else:
+        raise TypeError(f"{type(model).__name__} cannot be updated incrementally")
+    return model
+
+
+def fetch_batch(cur, model_type, last_id, batch_size, feature_names):
+    cur.execute(LABELED_BATCH_SQL, (last_id, model_type, batch_size))
+    rows = cur.fetchall()
+    if not rows:
+        return None, None, None, last_id
+    X = rebuild_matrix([row[:4] for row in rows], feature_names)
+    y = np.array([row[4] for row in rows], dtype=np.int64)
+    complete = ~np.isnan(X).any(axis=1)
+    return X[complete], y[complete], len(rows) - int(complete.sum()), rows[-1][0]
+
+
+def incremental_train(model_type, batch_size, trees_per_batch, dry_run):
+
+    model, scaler, feature_names = load_scoring_model(model_type)
+    model_path = os.path.join(BACKEND_DIR, MODEL_ARTIFACTS[model_type][0])
+
+    conn = get_db_connection()
+    if not conn:
+        print("❌ Could not connect to database")
+        return
+
+    cur = conn.cursor()
+    try:
+        cur.execute(PREDICTION_LABELS_DDL)
+        cur.execute(FEEDBACK_CHECKPOINTS_DDL)
+        cur.execute("""
+            INSERT INTO feedback_checkpoints (model_type) VALUES (%s)
+            ON CONFLICT (model_type) DO NOTHING
+        """, (model_type,))
+        cur.execute("SELECT last_label_id, rows_learned FROM feedback_checkpoints WHERE model_type = %s",
+                    (model_type,))
+        last_id, learned = cur.fetchone()
+        conn.commit()
+        print(f"🔄 Updating the {model_type} model with labels after id {last_id}")
+
+        consumed_id = last_id
+        pending_X, pending_y = [], []
+        new_rows = skipped = 0
+        while True:
+            X, y, missing, next_id = fetch_batch(cur, model_type, last_id, batch_size, feature_names)
+            if X is None:
+                break
+            last_id = next_id
+            skipped += missing
+            pending_X.append(X)
+            pending_y.append(y)
+            X, y = np.vstack(pending_X), np.concatenate(pending_y)
+            if len(y) == 0 or (isinstance(model, RandomForestClassifier) and len(set(y)) < 2):
+                continue  # a forest batch needs both labels
+
+            X_scaled = scaler.transform(pd.DataFrame(X, columns=scaler.feature_names_in_)
+                                        if hasattr(scaler, 'feature_names_in_') else X)
+            accuracy = accuracy_score(y, model.predict(X_scaled))
+            model = (to_incremental(model, X_scaled, y) if isinstance(model, LogisticRegression)
+                     else update(model, X_scaled, y, trees_per_batch))
+            new_rows += len(y)
+            consumed_id = last_id
+            pending_X, pending_y = [], []
+            print(f"  up to label {last_id}: {len(y)} rows, accuracy before update {accuracy:.3f}")
+
+        if pending_y and sum(len(y) for y in pending_y):
+            print(f"  {sum(len(y) for y in pending_y)} labels held back until both outcomes are present")
+        if skipped:
+            print(f"  {skipped} labeled rows had no complete feature vector and were skipped")
+        if not new_rows:
+            print("✅ No new labels to learn from")
+            return
+        if dry_run:
+            print(f"\n🧪 Dry run: {new_rows} rows learned, model not saved")
+            return
+
+        tmp = f"{model_path}.{os.getpid()}.tmp"
+        joblib.dump(model, tmp)
+        os.replace(tmp, model_path)
+        version = model_version(model_type, model_path)
+        cur.execute("""
+            UPDATE feedback_checkpoints
+            SET last_label_id = %s, rows_learned = %s, model_version = %s, updated_at = CURRENT_TIMESTAMP
+            WHERE model_type = %s
+        """, (consumed_id, learned + new_rows, version, model_type))
+        conn.commit()
+        print(f"\n✅ Learned {new_rows} new labels; saved {os.path.basename(model_path)} as {version}")
+        print("   Restart the API to serve the updated model")
+    except KeyboardInterrupt:
+        conn.rollback()
+        print("\n⏸️  Stopped; nothing was saved")
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Incremental training failed: {e}")
+    finally:
+        cur.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Update a PCOS model with labeled feedback")
+    parser.add_argument('--model', choices=list(MODEL_ARTIFACTS), default='clinical')
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--trees-per-batch', type=int, default=10, help='trees added per batch (forests)')
+    parser.add_argument('--dry-run', action='store_true', help='learn but do not save the model')
+    args = parser.parse_args()
+
+    incremental_train(args.model, args.batch_size, args.trees_per_batch, args.dry_run)
@@ -0,0 +1,326 @@
+"""
+Asynchronous batch-scoring jobs.
+
+POST /jobs/score saves the uploaded CSV, records a queued row in score_jobs
+and hands the job id to a local process pool, so the web worker returns at
+once. The pool process claims the job, scores the file chunk by chunk with
+the clinical or lifestyle model (see score_csv.py) and writes its progress
+to Postgres after every chunk, which lets any web worker answer a status
+poll. Results are written as CSV next to the upload.
+
+Claiming a job sets a fresh claim_token, and every later update of the job
+(progress, done, failed) only applies while that token is still the job's.
+Progress updates also move heartbeat_at. The result is written to a file of
+its own per claim and renamed into place when the job is marked done, so a
+requeued job never shares its output file with the worker it was taken from.
+
+Jobs left queued by a restarted server can be drained with:
+    python jobs.py
+
+That process also requeues 'running' jobs whose heartbeat is older than
+SCORE_JOB_TIMEOUT_SECONDS (their worker crashed or was restarted; a worker
+that is only slow stops at its next update), and marks jobs that finished
+more than SCORE_JOB_RETENTION_HOURS ago 'expired' and deletes their files.
+"""
+
+import os
+import time
+import uuid
+
+import pandas as pd
+import psycopg2
+
+from db import DB_CONFIG, get_db_connection
+from score_csv import (MODEL_ARTIFACTS, BACKEND_DIR, CsvResultWriter, iter_feature_chunks,
+                       load_feature_names, load_scoring_model, map_columns, score_matrix)
+
+SCORE_JOBS_DDL = """
+    CREATE TABLE IF NOT EXISTS score_jobs (
+        id SERIAL PRIMARY KEY,
+        user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+        model_type VARCHAR(20) NOT NULL,
+        status VARCHAR(20) NOT NULL DEFAULT 'queued',
+        input_path TEXT NOT NULL,
+        result_path TEXT NOT NULL,
+        id_column VARCHAR(255),
+        rows_total BIGINT,
+        rows_done BIGINT NOT NULL DEFAULT 0,
+        rows_unscored BIGINT NOT NULL DEFAULT 0,
+        error TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        started_at TIMESTAMP,
+        finished_at TIMESTAMP,
+        claim_token VARCHAR(32),
+        heartbeat_at TIMESTAMP
+    )
+"""
+
+SCORE_JOBS_DIR = os.environ.get('SCORE_JOBS_DIR', os.path.join(BACKEND_DIR, 'score_jobs'))
+SCORE_JOB_WORKERS = int(os.environ.get('SCORE_JOB_WORKERS', '2'))
+SCORE_JOB_CHUNK_SIZE = 50_000
+SCORE_JOB_TIMEOUT_SECONDS = int(os.environ.get('SCORE_JOB_TIMEOUT_SECONDS', '600'))
+SCORE_JOB_RETENTION_HOURS = int(os.environ.get('SCORE_JOB_RETENTION_HOURS', str(7 * 24)))
+
+_executor = None
+
+
+def _get_executor():
+    # Created on first use, i.e. after gunicorn has forked the web worker
+    global _executor
+    if _executor is None:
+        from concurrent.futures import ProcessPoolExecutor
+        _executor = ProcessPoolExecutor(max_workers=SCORE_JOB_WORKERS)
+    return _executor
+
+
+def create_job(cur, user_id, model_type, upload, id_column=None):
+    """
+    Save an uploaded file and queue a job for it. Raises ValueError if the
+    model type is unknown or the file's columns do not cover the features.
+    """
+    if model_type not in MODEL_ARTIFACTS:
+        raise ValueError(f"Unknown model '{model_type}', use one of {list(MODEL_ARTIFACTS)}")
+
+    os.makedirs(SCORE_JOBS_DIR, exist_ok=True)
+    name = uuid.uuid4().hex
+    input_path = os.path.join(SCORE_JOBS_DIR, f"{name}.input.csv")
+    result_path = os.path.join(SCORE_JOBS_DIR, f"{name}.result.csv")
+    upload.save(input_path)
+
+    try:
+        columns = pd.read_csv(input_path, nrows=0).columns
+        map_columns(columns, load_feature_names(model_type))
+        if id_column and id_column not in columns:
+            raise ValueError(f"No column '{id_column}' in the uploaded file")
+    except Exception as e:
+        os.remove(input_path)
+        raise ValueError(str(e)) from e
+
+    cur.execute("""
+        INSERT INTO score_jobs (user_id, model_type, input_path, result_path, id_column)
+        VALUES (%s, %s, %s, %s, %s)
+        RETURNING id
+    """, (user_id, model_type, input_path, result_path, id_column))
+    return cur.fetchone()[0]
+
+
+def submit_job(db_config, job_id):
+    """Run a committed, queued job in the background pool"""
+    _get_executor().submit(run_job, db_config, job_id)
+
+
+def job_status(cur, user_id, job_id):
+    """Status dict for one of the user's jobs, or None"""
+    cur.execute("""
+        SELECT id, model_type, status, rows_total, rows_done, rows_unscored, error,
+               created_at, started_at, finished_at
+        FROM score_jobs
+        WHERE id = %s AND user_id = %s
+    """, (job_id, user_id))
+    row = cur.fetchone()
+    if row is None:
+        return None
+
+    (job_id, model_type, status, rows_total, rows_done, rows_unscored, error,
+     created_at, started_at, finished_at) = row
+    return {
+        'id': job_id,
+        'model_type': model_type,
+        'status': status,
+        'rows_total': rows_total,
+        'rows_done': rows_done,
+        'rows_unscored': rows_unscored,
+        'progress': round(rows_done / rows_total, 4) if rows_total else None,
+        'error': error,
+        'created_at': created_at,
+        'started_at': started_at,
+        'finished_at': finished_at,
+        'result_url': f"/jobs/{job_id}/result" if status == 'done' else None,
+    }
+
+
+def job_result_path(cur, user_id, job_id):
+    cur.execute("""
+        SELECT result_path FROM score_jobs
+        WHERE id = %s AND user_id = %s AND status = 'done'
+    """, (job_id, user_id))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def _partial_path(result_path, claim_token):
+    return f"{result_path}.{claim_token}.part"
+
+
+def requeue_stale_jobs(cur, timeout_seconds=SCORE_JOB_TIMEOUT_SECONDS):
+    """
+    Queue 'running' jobs again whose heartbeat stopped; returns their ids and
+    the partial result files to delete once that is committed
+    """
+    cur.execute("""
+        UPDATE score_jobs j
+        SET status = 'queued', claim_token = NULL, heartbeat_at = NULL, started_at = NULL,
+            rows_total = NULL, rows_done = 0, rows_unscored = 0
+        FROM score_jobs old
+        WHERE j.id = old.id AND j.status = 'running'
+          AND j.heartbeat_at < CURRENT_TIMESTAMP - make_interval(secs => %s)
+        RETURNING j.id, old.result_path, old.claim_token
+    """, (timeout_seconds,))
+    rows = cur.fetchall()
+    return [row[0] for row in rows], [_partial_path(row[1], row[2]) for row in rows]
+
+
+def expire_jobs(cur, retention_hours=SCORE_JOB_RETENTION_HOURS):
+    """
+    Mark finished (and long-abandoned queued) jobs older than the retention
+    'expired'; returns the file paths to delete once that is committed
+    """
+    cur.execute("""
+        UPDATE score_jobs SET status = 'expired'
+        WHERE (status IN ('done', 'failed') AND finished_at < CURRENT_TIMESTAMP - make_interval(hours => %s))
+           OR (status = 'queued' AND created_at < CURRENT_TIMESTAMP - make_interval(hours => %s))
+        RETURNING input_path, result_path
+    """, (retention_hours, retention_hours))
+    return [path for row in cur.fetchall() for path in row]
+
+
+def remove_files(paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            # Already gone, or still open by a worker on a platform that cannot unlink it
+            pass
+
+
+# ---- executed in the pool processes ----
+_models = {}
+
+
+class ClaimLost(Exception):
+    """The job was requeued (its heartbeat looked stale) and belongs to another run now"""
+
+
+def _count_rows(path):
+    """Data rows in a CSV (lines minus the header), counted in 1 MB blocks"""
+    lines = 0
+    last = b'\n'
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            lines += block.count(b'\n')
+            last = block[-1:]
+    if last != b'\n':
+        lines += 1
+    return max(lines - 1, 0)
+
+
+def run_job(db_config, job_id):
+    conn = psycopg2.connect(**db_config)
+    cur = conn.cursor()
+    try:
+        # Claim the job; a job that another process already took is skipped
+        token = uuid.uuid4().hex
+        cur.execute("""
+            UPDATE score_jobs
+            SET status = 'running', claim_token = %s,
+                started_at = CURRENT_TIMESTAMP, heartbeat_at = CURRENT_TIMESTAMP
+            WHERE id = %s AND status = 'queued'
+            RETURNING model_type, input_path, result_path, id_column
+        """, (token, job_id))
+        claimed = cur.fetchone()
+        conn.commit()
+        if claimed is None:
+            return
+        model_type, input_path, result_path, id_column = claimed
+        partial_path = _partial_path(result_path, token)
+
+        def update(sql, params):
+            """Run an update of this job that only applies while the claim holds (uncommitted)"""
+            cur.execute(sql + " WHERE id = %s AND claim_token = %s", (*params, job_id, token))
+            if cur.rowcount == 0:
+                raise ClaimLost()
+
+        try:
+            update("UPDATE score_jobs SET rows_total = %s, heartbeat_at = CURRENT_TIMESTAMP",
+                   (_count_rows(input_path),))
+            conn.commit()
+
+            if model_type not in _models:
+                _models[model_type] = load_scoring_model(model_type)
+            model, scaler, feature_names = _models[model_type]
+
+            writer = CsvResultWriter(partial_path, id_column)
+            try:
+                for ids, X in iter_feature_chunks(input_path, feature_names, SCORE_JOB_CHUNK_SIZE,
+                                                  id_column=id_column):
+                    probabilities = score_matrix(model, scaler, X)
+                    writer.write(ids, probabilities)
+                    update("""
+                        UPDATE score_jobs
+                        SET rows_done = rows_done + %s, rows_unscored = rows_unscored + %s,
+                            heartbeat_at = CURRENT_TIMESTAMP
+                    """, (len(probabilities), int(pd.isna(probabilities).sum())))
+                    conn.commit()
+            finally:
+                writer.close()
+
+            # The row stays locked until the commit, so the job cannot be requeued in between
+            update("UPDATE score_jobs SET status = 'done', finished_at = CURRENT_TIMESTAMP", ())
+            os.replace(partial_path, result_path)
+            conn.commit()
+            os.remove(input_path)
+        except ClaimLost:
+            conn.rollback()
+            remove_files([partial_path])
+            print(f"⚠️  Score job {job_id} was requeued while this worker ran it; stopped")
+        except Exception as e:
+            conn.rollback()
+            remove_files([partial_path])
+            cur.execute("""
+                UPDATE score_jobs SET status = 'failed', error = %s, finished_at = CURRENT_TIMESTAMP
+                WHERE id = %s AND claim_token = %s
+            """, (str(e)[:1000], job_id, token))
+            conn.commit()
+            print(f"❌ Score job {job_id} failed: {e}")
+    finally:
+        cur.close()
+        conn.close()
+
+
+def main():
+    """Drain queued jobs, e.g. ones left behind by a restarted web server"""
+    conn = get_db_connection()
+    if not conn:
+        print("❌ Could not connect to database")
+        return
+    cur = conn.cursor()
+    cur.execute("SELECT to_regclass('score_jobs')")
+    exists = cur.fetchone()[0] is not None
+    conn.close()
+    if not exists:
+        print("❌ There is no score_jobs table yet; start the app once first.")
+        return
+
+    print("🔄 Waiting for queued score jobs (Ctrl+C to stop)...")
+    while True:
+        conn = get_db_connection()
+        if conn:
+            cur = conn.cursor()
+            requeued, partial_files = requeue_stale_jobs(cur)
+            expired_files = expire_jobs(cur)
+            conn.commit()
+            remove_files(partial_files + expired_files)
+            if requeued:
+                print(f"  requeued stale jobs {requeued}")
+            cur.execute("SELECT id FROM score_jobs WHERE status = 'queued' ORDER BY id")
+            queued = [row[0] for row in cur.fetchall()]
+            cur.close()
+            conn.close()
+            for job_id in queued:
+                print(f"  running job {job_id}")
+                run_job(DB_CONFIG, job_id)
+        time.sleep(5)
+
+
+if __name__ == "__main__":
+    main()
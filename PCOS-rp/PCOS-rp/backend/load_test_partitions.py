@@ -0,0 +1,153 @@
+"""
+Load test for the monthly-partitioned predictions table.
+
+Fills a scratch schema with synthetic predictions (50M rows by default) spread
+over the last N months and, at several checkpoints along the way, measures the
+latency of the app's /predictions/history query (HISTORY_SQL, with its joins
+to prediction_inputs and model_versions and the default ?since window and
+LIMIT) for random users. Stable latency as the table grows shows that the
+query only touches the newest partitions.
+
+Usage:
+    python load_test_partitions.py [--rows 50000000] [--users 100000] [--months 24] [--inputs 1000000]
+"""
+
+import argparse
+import random
+import time
+from datetime import date
+
+import numpy as np
+
+from db import get_db_connection
+from feature_store import HISTORY_SQL, MODEL_VERSIONS_DDL, PREDICTION_INPUTS_DDL, register_model_version
+from partitions import (PARTITIONED_TABLE_DDL, ensure_partitions, history_window, list_partitions,
+                        month_start)
+
+SCHEMA = 'partition_load_test'
+VERSION = 'clinical-loadtest'
+N_FEATURES = 40
+
+FILL_INPUTS_QUERY = """
+    INSERT INTO prediction_inputs (input_hash, model_version, feature_vector)
+    SELECT sha256(i::text::bytea), %(version)s,
+           ARRAY(SELECT random()::real FROM generate_series(1, %(features)s) WHERE i > 0)
+    FROM generate_series(1, %(inputs)s) i
+"""
+
+FILL_QUERY = """
+    INSERT INTO predictions (user_id, prediction_result, probability, risk_level, created_at,
+                             input_id, model_version, prediction_type)
+    SELECT 1 + (random() * (%(users)s - 1))::int,
+           (random() < 0.3)::int,
+           p,
+           CASE WHEN p < 0.3 THEN 'Low' WHEN p < 0.7 THEN 'Moderate' ELSE 'High' END,
+           %(start)s::timestamp + random() * (CURRENT_TIMESTAMP - %(start)s::timestamp),
+           1 + (random() * (%(inputs)s - 1))::bigint,
+           %(version)s,
+           'clinical'
+    FROM (SELECT random() AS p FROM generate_series(1, %(batch)s)) g
+"""
+
+
+def history_params(users):
+    """Parameters of a default /predictions/history request for a random user"""
+    since, limit = history_window({})
+    return random.randint(1, users), since, limit
+
+
+def measure_history_latency(cur, users, n_queries):
+    timings = []
+    for _ in range(n_queries):
+        params = history_params(users)
+        started = time.perf_counter()
+        cur.execute(HISTORY_SQL, params)
+        cur.fetchall()
+        timings.append((time.perf_counter() - started) * 1000)
+    return np.percentile(timings, 50), np.percentile(timings, 95), max(timings)
+
+
+def partitions_scanned(cur, users):
+    """Count the partitions the planner touches for one history query"""
+    cur.execute("EXPLAIN (ANALYZE, FORMAT JSON) " + HISTORY_SQL, history_params(users))
+    plan = cur.fetchone()[0][0]['Plan']
+    scanned = 0
+    stack = [plan]
+    while stack:
+        node = stack.pop()
+        if node.get('Relation Name', '').startswith('predictions_') and node.get('Actual Loops', 0) > 0:
+            scanned += 1
+        stack.extend(node.get('Plans', []))
+    return scanned
+
+
+def run_load_test(rows, users, months, inputs, batch, checkpoints, n_queries, keep):
+    conn = get_db_connection()
+    if not conn:
+        print("❌ Could not connect to database")
+        return
+
+    cur = conn.cursor()
+    try:
+        cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        cur.execute(f"CREATE SCHEMA {SCHEMA}")
+        cur.execute(f"SET search_path TO {SCHEMA}, public")
+
+        # Same layout as production, minus the foreign keys
+        cur.execute(MODEL_VERSIONS_DDL)
+        cur.execute(PREDICTION_INPUTS_DDL)
+        register_model_version(cur, VERSION, 'clinical', [f'f{i}' for i in range(N_FEATURES)])
+        cur.execute(FILL_INPUTS_QUERY, {'version': VERSION, 'features': N_FEATURES, 'inputs': inputs})
+        ddl = (PARTITIONED_TABLE_DDL['predictions']
+               .replace("REFERENCES users(id) ON DELETE CASCADE", "")
+               .replace("REFERENCES prediction_inputs(id)", ""))
+        cur.execute(ddl)
+        start = month_start(date.today(), -(months - 1))
+        ensure_partitions(cur, 'predictions', months_ahead=1, start=start)
+        conn.commit()
+        print(f"📦 {len(list_partitions(cur, 'predictions'))} monthly partitions, "
+              f"filling {rows:,} rows for {users:,} users over {months} months "
+              f"({inputs:,} distinct inputs)")
+
+        print(f"\n{'rows':>14} {'fill s':>8} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'partitions':>11}")
+        inserted = 0
+        checkpoint_every = max(rows // checkpoints, 1)
+        next_checkpoint = checkpoint_every
+        fill_started = time.perf_counter()
+        while inserted < rows:
+            n = min(batch, rows - inserted)
+            cur.execute(FILL_QUERY, {'users': users, 'start': start, 'batch': n,
+                                     'inputs': inputs, 'version': VERSION})
+            conn.commit()
+            inserted += n
+
+            if inserted >= next_checkpoint or inserted == rows:
+                cur.execute("ANALYZE predictions")
+                p50, p95, worst = measure_history_latency(cur, users, n_queries)
+                scanned = partitions_scanned(cur, users)
+                conn.commit()
+                print(f"{inserted:>14,} {time.perf_counter() - fill_started:>8.1f} "
+                      f"{p50:>8.2f} {p95:>8.2f} {worst:>8.2f} {scanned:>11}")
+                next_checkpoint += checkpoint_every
+    finally:
+        if not keep:
+            cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+            conn.commit()
+        cur.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="History latency load test for partitioned predictions")
+    parser.add_argument('--rows', type=int, default=50_000_000)
+    parser.add_argument('--users', type=int, default=100_000)
+    parser.add_argument('--months', type=int, default=24)
+    parser.add_argument('--inputs', type=int, default=1_000_000, help='distinct stored input vectors')
+    parser.add_argument('--batch', type=int, default=1_000_000, help='rows per INSERT')
+    parser.add_argument('--checkpoints', type=int, default=5, help='latency measurements during the fill')
+    parser.add_argument('--queries', type=int, default=200, help='history queries per checkpoint')
+    parser.add_argument('--keep', action='store_true', help='keep the scratch schema afterwards')
+    args = parser.parse_args()
+
+    run_load_test(args.rows, args.users, args.months, args.inputs, args.batch,
+                  args.checkpoints, args.queries, args.keep)
@@ -0,0 +1,134 @@
+"""
+Convert stored predictions from input_data JSONB to feature_vector REAL[].
+
+Clinical rows hold the request body in input_data; rows written by the
+rule-based lifestyle endpoint hold the whole result with the request under
+input_data->'input'. Both are rewritten into a fixed feature order, in
+id-ordered batches that each commit on their own, so the migration can be
+stopped and re-run safely.
+
+Clinical rows were scored by models that predate version tracking, so they
+get a legacy version id of their own (legacy-<hash of the feature list>)
+rather than the current model's. That keeps them out of the current
+version's /stats/distribution, and rescore_predictions.py can still select
+them by version. Lifestyle rows keep the rule-based version that scored them.
+
+Usage:
+    python migrate_feature_vectors.py [--batch-size 5000] [--keep-raw]
+"""
+
+import argparse
+import os
+import time
+
+import joblib
+
+from db import get_db_connection
+from feature_store import LIFESTYLE_RULES_VERSION, legacy_model_version, register_model_version
+
+FEATURE_NAMES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "feature_names.pkl")
+
+# Rows written by the rule-based lifestyle endpoint carry the full result
+IS_LIFESTYLE_RESULT = "input_data ? 'prediction_text'"
+
+CONVERT_SQL = """
+    UPDATE predictions SET
+        feature_vector = ARRAY(
+            SELECT CASE WHEN src.doc ->> f ~ '^\\s*-?[0-9]+(\\.[0-9]*)?([eE][-+]?[0-9]+)?\\s*$'
+                        THEN (src.doc ->> f)::real END
+            FROM unnest(%(names)s::text[]) WITH ORDINALITY AS u(f, i)
+            ORDER BY i
+        ),
+        model_version = %(version)s,
+        prediction_type = %(prediction_type)s,
+        input_data = CASE WHEN %(keep_raw)s THEN input_data END
+    FROM (SELECT id, {source} AS doc FROM predictions WHERE id = ANY(%(ids)s)) AS src
+    WHERE predictions.id = src.id AND {condition}
+"""
+
+
+def convert_batch(cur, ids, keep_raw, clinical, lifestyle):
+    """Convert one batch; clinical and lifestyle are (version, feature names)"""
+    lifestyle_sql = CONVERT_SQL.format(source="input_data -> 'input'", condition=IS_LIFESTYLE_RESULT)
+    cur.execute(lifestyle_sql, {
+        'names': lifestyle[1], 'version': lifestyle[0],
+        'prediction_type': 'lifestyle', 'keep_raw': keep_raw, 'ids': ids,
+    })
+    lifestyle_rows = cur.rowcount
+
+    clinical_sql = CONVERT_SQL.format(source="input_data", condition=f"NOT ({IS_LIFESTYLE_RESULT})")
+    cur.execute(clinical_sql, {
+        'names': clinical[1], 'version': clinical[0],
+        'prediction_type': 'clinical', 'keep_raw': keep_raw, 'ids': ids,
+    })
+    return lifestyle_rows, cur.rowcount
+
+
+def migrate(batch_size, keep_raw):
+    try:
+        feature_names = list(joblib.load(FEATURE_NAMES_PATH))
+    except FileNotFoundError:
+        print("❌ Clinical model not found. Please run train_model.py first.")
+        return
+
+    conn = get_db_connection()
+    if not conn:
+        print("❌ Could not connect to database")
+        return
+
+    # The app's startup adds the new columns and registers the rule-based version
+    cur = conn.cursor()
+    cur.execute("SELECT feature_names FROM model_versions WHERE version = %s", (LIFESTYLE_RULES_VERSION,))
+    row = cur.fetchone()
+    if row is None:
+        print(f"❌ {LIFESTYLE_RULES_VERSION} is not registered; start the app once first.")
+        conn.close()
+        return
+    lifestyle = (LIFESTYLE_RULES_VERSION, row[0])
+    clinical = (legacy_model_version(feature_names), list(feature_names))
+    register_model_version(cur, clinical[0], 'clinical', clinical[1])
+    conn.commit()
+    print(f"🏷️  Historic clinical rows are stored as {clinical[0]}")
+
+    last_id = 0
+    totals = {'clinical': 0, 'lifestyle': 0}
+    started = time.time()
+    try:
+        while True:
+            cur.execute("""
+                SELECT id FROM predictions
+                WHERE id > %s AND feature_vector IS NULL AND input_data IS NOT NULL
+                ORDER BY id
+                LIMIT %s
+            """, (last_id, batch_size))
+            ids = [row[0] for row in cur.fetchall()]
+            if not ids:
+                break
+
+            lifestyle_rows, clinical_rows = convert_batch(cur, ids, keep_raw, clinical, lifestyle)
+            conn.commit()
+            totals['lifestyle'] += lifestyle_rows
+            totals['clinical'] += clinical_rows
+            last_id = ids[-1]
+            print(f"  converted up to id {last_id}: "
+                  f"{totals['clinical']} clinical, {totals['lifestyle']} lifestyle rows")
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Migration failed after id {last_id}: {e}")
+        return
+    finally:
+        cur.close()
+        conn.close()
+
+    print(f"\n✅ Converted {totals['clinical'] + totals['lifestyle']} rows in {time.time() - started:.1f}s")
+    if not keep_raw:
+        print("   input_data was cleared; run VACUUM on predictions to reclaim the TOAST space.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert predictions.input_data JSONB into feature_vector REAL[]")
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--keep-raw', action='store_true', help='keep the original input_data JSON')
+    args = parser.parse_args()
+
+    migrate(args.batch_size, args.keep_raw)
@@ -0,0 +1,370 @@
+"""
+Monthly range partitioning for the unbounded history tables.
+
+predictions is partitioned on created_at and symptom_logs on log_date, one
+partition per calendar month (e.g. predictions_p2026_10). History queries
+filter on user_id and sort on the partition key, so Postgres only touches the
+newest partitions, and old months can be detached as plain tables in O(1).
+/predictions/history always has a lower bound on created_at (HISTORY_MONTHS
+back unless ?since= says otherwise), which prunes the older partitions, and a
+LIMIT, which stops the ordered scan of the remaining ones early.
+
+Usage:
+    python partitions.py maintain [--months-ahead 3]     # create upcoming partitions
+    python partitions.py migrate                         # convert existing plain tables (keeps <table>_legacy)
+    python partitions.py detach --older-than 24 [--drop] # retire old months
+"""
+
+import argparse
+from datetime import date, datetime
+
+import psycopg2
+
+from db import get_db_connection
+
+# table -> partition key column
+PARTITIONED_TABLES = {
+    'predictions': 'created_at',
+    'symptom_logs': 'log_date',
+}
+
+# Indexes created on the partitioned parent (and so on every partition)
+PARTITION_INDEXES = {
+    'predictions': "CREATE INDEX IF NOT EXISTS idx_predictions_user_created ON predictions (user_id, created_at DESC)",
+    'symptom_logs': "CREATE INDEX IF NOT EXISTS idx_symptom_logs_user_date ON symptom_logs (user_id, log_date DESC)",
+}
+
+DEFAULT_MONTHS_AHEAD = 3
+
+HISTORY_MONTHS = 12
+HISTORY_LIMIT = 100
+HISTORY_MAX_LIMIT = 1000
+
+
+def month_start(d, offset=0):
+    """First day of the month `offset` months away from `d`"""
+    month_index = d.year * 12 + (d.month - 1) + offset
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def history_window(args, default_limit=HISTORY_LIMIT, today=None):
+    """
+    (since, limit) of a history request from its ?since=YYYY-MM-DD (default:
+    the start of the month HISTORY_MONTHS - 1 months back) and ?limit=.
+    Raises ValueError (a 400) for malformed values.
+    """
+    since = args.get('since')
+    if since:
+        try:
+            since = datetime.strptime(since, '%Y-%m-%d').date()
+        except ValueError:
+            raise ValueError("'since' must be a date (YYYY-MM-DD)")
+    else:
+        since = month_start(today or date.today(), -(HISTORY_MONTHS - 1))
+    try:
+        limit = int(args.get('limit', default_limit))
+    except (TypeError, ValueError):
+        raise ValueError("'limit' must be a whole number")
+    if not 1 <= limit <= HISTORY_MAX_LIMIT:
+        raise ValueError(f"'limit' must be between 1 and {HISTORY_MAX_LIMIT}")
+    return since, limit
+
+
+def partition_name(table, start):
+    return f"{table}_p{start.year}_{start.month:02d}"
+
+
+def is_partitioned(cur, table):
+    cur.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)", (table,))
+    return cur.fetchone() is not None
+
+
+def list_partitions(cur, table):
+    """Return [(partition_name, range_start)] for the monthly partitions of `table`"""
+    cur.execute("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(%s)
+        ORDER BY c.relname
+    """, (table,))
+    prefix = f"{table}_p"
+    partitions = []
+    for (name,) in cur.fetchall():
+        if not name.startswith(prefix):
+            continue
+        year, month = name[len(prefix):].split('_')
+        partitions.append((name, date(int(year), int(month), 1)))
+    return partitions
+
+
+def create_month_partition(cur, table, start):
+    end = month_start(start, 1)
+    cur.execute(
+        f"CREATE TABLE IF NOT EXISTS {partition_name(table, start)} "
+        f"PARTITION OF {table} FOR VALUES FROM (%s) TO (%s)",
+        (start, end)
+    )
+
+
+def ensure_partitions(cur, table, months_ahead=DEFAULT_MONTHS_AHEAD, start=None, end=None, today=None):
+    """
+    Create monthly partitions from `start` (default: this month) through
+    `months_ahead` months in the future (or `end`, if later), plus the parent
+    indexes. No-op for tables that are not partitioned.
+
+    There is deliberately no DEFAULT partition: its presence stops Postgres
+    from scanning the monthly partitions in order, so a LIMIT 20 history query
+    would have to probe every month instead of stopping at the newest ones.
+    Every worker tops up months_ahead at startup (maintain_partitions), and
+    insert_partitioned() creates any other month a row needs.
+    """
+    if not is_partitioned(cur, table):
+        return False
+
+    today = today or date.today()
+    first = month_start(start or today)
+    last = month_start(today, months_ahead)
+    if end is not None:
+        last = max(last, month_start(end))
+
+    current = first
+    while current <= last:
+        create_month_partition(cur, table, current)
+        current = month_start(current, 1)
+
+    cur.execute(PARTITION_INDEXES[table])
+    return True
+
+
+def ensure_all_partitions(cur, months_ahead=DEFAULT_MONTHS_AHEAD):
+    for table in PARTITIONED_TABLES:
+        ensure_partitions(cur, table, months_ahead)
+
+
+def maintain_partitions(connect, months_ahead=DEFAULT_MONTHS_AHEAD):
+    """Create the coming months' partitions at worker startup (non-fatal)"""
+    conn = connect()
+    if not conn:
+        return
+    try:
+        cur = conn.cursor()
+        ensure_all_partitions(cur, months_ahead)
+        conn.commit()
+        cur.close()
+    except Exception as e:
+        conn.rollback()
+        print(f"Warning: partition maintenance failed: {e}")
+    finally:
+        conn.close()
+
+
+def insert_partitioned(cur, table, statement, params, key_value=None):
+    """
+    Run an INSERT into a partitioned table. If the row's month has no partition
+    (a back-dated or far-future row, or a worker that outlived the months
+    created ahead), create that month and run it again. key_value is the
+    row's partition key; None means now. Returns the RETURNING row, if any.
+    """
+    cur.execute("SAVEPOINT partition_insert")
+    try:
+        cur.execute(statement, params)
+    except psycopg2.errors.CheckViolation as e:
+        if 'no partition' not in str(e):
+            raise
+        cur.execute("ROLLBACK TO SAVEPOINT partition_insert")
+        cur.execute("SELECT date_trunc('month', COALESCE(%s::timestamp, CURRENT_TIMESTAMP))::date", (key_value,))
+        create_month_partition(cur, table, cur.fetchone()[0])
+        cur.execute(statement, params)
+    row = cur.fetchone() if cur.description else None
+    cur.execute("RELEASE SAVEPOINT partition_insert")
+    return row
+
+
+def detach_old_partitions(cur, table, older_than_months, drop=False, today=None):
+    """
+    Detach (and optionally drop) monthly partitions that end before the cutoff.
+    Detaching is a catalog-only change, so it does not rewrite any rows.
+    """
+    cutoff = month_start(today or date.today(), -older_than_months)
+    detached = []
+    for name, start in list_partitions(cur, table):
+        if month_start(start, 1) <= cutoff:
+            cur.execute(f"ALTER TABLE {table} DETACH PARTITION {name}")
+            if drop:
+                cur.execute(f"DROP TABLE {name}")
+            detached.append(name)
+    return detached
+
+
+# DDL for the partitioned tables, used by init_db for new databases and by `migrate`
+PARTITIONED_TABLE_DDL = {
+    'predictions': """
+        CREATE TABLE IF NOT EXISTS predictions (
+            id SERIAL,
+            user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+            prediction_result INTEGER NOT NULL,
+            probability FLOAT NOT NULL,
+            risk_level VARCHAR(50),
+            input_data JSONB,
+            feature_vector REAL[],
+            model_version VARCHAR(64),
+            prediction_type VARCHAR(20) DEFAULT 'clinical',
+            input_id BIGINT REFERENCES prediction_inputs(id),
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """,
+    'symptom_logs': """
+        CREATE TABLE IF NOT EXISTS symptom_logs (
+            id SERIAL,
+            user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+            log_date DATE NOT NULL,
+            acne_severity INTEGER DEFAULT 0,
+            hirsutism_score INTEGER DEFAULT 0,
+            hair_loss_score INTEGER DEFAULT 0,
+            fatigue_level INTEGER DEFAULT 0,
+            mood_swings INTEGER DEFAULT 0,
+            anxiety_level INTEGER DEFAULT 0,
+            sleep_quality INTEGER DEFAULT 5,
+            food_cravings INTEGER DEFAULT 0,
+            bloating INTEGER DEFAULT 0,
+            weight_gain_difficulty INTEGER DEFAULT 0,
+            period_flow VARCHAR(20),
+            period_active BOOLEAN DEFAULT FALSE,
+            cycle_length INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (id, log_date)
+        ) PARTITION BY RANGE (log_date)
+    """,
+}
+
+
+def migrate_table(cur, table, months_ahead=DEFAULT_MONTHS_AHEAD):
+    """
+    Convert an existing plain table into monthly partitions: rename it to
+    <table>_legacy, create a partitioned parent with the same columns and
+    defaults (LIKE), its foreign keys and the partitions covering the data,
+    then copy every row across. The legacy table is kept until it is dropped
+    by hand. Returns False, with a message, for tables it cannot convert.
+    """
+    if is_partitioned(cur, table):
+        print(f"  {table}: already partitioned")
+        return False
+
+    key = PARTITIONED_TABLES[table]
+    legacy = f"{table}_legacy"
+    columns = _column_names(cur, table)
+    if key not in columns:
+        print(f"  {table}: skipped, there is no {key} column to partition on (columns: {', '.join(columns)})")
+        return False
+    cur.execute("SELECT to_regclass(%s) IS NOT NULL", (legacy,))
+    if cur.fetchone()[0]:
+        print(f"  {table}: skipped, {legacy} from an earlier migration still exists; drop it first")
+        return False
+    cur.execute(f"SELECT COUNT(*) FROM {table} WHERE {key} IS NULL")
+    missing_key = cur.fetchone()[0]
+    if missing_key:
+        print(f"  {table}: skipped, {missing_key} rows have no {key}")
+        return False
+
+    cur.execute(f"ALTER TABLE {table} RENAME TO {legacy}")
+    # Indexes (including the primary key) keep their names after the rename;
+    # free them up for the new parent
+    cur.execute("""
+        SELECT indexname FROM pg_indexes
+        WHERE tablename = %s AND schemaname = 'public'
+    """, (legacy,))
+    for (index_name,) in cur.fetchall():
+        cur.execute(f"ALTER INDEX {index_name} RENAME TO {index_name}_legacy")
+
+    cur.execute(f"CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+                f"PARTITION BY RANGE ({key})")
+    cur.execute(f"ALTER TABLE {table} ALTER COLUMN {key} SET NOT NULL")
+    cur.execute(f"ALTER TABLE {table} ADD PRIMARY KEY (id, {key})")
+    cur.execute("""
+        SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+        WHERE conrelid = to_regclass(%s) AND contype = 'f'
+    """, (legacy,))
+    for name, definition in cur.fetchall():
+        cur.execute(f"ALTER TABLE {table} ADD CONSTRAINT {name} {definition}")
+    # The copied id default still uses the old sequence; make the new table
+    # its owner so that dropping the legacy table later keeps it
+    cur.execute("SELECT pg_get_serial_sequence(%s, 'id')", (legacy,))
+    sequence = cur.fetchone()[0]
+    if sequence:
+        cur.execute(f"ALTER SEQUENCE {sequence} OWNED BY {table}.id")
+
+    cur.execute(f"SELECT MIN({key}), MAX({key}) FROM {legacy}")
+    oldest, newest = cur.fetchone()
+    ensure_partitions(cur, table, months_ahead, start=oldest, end=newest)
+
+    column_list = ', '.join(columns)
+    cur.execute(f"INSERT INTO {table} ({column_list}) SELECT {column_list} FROM {legacy}")
+    copied = cur.rowcount
+    print(f"  {table}: copied {copied} rows into {len(list_partitions(cur, table))} monthly partitions; "
+          f"{legacy} is kept, drop it once the data is checked")
+    return True
+
+
+def _column_names(cur, table):
+    cur.execute("""
+        SELECT column_name FROM information_schema.columns
+        WHERE table_name = %s AND table_schema = 'public'
+        ORDER BY ordinal_position
+    """, (table,))
+    return [row[0] for row in cur.fetchall()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage monthly partitions of predictions and symptom_logs")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    maintain = sub.add_parser('maintain', help='create partitions for the coming months')
+    maintain.add_argument('--months-ahead', type=int, default=DEFAULT_MONTHS_AHEAD)
+
+    migrate = sub.add_parser('migrate', help='convert existing plain tables to partitioned tables')
+    migrate.add_argument('--months-ahead', type=int, default=DEFAULT_MONTHS_AHEAD)
+
+    detach = sub.add_parser('detach', help='detach partitions older than N months')
+    detach.add_argument('--older-than', type=int, required=True, help='age in months')
+    detach.add_argument('--drop', action='store_true', help='drop the detached tables as well')
+
+    args = parser.parse_args()
+
+    conn = get_db_connection()
+    if not conn:
+        print("❌ Could not connect to database")
+        return
+
+    try:
+        cur = conn.cursor()
+        if args.command == 'maintain':
+            ensure_all_partitions(cur, args.months_ahead)
+            for table in PARTITIONED_TABLES:
+                print(f"✅ {table}: {len(list_partitions(cur, table))} monthly partitions")
+        elif args.command == 'migrate':
+            print("🔄 Converting tables to monthly partitions...")
+            # One transaction per table, so one table's failure keeps the others
+            for table in PARTITIONED_TABLES:
+                try:
+                    migrate_table(cur, table, args.months_ahead)
+                    conn.commit()
+                except Exception as e:
+                    conn.rollback()
+                    print(f"❌ {table}: migration failed and was rolled back: {e}")
+        elif args.command == 'detach':
+            for table in PARTITIONED_TABLES:
+                detached = detach_old_partitions(cur, table, args.older_than, drop=args.drop)
+                print(f"✅ {table}: {'dropped' if args.drop else 'detached'} {len(detached)} partitions {detached}")
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Partition {args.command} failed: {e}")
+    finally:
+        cur.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
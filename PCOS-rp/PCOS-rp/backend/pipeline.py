@@ -0,0 +1,116 @@
+"""
+Stage cache for the training scripts.
+
+A training run is a chain of stages (data -> scaler -> fit -> evaluate ->
+export). Each stage's key is a hash of its name, its parameters, the keys of
+the stages it consumes, the source code of its function and the scikit-learn
+version. Its output is saved with joblib as PIPELINE_CACHE_DIR/<stage>-<key>.joblib,
+and a later run with the same key loads that file instead of running the
+stage again. Editing the evaluation code therefore re-runs evaluate only,
+while a new seed re-runs everything from data onwards.
+
+Each run writes a manifest with every stage's key, parameters, inputs and
+timing, and the sha256 and producing stage of each exported artifact.
+
+    pipeline = Pipeline('lifestyle')
+    split = pipeline.run('data', make_split, params={'n_samples': 2000})
+    scaler = pipeline.run('scaler', fit_scaler, inputs=['data'])
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import time
+from datetime import datetime
+
+import joblib
+import sklearn
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+PIPELINE_CACHE_DIR = os.environ.get('PIPELINE_CACHE_DIR', os.path.join(BACKEND_DIR, '.pipeline_cache'))
+
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class Pipeline:
+    def __init__(self, name, cache_dir=PIPELINE_CACHE_DIR, use_cache=True):
+        self.name = name
+        self.cache_dir = cache_dir
+        self.use_cache = use_cache
+        self.outputs = {}
+        self.stages = {}
+        self.artifacts = {}
+
+    def stage_key(self, name, fn, params, inputs):
+        spec = json.dumps({
+            'stage': name,
+            'params': params,
+            'inputs': {i: self.stages[i]['key'] for i in inputs},
+            'code': _sha256(inspect.getsource(fn).encode()),
+            'sklearn': sklearn.__version__,
+        }, sort_keys=True, default=str)
+        return _sha256(spec.encode())[:16]
+
+    def run(self, name, fn, params=None, inputs=(), valid=None):
+        """
+        Return fn(*outputs of `inputs`, **params), from the cache if this
+        stage was already run with the same key. `valid(output)` may reject
+        a cached output, e.g. when the files it describes have changed.
+        """
+        params = params or {}
+        key = self.stage_key(name, fn, params, inputs)
+        path = os.path.join(self.cache_dir, f"{self.name}-{name}-{key}.joblib")
+
+        started = time.perf_counter()
+        cached = False
+        if self.use_cache and os.path.exists(path):
+            output = joblib.load(path)
+            cached = valid is None or valid(output)
+        if not cached:
+            output = fn(*[self.outputs[i] for i in inputs], **params)
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            joblib.dump(output, tmp)
+            os.replace(tmp, path)
+        seconds = time.perf_counter() - started
+
+        self.outputs[name] = output
+        self.stages[name] = {
+            'key': key,
+            'params': params,
+            'inputs': {i: self.stages[i]['key'] for i in inputs},
+            'cached': cached,
+            'seconds': round(seconds, 3),
+        }
+        print(f"  {'♻️  cached' if cached else '⚙️  ran   '} {name:10s} [{key}] {seconds:.2f}s")
+        return output
+
+    def record_artifacts(self, stage, paths):
+        """Register files written by `stage` and return {path: sha256}"""
+        hashes = {path: file_sha256(path) for path in paths}
+        for path, digest in hashes.items():
+            self.artifacts[path] = {'stage': stage, 'stage_key': self.stages[stage]['key'], 'sha256': digest}
+        return hashes
+
+    def write_manifest(self, path):
+        manifest = {
+            'pipeline': self.name,
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'sklearn': sklearn.__version__,
+            'stages': self.stages,
+            'artifacts': self.artifacts,
+        }
+        with open(path, 'w') as f:
+            json.dump(manifest, f, indent=2, default=str)
+        return manifest
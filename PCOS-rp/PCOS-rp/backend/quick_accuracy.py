@@ -1,20 +1,13 @@
 # Simple accuracy test
-import numpy as np
 from sklearn.linear_model import LogisticRegression
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import accuracy_score
+from training_data import load_dataset
 
-# Quick data generation
-np.random.seed(42)
-
-# 1000 samples: 700 healthy, 300 PCOS
-healthy_data = np.random.normal([28, 23, 12, 35, 6, 7, 90, 180], [6, 3, 4, 10, 2, 2, 10, 30], (700, 8))
-pcos_data = np.random.normal([26, 28, 18, 55, 12, 6, 105, 200], [5, 5, 6, 15, 4, 2, 15, 40], (300, 8))
-
-X = np.vstack([healthy_data, pcos_data])
-y = np.hstack([np.zeros(700), np.ones(300)])
+# Quick data generation (shared, cached dataset)
+X, y, feature_names = load_dataset('clinical', n_samples=1000)
 
 # Train test split
 X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
@@ -50,6 +43,6 @@ best_model = models[best_model_name]
 import joblib
 joblib.dump(best_model, "pcos_model.pkl")
 joblib.dump(scaler, "pcos_scaler.pkl")
-joblib.dump(['Age', 'BMI', 'Insulin', 'Testosterone', 'LH', 'FSH', 'Glucose', 'Cholesterol'], "feature_names.pkl")
+joblib.dump(feature_names, "feature_names.pkl")
 
 print("Model saved successfully!")
@@ -0,0 +1,191 @@
+"""
+Re-score historic clinical predictions with the current pcos_model.pkl.
+
+Stored rows keep the probability of the model that produced them. This
+backfill walks predictions in id order (keyset batches), rebuilds each row's
+feature vector in the current model's feature order, scores the whole batch
+in one predict_proba call and writes the result to prediction_scores under
+the current model version. The original rows are not modified.
+
+Progress is checkpointed per model version in the same transaction as the
+scores, so an interrupted run resumes where it stopped. --pause sleeps
+between batches to keep the load on a production database low.
+
+Usage:
+    python rescore_predictions.py [--batch-size 2000] [--pause 0.2] [--restart]
+"""
+
+import argparse
+import time
+
+import joblib
+import numpy as np
+from psycopg2.extras import execute_values
+
+from db import get_db_connection
+from feature_store import (VECTOR_SQL, JOIN_INPUTS_SQL, model_version, register_model_version,
+                           feature_vector)
+from score_csv import risk_levels, score_matrix
+
+PREDICTION_SCORES_DDL = """
+    CREATE TABLE IF NOT EXISTS prediction_scores (
+        prediction_id INTEGER NOT NULL,
+        model_version VARCHAR(64) NOT NULL REFERENCES model_versions(version),
+        probability FLOAT NOT NULL,
+        risk_level VARCHAR(50),
+        scored_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (model_version, prediction_id)
+    )
+"""
+
+RESCORE_CHECKPOINTS_DDL = """
+    CREATE TABLE IF NOT EXISTS rescore_checkpoints (
+        model_version VARCHAR(64) PRIMARY KEY REFERENCES model_versions(version),
+        last_prediction_id INTEGER NOT NULL DEFAULT 0,
+        rows_scored BIGINT NOT NULL DEFAULT 0,
+        rows_skipped BIGINT NOT NULL DEFAULT 0,
+        started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        finished_at TIMESTAMP
+    )
+"""
+
+BATCH_SQL = f"""
+    SELECT p.id, p.input_data, {VECTOR_SQL}, mv.feature_names
+    FROM predictions p
+    {JOIN_INPUTS_SQL}
+    LEFT JOIN model_versions mv ON mv.version = p.model_version
+    WHERE p.id > %s AND COALESCE(p.prediction_type, 'clinical') = 'clinical'
+    ORDER BY p.id
+    LIMIT %s
+"""
+
+INSERT_SCORES_SQL = """
+    INSERT INTO prediction_scores (prediction_id, model_version, probability, risk_level)
+    VALUES %s
+    ON CONFLICT (model_version, prediction_id) DO UPDATE
+    SET probability = EXCLUDED.probability, risk_level = EXCLUDED.risk_level,
+        scored_at = CURRENT_TIMESTAMP
+"""
+
+
+def rebuild_matrix(rows, feature_names):
+    """
+    Feature matrix in `feature_names` order for (id, input_data, vector,
+    stored feature names) rows. Vectors already in that order are used as
+    is; others are re-keyed by name, and rows without a vector fall back to
+    the raw input_data. Missing features are NaN.
+    """
+    X = np.full((len(rows), len(feature_names)), np.nan)
+    for i, (_, input_data, vector, stored_names) in enumerate(rows):
+        if vector is not None and stored_names == feature_names:
+            values = vector
+        elif vector is not None and stored_names:
+            values = feature_vector(dict(zip(stored_names, vector)), feature_names)
+        elif input_data:
+            values = feature_vector(input_data, feature_names)
+        else:
+            continue
+        X[i] = [np.nan if v is None else v for v in values]
+    return X
+
+
+def load_checkpoint(cur, version, restart):
+    if restart:
+        cur.execute("DELETE FROM rescore_checkpoints WHERE model_version = %s", (version,))
+    cur.execute("""
+        INSERT INTO rescore_checkpoints (model_version) VALUES (%s)
+        ON CONFLICT (model_version) DO NOTHING
+    """, (version,))
+    cur.execute("""
+        SELECT last_prediction_id, rows_scored, rows_skipped, finished_at
+        FROM rescore_checkpoints WHERE model_version = %s
+    """, (version,))
+    return cur.fetchone()
+
+
+def rescore(batch_size, pause, restart):
+
+    model = joblib.load("pcos_model.pkl")
+    scaler = joblib.load("pcos_scaler.pkl")
+    feature_names = list(joblib.load("feature_names.pkl"))
+    version = model_version('clinical', "pcos_model.pkl")
+
+    conn = get_db_connection()
+    if not conn:
+        print("❌ Could not connect to database")
+        return
+
+    cur = conn.cursor()
+    try:
+        register_model_version(cur, version, 'clinical', feature_names)
+        cur.execute(PREDICTION_SCORES_DDL)
+        cur.execute(RESCORE_CHECKPOINTS_DDL)
+        last_id, scored, skipped, finished_at = load_checkpoint(cur, version, restart)
+        conn.commit()
+
+        if finished_at and not restart:
+            print(f"✅ {version} already backfilled ({scored} rows); use --restart to run again")
+            return
+        print(f"🔄 Re-scoring clinical predictions with {version}, resuming after id {last_id}")
+
+        started = time.time()
+        while True:
+            cur.execute(BATCH_SQL, (last_id, batch_size))
+            rows = cur.fetchall()
+            if not rows:
+                break
+
+            X = rebuild_matrix(rows, feature_names)
+            probabilities = score_matrix(model, scaler, X)
+            levels = risk_levels(probabilities)
+            scored_mask = ~np.isnan(probabilities)
+            values = [
+                (row[0], version, float(p), level)
+                for row, p, level, ok in zip(rows, probabilities, levels, scored_mask) if ok
+            ]
+            if values:
+                execute_values(cur, INSERT_SCORES_SQL, values, page_size=len(values))
+
+            last_id = rows[-1][0]
+            scored += len(values)
+            skipped += len(rows) - len(values)
+            cur.execute("""
+                UPDATE rescore_checkpoints
+                SET last_prediction_id = %s, rows_scored = %s, rows_skipped = %s,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE model_version = %s
+            """, (last_id, scored, skipped, version))
+            conn.commit()
+
+            elapsed = time.time() - started
+            print(f"  up to id {last_id}: {scored} scored, {skipped} skipped "
+                  f"({scored / max(elapsed, 1e-9):.0f} rows/s)")
+            if pause:
+                time.sleep(pause)
+
+        cur.execute("""
+            UPDATE rescore_checkpoints SET finished_at = CURRENT_TIMESTAMP
+            WHERE model_version = %s
+        """, (version,))
+        conn.commit()
+        print(f"\n✅ Backfill complete: {scored} rows scored, {skipped} skipped (missing inputs)")
+    except KeyboardInterrupt:
+        conn.rollback()
+        print(f"\n⏸️  Stopped after id {last_id}; run again to resume")
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Backfill failed after id {last_id}: {e}")
+    finally:
+        cur.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-score stored predictions with the current clinical model")
+    parser.add_argument('--batch-size', type=int, default=2000)
+    parser.add_argument('--pause', type=float, default=0.2, help='seconds to sleep between batches')
+    parser.add_argument('--restart', action='store_true', help='ignore the checkpoint and start from the first row')
+    args = parser.parse_args()
+
+    rescore(args.batch_size, args.pause, args.restart)
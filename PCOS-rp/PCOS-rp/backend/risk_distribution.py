@@ -0,0 +1,201 @@
+"""
+Where a probability falls among all stored predictions of its model version.
+
+Each web worker keeps, per model version, a sorted numpy array of the stored
+probabilities (loaded from predictions with one grouped query) and a small
+sorted list of the probabilities it has stored since. percentile() is a
+binary search in each, O(log n), with no query per request. The write path
+adds to the small list, which is merged into the array once it holds
+MERGE_AT values. The arrays are rebuilt from Postgres in a background thread
+once they are DISTRIBUTION_REBUILD_SECONDS old; that also picks up the other
+workers' writes. Values added while a rebuild runs are carried over into
+the rebuilt arrays.
+
+On large tables the rebuild loads a uniform random sample of at most
+DISTRIBUTION_SAMPLE_SIZE probabilities (TABLESAMPLE BERNOULLI) instead of
+every row. Percentiles and quantiles then come from the sample, new values
+join it with the same sampling rate, and counts and histograms are scaled
+to the full table.
+
+GET /stats/distribution returns the count, quantiles, a histogram and the
+risk-level shares of one model version.
+"""
+
+import bisect
+import os
+import random
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from forest_scoring import RISK_THRESHOLDS
+
+REBUILD_SECONDS = int(os.environ.get('DISTRIBUTION_REBUILD_SECONDS', '600'))
+SAMPLE_SIZE = int(os.environ.get('DISTRIBUTION_SAMPLE_SIZE', '500000'))
+MERGE_AT = 1024
+HISTOGRAM_BINS = 20
+SUMMARY_QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+COUNTS_SQL = """
+    SELECT model_version, COUNT(*)
+    FROM predictions
+    WHERE probability IS NOT NULL AND model_version IS NOT NULL
+    GROUP BY model_version
+"""
+
+# {sample} is empty, or a TABLESAMPLE clause when the table exceeds SAMPLE_SIZE
+DISTRIBUTION_SQL = """
+    SELECT model_version, array_agg(probability ORDER BY probability)
+    FROM predictions {sample}
+    WHERE probability IS NOT NULL AND model_version IS NOT NULL
+    GROUP BY model_version
+"""
+
+
+class ProbabilityDistribution:
+    def __init__(self, connect, rebuild_seconds=REBUILD_SECONDS, sample_size=SAMPLE_SIZE):
+        self._connect = connect
+        self._rebuild_seconds = rebuild_seconds
+        self._sample_size = sample_size
+        self._sorted = {}   # version -> sorted array of stored probabilities (or a sample)
+        self._recent = {}   # version -> sorted list added since, not yet merged
+        self._counts = {}   # version -> number of stored probabilities
+        self._fraction = 1.0   # share of the rows that _sorted/_recent hold
+        self._rebuild_logs = []   # per running rebuild: (version, probability) added meanwhile
+        self._lock = threading.Lock()
+        self._rebuilding = False
+        self._attempted_at = None
+        self.rebuilt_at = None
+
+    def rebuild(self):
+        """Reload every version's probabilities from Postgres; False without a connection"""
+        conn = self._connect()
+        if not conn:
+            return False
+        try:
+            cur = conn.cursor()
+            # Values added from here on may be missing from the query's snapshot
+            late = []
+            with self._lock:
+                self._rebuild_logs.append(late)
+            cur.execute(COUNTS_SQL)
+            counts = dict(cur.fetchall())
+            total = sum(counts.values())
+            fraction = min(1.0, self._sample_size / total) if total else 1.0
+            sample = f"TABLESAMPLE BERNOULLI ({fraction * 100:.6f})" if fraction < 1 else ""
+            cur.execute(DISTRIBUTION_SQL.format(sample=sample))
+            loaded = {version: np.asarray(values, dtype=np.float64) for version, values in cur.fetchall()}
+            cur.close()
+        except Exception:
+            with self._lock:
+                self._rebuild_logs.remove(late)
+            raise
+        finally:
+            conn.close()
+        with self._lock:
+            self._rebuild_logs.remove(late)
+            self._sorted, self._recent, self._counts, self._fraction = loaded, {}, counts, fraction
+            self.rebuilt_at = datetime.now()
+            for version, probability in late:
+                self._add(version, probability)
+        return True
+
+    def refresh_if_stale(self):
+        """Start a background rebuild if the last attempt is older than the rebuild interval"""
+        now = time.monotonic()
+        with self._lock:
+            if self._rebuilding or (self._attempted_at is not None
+                                    and now - self._attempted_at < self._rebuild_seconds):
+                return
+            self._rebuilding, self._attempted_at = True, now
+
+        def run():
+            try:
+                self.rebuild()
+            except Exception as e:
+                print(f"Warning: probability distribution rebuild failed: {e}")
+            finally:
+                self._rebuilding = False
+
+        # Started on first use, i.e. after gunicorn has forked the web worker
+        threading.Thread(target=run, daemon=True).start()
+
+    def add(self, version, probability):
+        """Count a newly stored prediction (the write path, after commit)"""
+        if version is None:
+            return
+        with self._lock:
+            for late in self._rebuild_logs:
+                late.append((version, float(probability)))
+            self._add(version, float(probability))
+
+    def _add(self, version, probability):
+        self._counts[version] = self._counts.get(version, 0) + 1
+        # A sampled distribution takes new values at the same rate
+        if self._fraction < 1 and random.random() >= self._fraction:
+            return
+        recent = self._recent.setdefault(version, [])
+        bisect.insort(recent, probability)
+        if len(recent) >= MERGE_AT:
+            self._merge(version)
+
+    def _merge(self, version):
+        values = self._sorted.get(version, np.empty(0))
+        recent = np.asarray(self._recent.pop(version, []))
+        self._sorted[version] = np.insert(values, np.searchsorted(values, recent), recent)
+
+    def percentile(self, version, probability):
+        """
+        Percent of the version's stored predictions below the probability
+        (ties count half), or None while none are known
+        """
+        self.refresh_if_stale()
+        with self._lock:
+            values = self._sorted.get(version, np.empty(0))
+            recent = self._recent.get(version, [])
+            n = len(values) + len(recent)
+            if n == 0:
+                return None
+            below = (np.searchsorted(values, probability, side='left') + np.searchsorted(values, probability, side='right')
+                     + bisect.bisect_left(recent, probability) + bisect.bisect_right(recent, probability))
+        return round(50.0 * float(below) / n, 1)
+
+    def summary(self, version):
+        """Count, quantiles, histogram and risk-level shares of one version (None if unknown)"""
+        self.refresh_if_stale()
+        with self._lock:
+            if self._recent.get(version):
+                self._merge(version)
+            values = self._sorted.get(version)
+            versions = dict(self._counts)
+            fraction = self._fraction
+        if values is None or not len(values):
+            return None
+
+        edges = np.linspace(0, 1, HISTOGRAM_BINS + 1)
+        # Counts up to each edge; the last bin includes 1.0
+        cumulative = np.searchsorted(values, edges, side='left')
+        cumulative[-1] = len(values)
+        bands = np.searchsorted(values, RISK_THRESHOLDS, side='left')
+        n = len(values)
+        count = versions.get(version, n)
+        return {
+            'model_version': version,
+            'count': count,
+            'sampled': n if fraction < 1 else None,
+            'mean': round(float(values.mean()), 4),
+            'quantiles': {f'p{round(q * 100)}': round(float(values[min(int(q * n), n - 1)]), 4)
+                          for q in SUMMARY_QUANTILES},
+            # Scaled to the full count when the values are a sample
+            'histogram': {'bin_edges': np.round(edges, 4).tolist(),
+                          'counts': np.round(np.diff(cumulative) * (count / n)).astype(int).tolist()},
+            'risk_levels': {
+                'Low': round(bands[0] / n, 4),
+                'Moderate': round((bands[1] - bands[0]) / n, 4),
+                'High': round((n - bands[1]) / n, 4),
+            },
+            'versions': versions,
+            'rebuilt_at': self.rebuilt_at.isoformat() if self.rebuilt_at else None,
+        }
@@ -0,0 +1,114 @@
+"""
+Per-user risk summary kept current by the write path.
+
+The dashboard needs "latest risk, number of assessments, average probability,
+last symptom log" for one user. Instead of aggregating over predictions,
+lifestyle_predictions and symptom_logs on every page load, each write updates
+a single user_risk_summary row in the same transaction, and /summary reads it
+back with a primary-key lookup.
+"""
+
+USER_RISK_SUMMARY_DDL = """
+    CREATE TABLE IF NOT EXISTS user_risk_summary (
+        user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+        assessment_count INTEGER NOT NULL DEFAULT 0,
+        clinical_count INTEGER NOT NULL DEFAULT 0,
+        lifestyle_count INTEGER NOT NULL DEFAULT 0,
+        probability_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+        latest_probability FLOAT,
+        latest_risk_level VARCHAR(50),
+        latest_prediction_type VARCHAR(50),
+        last_assessment_at TIMESTAMP,
+        last_symptom_log_date DATE,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+_RECORD_ASSESSMENT_SQL = """
+    INSERT INTO user_risk_summary
+        (user_id, assessment_count, clinical_count, lifestyle_count, probability_sum,
+         latest_probability, latest_risk_level, latest_prediction_type, last_assessment_at)
+    VALUES (%(user_id)s, 1, %(clinical)s, %(lifestyle)s, %(probability)s,
+            %(probability)s, %(risk_level)s, %(prediction_type)s, CURRENT_TIMESTAMP)
+    ON CONFLICT (user_id) DO UPDATE SET
+        assessment_count = user_risk_summary.assessment_count + 1,
+        clinical_count = user_risk_summary.clinical_count + EXCLUDED.clinical_count,
+        lifestyle_count = user_risk_summary.lifestyle_count + EXCLUDED.lifestyle_count,
+        probability_sum = user_risk_summary.probability_sum + EXCLUDED.probability_sum,
+        latest_probability = EXCLUDED.latest_probability,
+        latest_risk_level = EXCLUDED.latest_risk_level,
+        latest_prediction_type = EXCLUDED.latest_prediction_type,
+        last_assessment_at = EXCLUDED.last_assessment_at,
+        updated_at = CURRENT_TIMESTAMP
+"""
+
+# Symptom logs can be back-dated, so only move the date forward.
+_RECORD_SYMPTOM_LOG_SQL = """
+    INSERT INTO user_risk_summary (user_id, last_symptom_log_date)
+    VALUES (%s, %s)
+    ON CONFLICT (user_id) DO UPDATE SET
+        last_symptom_log_date = GREATEST(user_risk_summary.last_symptom_log_date,
+                                         EXCLUDED.last_symptom_log_date),
+        updated_at = CURRENT_TIMESTAMP
+"""
+
+_FETCH_SUMMARY_SQL = """
+    SELECT assessment_count, clinical_count, lifestyle_count, probability_sum,
+           latest_probability, latest_risk_level, latest_prediction_type,
+           last_assessment_at, last_symptom_log_date, updated_at
+    FROM user_risk_summary
+    WHERE user_id = %s
+"""
+
+
+def record_assessment(cur, user_id, probability, risk_level, prediction_type='clinical'):
+    """Fold one new assessment into the user's summary row (caller commits)"""
+    cur.execute(_RECORD_ASSESSMENT_SQL, {
+        'user_id': user_id,
+        'clinical': 1 if prediction_type == 'clinical' else 0,
+        'lifestyle': 1 if prediction_type == 'lifestyle' else 0,
+        'probability': float(probability),
+        'risk_level': risk_level,
+        'prediction_type': prediction_type,
+    })
+
+
+def record_symptom_log(cur, user_id, log_date):
+    """Advance the user's last symptom log date (caller commits)"""
+    cur.execute(_RECORD_SYMPTOM_LOG_SQL, (user_id, log_date))
+
+
+def fetch_summary(cur, user_id):
+    """Read the summary row for one user as a JSON-ready dict (plain tuple cursor)"""
+    cur.execute(_FETCH_SUMMARY_SQL, (user_id,))
+    row = cur.fetchone()
+    if row is None:
+        return {
+            'assessment_count': 0,
+            'clinical_count': 0,
+            'lifestyle_count': 0,
+            'average_probability': None,
+            'latest_probability': None,
+            'latest_risk_level': None,
+            'latest_prediction_type': None,
+            'last_assessment_at': None,
+            'last_symptom_log_date': None,
+            'updated_at': None,
+        }
+
+    (assessment_count, clinical_count, lifestyle_count, probability_sum,
+     latest_probability, latest_risk_level, latest_prediction_type,
+     last_assessment_at, last_symptom_log_date, updated_at) = row
+
+    return {
+        'assessment_count': assessment_count,
+        'clinical_count': clinical_count,
+        'lifestyle_count': lifestyle_count,
+        'average_probability': round(probability_sum / assessment_count, 3) if assessment_count else None,
+        'latest_probability': latest_probability,
+        'latest_risk_level': latest_risk_level,
+        'latest_prediction_type': latest_prediction_type,
+        'last_assessment_at': last_assessment_at,
+        'last_symptom_log_date': last_symptom_log_date,
+        'updated_at': updated_at,
+    }
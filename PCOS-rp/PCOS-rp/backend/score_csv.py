@@ -0,0 +1,284 @@
+"""
+Offline bulk scoring of large CSV files.
+
+The input is streamed in chunks with explicit float dtypes, its columns are
+matched to the model's feature_names (case, spaces and underscores ignored,
+or an explicit --map), and each chunk is scored in a process pool whose
+workers load the model once. Results are written in input order as they
+complete, to CSV (probability, prediction, risk_level) or NPY (float32
+probabilities), so memory stays bounded by chunk size x in-flight chunks.
+
+Feature columns are parsed as float64; rows with an empty feature cell are
+not scored (probability NaN, empty risk_level).
+
+Usage:
+    python score_csv.py screenings.csv scores.csv [--model clinical|lifestyle]
+        [--chunk-size 100000] [--workers N] [--id-column PatientID]
+        [--map "Fasting Glucose=Glucose" ...]
+    python score_csv.py screenings.csv scores.npy
+"""
+
+import argparse
+import os
+import struct
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+import pandas as pd
+
+# model type -> (model, scaler, feature names) artifacts
+MODEL_ARTIFACTS = {
+    'clinical': ("pcos_model.pkl", "pcos_scaler.pkl", "feature_names.pkl"),
+    'lifestyle': ("lifestyle_pcos_model.pkl", "lifestyle_scaler.pkl", "lifestyle_features.pkl"),
+}
+
+DEFAULT_CHUNK_SIZE = 100_000
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_feature_names(model_type):
+    return list(joblib.load(os.path.join(BACKEND_DIR, MODEL_ARTIFACTS[model_type][2])))
+
+
+def load_scoring_model(model_type):
+    model_path, scaler_path, _ = MODEL_ARTIFACTS[model_type]
+    return (joblib.load(os.path.join(BACKEND_DIR, model_path)),
+            joblib.load(os.path.join(BACKEND_DIR, scaler_path)),
+            load_feature_names(model_type))
+
+
+def risk_levels(probabilities):
+    """Vectorized Low/Moderate/High banding (same cut-offs as the API); NaN -> ''"""
+    levels = np.where(probabilities < 0.3, 'Low', np.where(probabilities < 0.7, 'Moderate', 'High'))
+    return np.where(np.isnan(probabilities), '', levels).astype(object)
+
+
+def _normalize(name):
+    return ''.join(ch for ch in str(name).lower() if ch.isalnum())
+
+
+def map_columns(columns, feature_names, overrides=None):
+    """
+    Return {csv column: feature name} for every feature. Explicit `overrides`
+    ({csv column: feature}) win; otherwise columns match features by name,
+    ignoring case, spaces and punctuation. Raises ValueError if a feature has
+    no column.
+    """
+    overrides = dict(overrides or {})
+    by_normalized = {_normalize(c): c for c in columns}
+    taken = {feature: column for column, feature in overrides.items()}
+    mapping = {}
+    for feature in feature_names:
+        column = taken.get(feature) or by_normalized.get(_normalize(feature))
+        if column is None or column not in columns:
+            raise ValueError(f"No column for feature '{feature}' (columns: {list(columns)})")
+        mapping[column] = feature
+    return mapping
+
+
+def iter_feature_chunks(source, feature_names, chunk_size=DEFAULT_CHUNK_SIZE,
+                        overrides=None, id_column=None):
+    """
+    Yield (ids, X) per chunk of a CSV file or file object, with X a float64
+    array in feature_names order. ids is the id column's values, or None.
+    """
+    header = pd.read_csv(source, nrows=0).columns
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    mapping = map_columns(header, feature_names, overrides)
+    order = {feature: column for column, feature in mapping.items()}
+    usecols = list(mapping) + ([id_column] if id_column else [])
+
+    dtype = {column: np.float64 for column in mapping}
+    if id_column:
+        dtype[id_column] = str
+    reader = pd.read_csv(source, usecols=usecols, dtype=dtype, chunksize=chunk_size)
+    for chunk in reader:
+        X = np.column_stack([chunk[order[f]].to_numpy() for f in feature_names])
+        ids = chunk[id_column].to_numpy(dtype=object) if id_column else None
+        yield ids, X
+
+
+def scale_features(scaler, X):
+    """Scale a feature matrix, naming its columns for scalers fitted on a DataFrame"""
+    if hasattr(scaler, 'feature_names_in_'):
+        X = pd.DataFrame(np.asarray(X), columns=scaler.feature_names_in_)
+    return scaler.transform(X)
+
+
+def score_matrix(model, scaler, X):
+    """P(PCOS) for every complete row of X; NaN for rows with a missing feature"""
+    probabilities = np.full(len(X), np.nan)
+    complete = ~np.isnan(X).any(axis=1)
+    if complete.any():
+        positive = list(model.classes_).index(1)
+        probabilities[complete] = model.predict_proba(scale_features(scaler, X[complete]))[:, positive]
+    return probabilities
+
+
+# ---- process pool: each worker loads the model once ----
+_worker_model = None
+
+
+def _init_worker(model_type):
+    global _worker_model
+    _worker_model = load_scoring_model(model_type)
+
+
+def _score_in_worker(X):
+    model, scaler, _ = _worker_model
+    return score_matrix(model, scaler, X)
+
+
+class CsvResultWriter:
+    def __init__(self, path, id_column=None):
+        self.f = open(path, 'w', newline='')
+        self.id_column = id_column
+        self.header = True
+        self.row = 0
+
+    def write(self, ids, probabilities):
+        n = len(probabilities)
+        frame = pd.DataFrame({
+            'row': np.arange(self.row, self.row + n),
+            'probability': probabilities,
+            'prediction': np.where(np.isnan(probabilities), '', (probabilities >= 0.5).astype(int).astype(str)),
+            'risk_level': risk_levels(probabilities),
+        })
+        if self.id_column:
+            frame.insert(1, self.id_column, ids)
+        frame.to_csv(self.f, header=self.header, index=False, float_format='%.6f')
+        self.header = False
+        self.row += n
+
+    def close(self):
+        self.f.close()
+
+
+class NpyResultWriter:
+    """
+    Appends float32 probabilities to a .npy file. The header is written with
+    room for any row count and rewritten with the real shape on close.
+    """
+    HEADER_SIZE = 128
+
+    def __init__(self, path):
+        self.f = open(path, 'wb')
+        self.row = 0
+        self._write_header()
+
+    def _write_header(self):
+        header = repr({'descr': '<f4', 'fortran_order': False, 'shape': (self.row,)})
+        prefix_size = 10  # magic string, version, header length
+        header = header.ljust(self.HEADER_SIZE - prefix_size - 1) + '\n'
+        self.f.write(b'\x93NUMPY\x01\x00' + struct.pack('<H', len(header)) + header.encode('latin1'))
+
+    def write(self, ids, probabilities):
+        self.f.write(np.asarray(probabilities, dtype='<f4').tobytes())
+        self.row += len(probabilities)
+
+    def close(self):
+        self.f.seek(0)
+        self._write_header()
+        self.f.close()
+
+
+def open_writer(path, id_column=None):
+    if path.endswith('.npy'):
+        return NpyResultWriter(path)
+    return CsvResultWriter(path, id_column)
+
+
+def score_file(input_path, output_path, model_type='clinical', chunk_size=DEFAULT_CHUNK_SIZE,
+               workers=None, overrides=None, id_column=None, progress=None):
+    """
+    Score `input_path` into `output_path` with up to `workers` processes.
+    At most 2 x workers chunks are in flight. `progress(rows_done)` is called
+    after each chunk is written. Returns (rows, unscored rows, seconds).
+    """
+    workers = workers or os.cpu_count() or 1
+    feature_names = load_feature_names(model_type)
+    writer = open_writer(output_path, id_column)
+    rows = unscored = 0
+    started = time.time()
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(model_type,)) as pool:
+            pending = deque()
+
+            def drain_one():
+                nonlocal rows, unscored
+                ids, future = pending.popleft()
+                probabilities = future.result()
+                writer.write(ids, probabilities)
+                rows += len(probabilities)
+                unscored += int(np.isnan(probabilities).sum())
+                if progress:
+                    progress(rows)
+
+            for ids, X in iter_feature_chunks(input_path, feature_names, chunk_size, overrides, id_column):
+                pending.append((ids, pool.submit(_score_in_worker, X)))
+                if len(pending) >= 2 * workers:
+                    drain_one()
+            while pending:
+                drain_one()
+    finally:
+        writer.close()
+
+    return rows, unscored, time.time() - started
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a large CSV file with the PCOS model")
+    parser.add_argument('input', help='CSV file with one screening per row')
+    parser.add_argument('output', help='result file (.csv or .npy)')
+    parser.add_argument('--model', choices=list(MODEL_ARTIFACTS), default='clinical')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--workers', type=int, default=None, help='processes (default: all cores)')
+    parser.add_argument('--id-column', help='input column copied to the CSV output')
+    parser.add_argument('--map', action='append', default=[], metavar='COLUMN=FEATURE',
+                        help='map an input column to a feature name')
+    args = parser.parse_args()
+
+    overrides = dict(item.split('=', 1) for item in args.map)
+    print(f"🔄 Scoring {args.input} with the {args.model} model...")
+
+    last_report = [time.time()]
+    started = time.time()
+
+    def progress(rows_done):
+        if time.time() - last_report[0] >= 5:
+            last_report[0] = time.time()
+            print(f"  {rows_done:,} rows ({rows_done / (time.time() - started):,.0f} rows/s)")
+
+    try:
+        rows, unscored, seconds = score_file(args.input, args.output, args.model, args.chunk_size,
+                                             args.workers, overrides, args.id_column, progress)
+    except (FileNotFoundError, ValueError) as e:
+        # ValueError also covers non-numeric cells in a feature column
+        print(f"❌ {e}")
+        return
+
+    print(f"\n✅ Scored {rows:,} rows in {seconds:.1f}s ({rows / max(seconds, 1e-9):,.0f} rows/s) -> {args.output}")
+    if unscored:
+        print(f"   {unscored:,} rows had missing features and were not scored")
+    peak = _peak_rss_mb()
+    if peak:
+        print(f"   Peak memory (main process): {peak:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,414 @@
+"""
+Nearest similar past cases for POST /predict/similar.
+
+Per model type, the stored predictions' feature vectors are standardized with
+the model's scaler and kept on disk in similar_index/<model_type>/:
+
+    meta.json     feature names, scaler fingerprint, generation, rows, last prediction id
+    gen-<n>/      the files of generation n:
+        vectors.f32   (rows x features) float32, in prediction id order
+        norms.f32     squared norm of every vector
+        ids.i64       prediction id of every row
+        probability.f32
+        labels.i8     confirmed diagnosis from prediction_labels (-1: none yet)
+
+Updates are incremental: only predictions after the last indexed id are
+read, in keyset batches, and appended to the current generation's row files;
+labels, which arrive later through /predictions/<id>/feedback, are rewritten
+for every row. meta.json is replaced last, so readers never see a partly
+written row. A rebuild or a different scaler writes a new generation, and
+rows left behind a run that stopped midway are dropped by copying the
+indexed rows into a new one: a file that readers may have mapped is only
+ever appended to, never shrunk (that would SIGBUS them). Generations before
+the previous one are deleted once meta.json points past them. Run it from
+cron or after deploys:
+
+    python similar_index.py [--model clinical|lifestyle] [--rebuild] [--batch-size 5000]
+    python similar_index.py --benchmark 1000000   # query latency on random vectors
+
+Web workers map the current generation read-only (np.memmap) and remap when
+meta.json changes. A query scans the vectors in blocks of BLOCK_ROWS: squared distance
+||x||^2 - 2 x.q (+ ||q||^2) with one matrix-vector product per block, and the
+k best per block kept with argpartition.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime
+
+import joblib
+import numpy as np
+
+from db import get_db_connection
+from feature_store import VECTOR_SQL, JOIN_INPUTS_SQL
+from forest_scoring import RISK_LEVEL_NAMES, Float32Scaler, coerce_features, risk_bands
+from rescore_predictions import rebuild_matrix
+from score_csv import BACKEND_DIR, MODEL_ARTIFACTS, load_feature_names
+
+SIMILAR_INDEX_DIR = os.environ.get('SIMILAR_INDEX_DIR', os.path.join(BACKEND_DIR, 'similar_index'))
+BLOCK_ROWS = 65_536
+DEFAULT_NEIGHBORS = 5
+MAX_NEIGHBORS = 50
+
+# name -> (dtype, values per row)
+ROW_FILES = {
+    'vectors.f32': np.float32,
+    'norms.f32': np.float32,
+    'ids.i64': np.int64,
+    'probability.f32': np.float32,
+}
+
+NEW_PREDICTIONS_SQL = f"""
+    SELECT p.id, p.input_data, {VECTOR_SQL}, mv.feature_names, p.probability
+    FROM predictions p
+    {JOIN_INPUTS_SQL}
+    LEFT JOIN model_versions mv ON mv.version = p.model_version
+    WHERE p.id > %s AND COALESCE(p.prediction_type, 'clinical') = %s AND p.probability IS NOT NULL
+    ORDER BY p.id
+    LIMIT %s
+"""
+
+
+def scaler_fingerprint(scaler, feature_names):
+    digest = hashlib.sha256(json.dumps(list(feature_names)).encode())
+    digest.update(np.asarray(scaler.mean_, dtype=np.float64).tobytes())
+    digest.update(np.asarray(scaler.scale_, dtype=np.float64).tobytes())
+    return digest.hexdigest()[:16]
+
+
+def _read_meta(directory):
+    try:
+        with open(os.path.join(directory, 'meta.json')) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_atomic(path, write):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    with os.fdopen(fd, 'wb') as f:
+        write(f)
+    os.replace(tmp, path)
+
+
+def _width(name, n_features):
+    return n_features if name == 'vectors.f32' else 1
+
+
+def _row_bytes(name, meta):
+    return np.dtype(ROW_FILES[name]).itemsize * _width(name, len(meta['feature_names']))
+
+
+def generation_dir(directory, meta):
+    return os.path.join(directory, f"gen-{meta['generation']}")
+
+
+def _tail_rows(directory, meta):
+    """
+    Rows past meta['rows'] left in the row files by a run that stopped midway;
+    negative if a file is shorter than meta says
+    """
+    generation = generation_dir(directory, meta)
+    extra = []
+    for name in ROW_FILES:
+        try:
+            size = os.path.getsize(os.path.join(generation, name))
+        except FileNotFoundError:
+            size = 0
+        extra.append(size // _row_bytes(name, meta) - meta['rows'])
+    return min(extra) if min(extra) < 0 else max(extra)
+
+
+def start_generation(directory, meta, copy_rows=False):
+    """
+    Point meta at a new generation directory, empty or with the first
+    meta['rows'] rows of the current generation copied over
+    """
+    previous = generation_dir(directory, meta) if copy_rows else None
+    meta['generation'] = meta.get('generation', 0) + 1
+    path = generation_dir(directory, meta)
+    # Left by a run that stopped before switching meta.json; no reader maps it
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path)
+    if previous:
+        for name in ROW_FILES:
+            with open(os.path.join(previous, name), 'rb') as src, open(os.path.join(path, name), 'wb') as dst:
+                remaining = meta['rows'] * _row_bytes(name, meta)
+                while remaining:
+                    chunk = src.read(min(remaining, 1 << 24))
+                    dst.write(chunk)
+                    remaining -= len(chunk)
+
+
+def remove_old_generations(directory, meta):
+    """
+    Delete generations before the previous one, and row files of the layout
+    before generations; readers still mapping them keep them until they remap
+    """
+    for name in os.listdir(directory):
+        number = name[len('gen-'):]
+        if name.startswith('gen-') and number.isdigit() and int(number) < meta['generation'] - 1:
+            shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+        elif name in ROW_FILES or name == 'labels.i8':
+            os.remove(os.path.join(directory, name))
+
+
+def append_rows(directory, meta, columns):
+    """Append a batch (dict of ROW_FILES arrays) to the current generation after meta['rows']"""
+    generation = generation_dir(directory, meta)
+    for name, dtype in ROW_FILES.items():
+        with open(os.path.join(generation, name), 'ab') as f:
+            f.write(np.ascontiguousarray(columns[name], dtype=dtype).tobytes())
+
+
+def update_index(conn, model_type='clinical', batch_size=5000, rebuild=False, directory=None):
+    """Index the predictions stored since the last run; returns the new meta"""
+    directory = directory or os.path.join(SIMILAR_INDEX_DIR, model_type)
+    os.makedirs(directory, exist_ok=True)
+    feature_names = load_feature_names(model_type)
+    scaler = joblib.load(os.path.join(BACKEND_DIR, MODEL_ARTIFACTS[model_type][1]))
+    scale = Float32Scaler(scaler)
+    fingerprint = scaler_fingerprint(scaler, feature_names)
+
+    meta = _read_meta(directory)
+    # An index from before generations has its files in the model directory: start over
+    current = meta is not None and meta['scaler'] == fingerprint and 'generation' in meta
+    tail = _tail_rows(directory, meta) if current else 0
+    if rebuild or not current or tail < 0:
+        if meta is not None:
+            reason = ("" if rebuild else " (the scaler changed)" if meta['scaler'] != fingerprint
+                      else " (the row files are missing rows)" if current else " (old file layout)")
+            print(f"🔁 Starting a new {model_type} index{reason}")
+        meta = {'model_type': model_type, 'feature_names': feature_names, 'scaler': fingerprint,
+                'generation': meta.get('generation', 0) if meta else 0, 'rows': 0, 'last_prediction_id': 0}
+        start_generation(directory, meta)
+    elif tail > 0:
+        print(f"🧹 Dropping {tail:,} rows left by an interrupted update (new generation)")
+        start_generation(directory, meta, copy_rows=True)
+    generation = generation_dir(directory, meta)
+
+    cur = conn.cursor()
+    added = skipped = 0
+    while True:
+        cur.execute(NEW_PREDICTIONS_SQL, (meta['last_prediction_id'], model_type, batch_size))
+        rows = cur.fetchall()
+        if not rows:
+            break
+        X = rebuild_matrix([row[:4] for row in rows], feature_names)
+        complete = ~np.isnan(X).any(axis=1)
+        vectors = scale.transform(X[complete])
+        append_rows(directory, meta, {
+            'vectors.f32': vectors,
+            'norms.f32': np.einsum('ij,ij->i', vectors, vectors),
+            'ids.i64': np.array([row[0] for row in rows])[complete],
+            'probability.f32': np.array([row[4] for row in rows], dtype=np.float32)[complete],
+        })
+        meta['rows'] += int(complete.sum())
+        meta['last_prediction_id'] = rows[-1][0]
+        added += int(complete.sum())
+        skipped += len(rows) - int(complete.sum())
+
+    # Labels can arrive for any indexed row, so they are rewritten as a whole
+    ids = np.fromfile(os.path.join(generation, 'ids.i64'), dtype=np.int64, count=meta['rows'])
+    labels = np.full(meta['rows'], -1, dtype=np.int8)
+    cur.execute("SELECT prediction_id, label FROM prediction_labels")
+    labeled = cur.fetchall()
+    cur.close()
+    if labeled and len(ids):
+        label_ids = np.array([row[0] for row in labeled])
+        position = np.minimum(np.searchsorted(ids, label_ids), len(ids) - 1)
+        found = ids[position] == label_ids
+        labels[position[found]] = np.array([row[1] for row in labeled], dtype=np.int8)[found]
+    _write_atomic(os.path.join(generation, 'labels.i8'), lambda f: f.write(labels.tobytes()))
+
+    meta['updated_at'] = datetime.now().isoformat()
+    _write_atomic(os.path.join(directory, 'meta.json'), lambda f: f.write(json.dumps(meta, indent=2).encode()))
+    remove_old_generations(directory, meta)
+    print(f"✅ {model_type} index: {added:,} rows added, {skipped:,} without a complete vector, "
+          f"{meta['rows']:,} in total, {int((labels >= 0).sum()):,} labeled")
+    return meta
+
+
+class SimilarIndex:
+    """
+    Read-only view of one model type's index, remapped when meta.json changes.
+    An index built with another scaler (the model was retrained since) is ignored.
+    """
+
+    def __init__(self, model_type, scaler, feature_names, directory=None):
+        self.directory = directory or os.path.join(SIMILAR_INDEX_DIR, model_type)
+        self.scale = Float32Scaler(scaler)
+        self.fingerprint = scaler_fingerprint(scaler, feature_names)
+        self._meta_mtime = None
+        self.meta = None
+
+    def _refresh(self):
+        try:
+            mtime = os.stat(os.path.join(self.directory, 'meta.json')).st_mtime_ns
+        except FileNotFoundError:
+            self.meta = None
+            return
+        if mtime == self._meta_mtime:
+            return
+        meta = _read_meta(self.directory)
+        if meta['scaler'] != self.fingerprint or 'generation' not in meta:
+            self.meta, self._meta_mtime = None, mtime
+            return
+        n, d = meta['rows'], len(meta['feature_names'])
+        generation = generation_dir(self.directory, meta)
+        arrays = {}
+        try:
+            for name, dtype in ROW_FILES.items():
+                shape = (n, d) if name == 'vectors.f32' else (n,)
+                arrays[name] = (np.memmap(os.path.join(generation, name), dtype=dtype, mode='r', shape=shape)
+                                if n else np.empty(shape, dtype=dtype))
+            arrays['labels.i8'] = np.fromfile(os.path.join(generation, 'labels.i8'), dtype=np.int8, count=n)
+        except FileNotFoundError:
+            # Removed after an even newer meta.json was written; keep the current view and retry next time
+            return
+        self.arrays, self.meta, self._meta_mtime = arrays, meta, mtime
+
+    @property
+    def rows(self):
+        self._refresh()
+        return self.meta['rows'] if self.meta else 0
+
+    def search(self, query, k):
+        """(row indices, squared distances) of the k nearest standardized vectors to `query`"""
+        vectors, norms = self.arrays['vectors.f32'], self.arrays['norms.f32']
+        k = min(k, len(vectors))
+        best_rows, best_distances = [], []
+        for start in range(0, len(vectors), BLOCK_ROWS):
+            # ||x - q||^2 without the constant ||q||^2
+            distances = norms[start:start + BLOCK_ROWS] - 2 * (vectors[start:start + BLOCK_ROWS] @ query)
+            top = np.argpartition(distances, k - 1)[:k] if len(distances) > k else np.arange(len(distances))
+            best_rows.append(start + top)
+            best_distances.append(distances[top])
+        rows, distances = np.concatenate(best_rows), np.concatenate(best_distances)
+        order = np.argsort(distances, kind='stable')[:k]
+        return rows[order], np.maximum(distances[order] + query @ query, 0)
+
+    def neighbors(self, row, k=5):
+        """Anonymized k most similar indexed cases to a coerced (1 x features) row, or None without an index"""
+        self._refresh()
+        if not self.meta or not self.meta['rows']:
+            return None
+        query = self.scale.transform(row)[0]
+        rows, distances = self.search(query, k)
+        raw = self.arrays['vectors.f32'][rows] * self.scale.scale + self.scale.mean
+        probability = self.arrays['probability.f32'][rows]
+        labels = self.arrays['labels.i8'][rows]
+        names = self.meta['feature_names']
+        return [{
+            'rank': i + 1,
+            'distance': round(float(np.sqrt(distances[i])), 4),
+            'features': {name: round(float(value), 2) for name, value in zip(names, raw[i])},
+            'probability': round(float(probability[i]), 3),
+            'risk_level': RISK_LEVEL_NAMES[risk_bands(probability[i])],
+            'confirmed_label': int(labels[i]) if labels[i] >= 0 else None,
+        } for i in range(len(rows))]
+
+
+def similar_cases(index, feature_names, data):
+    """
+    The /predict/similar response for a request body (the features as for
+    /predict, optional 'k'), or None while the index is not built. Raises
+    ValueError (a 400) for invalid input.
+    """
+    missing = [f for f in feature_names if f not in data]
+    if missing:
+        raise ValueError(f"Missing required feature(s): {', '.join(missing)}")
+    try:
+        k = int(data.get('k', DEFAULT_NEIGHBORS))
+    except (TypeError, ValueError):
+        raise ValueError("'k' must be a whole number")
+    if not 1 <= k <= MAX_NEIGHBORS:
+        raise ValueError(f"'k' must be between 1 and {MAX_NEIGHBORS}")
+    row = coerce_features([data[f] for f in feature_names], feature_names)
+
+    neighbors = index.neighbors(row, k)
+    if neighbors is None:
+        return None
+    labels = [n['confirmed_label'] for n in neighbors if n['confirmed_label'] is not None]
+    return {
+        'k': len(neighbors),
+        'indexed': index.meta['rows'],
+        'index_updated_at': index.meta.get('updated_at'),
+        'neighbors': neighbors,
+        'outcomes': {
+            'mean_probability': round(float(np.mean([n['probability'] for n in neighbors])), 3),
+            'confirmed': len(labels),
+            'confirmed_pcos_rate': round(sum(labels) / len(labels), 3) if labels else None,
+        },
+    }
+
+
+def _benchmark(n_rows, n_features=8, k=5, queries=50):
+    rng = np.random.default_rng(0)
+    class Identity:
+        mean_, scale_ = np.zeros(n_features), np.ones(n_features)
+        with_mean = with_std = True
+
+    names = [f'f{i}' for i in range(n_features)]
+    with tempfile.TemporaryDirectory() as directory:
+        meta = {'model_type': 'benchmark', 'feature_names': names,
+                'scaler': scaler_fingerprint(Identity, names), 'rows': 0, 'last_prediction_id': n_rows}
+        start_generation(directory, meta)
+        for start in range(0, n_rows, 250_000):
+            vectors = rng.standard_normal((min(250_000, n_rows - start), n_features), dtype=np.float32)
+            append_rows(directory, meta, {
+                'vectors.f32': vectors, 'norms.f32': np.einsum('ij,ij->i', vectors, vectors),
+                'ids.i64': np.arange(start, start + len(vectors)),
+                'probability.f32': rng.random(len(vectors), dtype=np.float32),
+            })
+            meta['rows'] += len(vectors)
+        np.full(n_rows, -1, dtype=np.int8).tofile(os.path.join(generation_dir(directory, meta), 'labels.i8'))
+        with open(os.path.join(directory, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+
+        index = SimilarIndex('benchmark', Identity, names, directory)
+        index.neighbors(np.zeros((1, n_features), dtype=np.float32), k)  # map and fault in the pages
+        times = []
+        for _ in range(queries):
+            row = rng.standard_normal((1, n_features), dtype=np.float32)
+            started = time.perf_counter()
+            index.neighbors(row, k)
+            times.append(time.perf_counter() - started)
+
+        check = rng.standard_normal(n_features, dtype=np.float32)
+        rows, _ = index.search(check, k)
+        exact = np.argsort(((index.arrays['vectors.f32'] - check) ** 2).sum(axis=1))[:k]
+        print(f"🔎 Top-{k} of {n_rows:,} x {n_features} vectors: median {np.median(times) * 1000:.1f} ms, "
+              f"p95 {np.quantile(times, 0.95) * 1000:.1f} ms per query; "
+              f"matches exact sort: {set(rows.tolist()) == set(exact.tolist())}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Update the similar-case index of stored predictions")
+    parser.add_argument('--model', choices=list(MODEL_ARTIFACTS), default='clinical')
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--rebuild', action='store_true', help='start a new index instead of appending')
+    parser.add_argument('--benchmark', type=int, metavar='ROWS', help='time queries on ROWS random vectors')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        _benchmark(args.benchmark)
+        return
+
+    conn = get_db_connection()
+    if not conn:
+        print("❌ Could not connect to database")
+        return
+    try:
+        update_index(conn, args.model, args.batch_size, args.rebuild)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -11,48 +11,14 @@ try:
     from sklearn.preprocessing import StandardScaler
     from sklearn.metrics import accuracy_score, roc_auc_score
     import joblib
+    from training_data import load_dataset
+    from drift_monitor import save_reference
     
     print("✅ All libraries imported successfully")
     
     # Generate synthetic data
     print("📊 Generating synthetic PCOS data...")
-    np.random.seed(42)
-    
-    # Create 1000 samples
-    n_samples = 1000
-    n_healthy = int(n_samples * 0.7)
-    n_pcos = n_samples - n_healthy
-    
-    # Healthy samples
-    healthy_data = np.column_stack([
-        np.random.normal(28, 6, n_healthy),      # Age
-        np.random.normal(23, 3, n_healthy),      # BMI
-        np.random.normal(12, 4, n_healthy),      # Insulin
-        np.random.normal(35, 10, n_healthy),     # Testosterone
-        np.random.normal(6, 2, n_healthy),       # LH
-        np.random.normal(7, 2, n_healthy),       # FSH
-        np.random.normal(90, 10, n_healthy),     # Glucose
-        np.random.normal(180, 30, n_healthy),    # Cholesterol
-    ])
-    healthy_labels = np.zeros(n_healthy)
-    
-    # PCOS samples
-    pcos_data = np.column_stack([
-        np.random.normal(26, 5, n_pcos),         # Age
-        np.random.normal(28, 5, n_pcos),         # BMI
-        np.random.normal(18, 6, n_pcos),         # Insulin
-        np.random.normal(55, 15, n_pcos),        # Testosterone
-        np.random.normal(12, 4, n_pcos),         # LH
-        np.random.normal(6, 2, n_pcos),          # FSH
-        np.random.normal(105, 15, n_pcos),       # Glucose
-        np.random.normal(200, 40, n_pcos),       # Cholesterol
-    ])
-    pcos_labels = np.ones(n_pcos)
-    
-    # Combine data
-    X = np.vstack([healthy_data, pcos_data])
-    y = np.concatenate([healthy_labels, pcos_labels])
-    feature_names = ['Age', 'BMI', 'Insulin', 'Testosterone', 'LH', 'FSH', 'Glucose', 'Cholesterol']
+    X, y, feature_names = load_dataset('clinical', n_samples=1000)
     
     print(f"✅ Dataset created: {X.shape}, PCOS cases: {np.sum(y)} ({np.mean(y)*100:.1f}%)")
     
@@ -112,6 +78,7 @@ try:
     joblib.dump(best_model, "pcos_model.pkl")
     joblib.dump(scaler, "pcos_scaler.pkl")
     joblib.dump(feature_names, "feature_names.pkl")
+    save_reference('clinical', X_train, feature_names)
     
     print("✅ Model training complete!")
     print(f"📁 Files saved: pcos_model.pkl, pcos_scaler.pkl, feature_names.pkl")
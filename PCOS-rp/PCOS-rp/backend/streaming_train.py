@@ -0,0 +1,133 @@
+"""
+Out-of-core training for datasets larger than memory.
+
+Rows arrive in chunks, read from a CSV file on disk or generated on the fly,
+and only one chunk is held in memory at a time:
+
+  1. one pass fits the StandardScaler's mean/variance with partial_fit;
+  2. --epochs passes train an SGDClassifier (log loss, so it has
+     predict_proba) with partial_fit on each scaled chunk, holding out every
+     `holdout_every`-th row;
+  3. a last pass scores the held-out rows for accuracy and ROC-AUC (only
+     their float32 probabilities are kept).
+
+Used by `train_model.py --stream` and `train_lifestyle_model.py --stream`.
+"""
+
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import SGDClassifier
+from sklearn.metrics import roc_auc_score
+from sklearn.preprocessing import StandardScaler
+
+from score_csv import MODEL_ARTIFACTS, _peak_rss_mb, map_columns
+
+TARGET_COLUMN = 'PCOS'
+
+
+def csv_chunks(path, feature_names, chunk_size, target=TARGET_COLUMN):
+    """Chunk source over a CSV with the feature columns and a 0/1 target column"""
+    def chunks():
+        header = pd.read_csv(path, nrows=0).columns
+        mapping = map_columns(header, feature_names)
+        order = {feature: column for column, feature in mapping.items()}
+        dtype = {column: np.float64 for column in [*mapping, target]}
+        for chunk in pd.read_csv(path, usecols=[*mapping, target], dtype=dtype, chunksize=chunk_size):
+            X = np.column_stack([chunk[order[f]].to_numpy() for f in feature_names])
+            yield X, chunk[target].to_numpy()
+    return chunks
+
+
+def synthetic_chunks(generator, n_samples, chunk_size, seed=42):
+    """Chunk source of synthetic 'clinical' or 'lifestyle' rows, chunk i seeded by (seed, i)"""
+    def chunks():
+        if generator == 'lifestyle':
+            from train_lifestyle_model import iter_lifestyle_chunks, LIFESTYLE_COLUMNS
+            for df in iter_lifestyle_chunks(n_samples, seed, chunk_size):
+                yield df[LIFESTYLE_COLUMNS[:-1]].to_numpy(dtype=np.float64), df['PCOS'].to_numpy()
+            return
+        from training_data import generate_synthetic_pcos_data
+        for index, start in enumerate(range(0, n_samples, chunk_size)):
+            X, y, _ = generate_synthetic_pcos_data(min(chunk_size, n_samples - start), seed + index)
+            # The generator emits healthy rows first; SGD needs them mixed
+            order = np.random.RandomState(seed + index).permutation(len(y))
+            yield X[order], y[order]
+    return chunks
+
+
+def _rss():
+    peak = _peak_rss_mb()
+    return f", peak RSS {peak:.0f} MB" if peak else ""
+
+
+def _holdout_mask(start, n, holdout_every):
+    return (np.arange(start, start + n) % holdout_every) == 0
+
+
+def train_streaming(chunks, feature_names=None, epochs=1, holdout_every=10, alpha=1e-4, seed=42):
+    """
+    Fit (scaler, model) over `chunks()`, a callable returning a fresh
+    iterator of (X, y) chunks. Pass feature_names to give the scaler named
+    features (as the lifestyle scaler has). Returns (model, scaler, metrics).
+    """
+    def frame(X):
+        return pd.DataFrame(X, columns=feature_names) if feature_names else X
+
+    started = time.perf_counter()
+    scaler = StandardScaler()
+    rows = 0
+    for X, _ in chunks():
+        scaler.partial_fit(frame(X))
+        rows += len(X)
+    print(f"  Scaler pass: {rows:,} rows in {time.perf_counter() - started:.1f}s{_rss()}")
+
+    model = SGDClassifier(loss='log_loss', alpha=alpha, random_state=seed)
+    classes = np.array([0, 1])
+    for epoch in range(epochs):
+        epoch_started = time.perf_counter()
+        position = 0
+        for X, y in chunks():
+            train = ~_holdout_mask(position, len(y), holdout_every)
+            position += len(y)
+            model.partial_fit(scaler.transform(frame(X[train])), y[train].astype(np.int64), classes=classes)
+        print(f"  Epoch {epoch + 1}/{epochs}: {time.perf_counter() - epoch_started:.1f}s{_rss()}")
+
+    probabilities, labels = [], []
+    position = 0
+    for X, y in chunks():
+        holdout = _holdout_mask(position, len(y), holdout_every)
+        position += len(y)
+        if holdout.any():
+            probabilities.append(model.predict_proba(scaler.transform(frame(X[holdout])))[:, 1].astype(np.float32))
+            labels.append(y[holdout].astype(np.int8))
+    probabilities, labels = np.concatenate(probabilities), np.concatenate(labels)
+
+    metrics = {
+        'rows': rows,
+        'holdout_rows': len(labels),
+        'accuracy': float(((probabilities >= 0.5) == labels).mean()),
+        'roc_auc': float(roc_auc_score(labels, probabilities)) if len(set(labels)) == 2 else None,
+        'seconds': time.perf_counter() - started,
+        'peak_rss_mb': _peak_rss_mb(),
+    }
+    return model, scaler, metrics
+
+
+def train_and_save(model_type, chunks, feature_names, epochs=1, named=False):
+    """Streaming training run that saves the model_type's artifacts (see score_csv.MODEL_ARTIFACTS)"""
+    print(f"🌊 Streaming training of the {model_type} model ({epochs} epoch(s))...")
+    model, scaler, metrics = train_streaming(chunks, feature_names if named else None, epochs)
+
+    roc_auc = f"{metrics['roc_auc']:.3f}" if metrics['roc_auc'] is not None else "n/a"
+    print(f"\n📊 Holdout ({metrics['holdout_rows']:,} rows): accuracy {metrics['accuracy']:.3f}, ROC-AUC {roc_auc}")
+    print(f"⏱️  {metrics['rows']:,} rows in {metrics['seconds']:.1f}s{_rss()}")
+
+    model_path, scaler_path, features_path = MODEL_ARTIFACTS[model_type]
+    joblib.dump(model, model_path)
+    joblib.dump(scaler, scaler_path)
+    joblib.dump(feature_names, features_path)
+    print(f"💾 Saved {model_path}, {scaler_path}, {features_path}")
+    return model, scaler, metrics
@@ -0,0 +1,103 @@
+"""
+What-if risk curves: POST /predict/sweep.
+
+The request holds a base profile and one or two swept features, each either
+an explicit list of values or a start/stop/steps range:
+
+    {"model": "lifestyle",
+     "profile": {"Age": 28, "BMI": 31, ...},
+     "sweep": [{"feature": "BMI", "start": 22, "stop": 34, "steps": 25},
+               {"feature": "ExerciseFrequency", "values": [0, 1, 2, 3, 4, 5]}]}
+
+The whole grid is built as one matrix (the profile repeated, the swept
+columns filled from a meshgrid) and scored with a single predict_proba call
+(score_csv.score_matrix), together with the profile itself. Probabilities
+and risk bands come back as arrays shaped like the grid.
+"""
+
+import numpy as np
+
+from forest_scoring import RISK_LEVEL_NAMES, coerce_features, risk_bands
+from score_csv import score_matrix
+
+MAX_SWEEP_POINTS = 10_000
+MAX_SWEEP_FEATURES = 2
+DEFAULT_STEPS = 21
+
+
+def parse_axis(spec, feature_names):
+    """(feature, values) of one sweep entry; ValueError if it is invalid"""
+    if not isinstance(spec, dict) or spec.get('feature') not in feature_names:
+        raise ValueError(f"Each sweep entry needs a 'feature', one of {list(feature_names)}")
+    feature = spec['feature']
+    if 'values' in spec:
+        if not isinstance(spec['values'], list) or not spec['values']:
+            raise ValueError(f"'values' for {feature} must be a non-empty list")
+        values = coerce_features(spec['values'])[0]
+    else:
+        try:
+            start, stop = coerce_features([spec['start'], spec['stop']])[0]
+            steps = int(spec.get('steps', DEFAULT_STEPS))
+        except KeyError:
+            raise ValueError(f"Give 'values' or 'start' and 'stop' for {feature}")
+        except (TypeError, ValueError):
+            raise ValueError(f"'start', 'stop' and 'steps' for {feature} must be numbers")
+        if steps < 2:
+            raise ValueError(f"'steps' for {feature} must be at least 2")
+        values = np.linspace(start, stop, min(steps, MAX_SWEEP_POINTS))
+    return feature, values
+
+
+def build_grid(base_row, feature_names, axes):
+    """(points x features) matrix: base_row with the swept columns set to every combination"""
+    shape = tuple(len(values) for _, values in axes)
+    grid = np.repeat(base_row, int(np.prod(shape)), axis=0)
+    for (feature, _), column in zip(axes, np.meshgrid(*(values for _, values in axes), indexing='ij')):
+        grid[:, list(feature_names).index(feature)] = column.ravel()
+    return grid, shape
+
+
+def sweep(model, scaler, feature_names, data):
+    """
+    The /predict/sweep response for a request body. Raises ValueError (a 400)
+    for an invalid profile or sweep.
+    """
+    specs = data.get('sweep')
+    if isinstance(specs, dict):
+        specs = [specs]
+    if not isinstance(specs, list) or not 1 <= len(specs) <= MAX_SWEEP_FEATURES:
+        raise ValueError(f"'sweep' must list 1 to {MAX_SWEEP_FEATURES} features")
+    axes = [parse_axis(spec, feature_names) for spec in specs]
+    swept = [feature for feature, _ in axes]
+    if len(set(swept)) != len(swept):
+        raise ValueError("A feature can only be swept once")
+    points = int(np.prod([len(values) for _, values in axes]))
+    if points > MAX_SWEEP_POINTS:
+        raise ValueError(f"The sweep has {points:,} points; the limit is {MAX_SWEEP_POINTS:,}")
+
+    profile = data.get('profile') or {}
+    missing = [f for f in feature_names if f not in profile and f not in swept]
+    if missing:
+        raise ValueError(f"Missing profile feature(s): {', '.join(missing)}")
+    # Swept features may be left out of the profile; they only matter for the base point
+    has_base = all(f in profile for f in swept)
+    base_row = coerce_features([profile[f] if f in profile else 0 for f in feature_names], feature_names)
+
+    grid, shape = build_grid(base_row, feature_names, axes)
+    rows = np.vstack([grid, base_row]) if has_base else grid
+    probabilities = score_matrix(model, scaler, rows)
+    curve = probabilities[:points]
+
+    result = {
+        'features': swept,
+        'axes': [values.tolist() for _, values in axes],
+        'shape': list(shape),
+        'points': points,
+        'probability': np.round(curve, 4).reshape(shape).tolist(),
+        'risk_band': risk_bands(curve).reshape(shape).tolist(),
+        'risk_levels': RISK_LEVEL_NAMES.tolist(),
+    }
+    if has_base:
+        base = float(probabilities[-1])
+        result['base'] = {'probability': round(base, 4), 'risk_level': RISK_LEVEL_NAMES[risk_bands(base)]}
+    return result
@@ -85,6 +85,119 @@ def test_model_with_examples():
         print(f"   PCOS Probability: {result['pcos_probability']:.3f}")
         print(f"   Confidence: {result['confidence']:.3f}")
 
+def test_early_exit_bands(n_samples=2000):
+    """Early-exit scoring must give every row the full forest's risk band"""
+    from forest_scoring import CompiledForest, is_forest, risk_bands
+    from score_csv import load_scoring_model, scale_features
+    from training_data import load_dataset
+
+    print("\n🧪 Testing early-exit forest scoring:")
+    model, scaler, _ = load_scoring_model('lifestyle')
+    if not is_forest(model):
+        print("   Lifestyle model is not a forest; skipped")
+        return
+    X, _, _ = load_dataset('lifestyle', n_samples=n_samples, seed=99)
+    X_scaled = scale_features(scaler, X)
+    full = risk_bands(model.predict_proba(X_scaled)[:, 1])
+
+    forest = CompiledForest(model)
+    assert np.allclose(forest.predict_proba(X_scaled), model.predict_proba(X_scaled))
+    for block in (1, 10):
+        _, bands, evaluated = forest.predict_risk_early_exit(X_scaled, block=block)
+        assert (bands == full).all(), f"{(bands != full).sum()} rows changed band (block {block})"
+        print(f"   ✅ block {block}: bands match on {n_samples} rows, "
+              f"{evaluated.mean():.1f}/{forest.n_trees} trees on average")
+    _, bands, evaluated = forest.predict_risk_early_exit(X_scaled, delta=0.001)
+    print(f"   delta=0.001: {(bands == full).mean() * 100:.2f}% band agreement, "
+          f"{evaluated.mean():.1f}/{forest.n_trees} trees on average")
+
+def test_float32_forest(n_samples=2000):
+    """The float32 compiled forest must reach the same leaves as sklearn"""
+    from forest_scoring import CompiledForest, is_forest
+    from score_csv import load_scoring_model, scale_features
+    from training_data import load_dataset
+
+    print("\n🧪 Testing float32 forest scoring:")
+    model, scaler, _ = load_scoring_model('lifestyle')
+    if not is_forest(model):
+        print("   Lifestyle model is not a forest; skipped")
+        return
+    X, _, _ = load_dataset('lifestyle', n_samples=n_samples, seed=7)
+    X_scaled = scale_features(scaler, X).astype(np.float32)
+
+    # Rows sitting exactly on (and one float32 step either side of) the first tree's thresholds
+    tree = model.estimators_[0].tree_
+    internal = tree.children_left != -1
+    edges = np.repeat(X_scaled[:1], 3 * internal.sum(), axis=0)
+    for i, (feature, threshold) in enumerate(zip(tree.feature[internal], tree.threshold[internal])):
+        t32 = np.float32(threshold)
+        for j, value in enumerate([t32, np.nextafter(t32, np.float32(-np.inf)), np.nextafter(t32, np.float32(np.inf))]):
+            edges[3 * i + j, feature] = value
+    X_all = np.vstack([X_scaled, edges])
+
+    forest = CompiledForest(model, dtype=np.float32)
+    assert (forest.leaves(X_all) == model.apply(X_all)).all(), "float32 split decisions differ from sklearn"
+    assert np.allclose(forest.predict_proba(X_all), model.predict_proba(X_all), atol=1e-6)
+    print(f"   ✅ same leaves as sklearn on {len(X_all)} rows ({len(edges)} on split thresholds), "
+          f"{forest.nbytes / 1024:.0f} KB of arrays")
+
+    p, contributions = forest.explain(X_scaled)
+    assert np.allclose(forest.base_rate + contributions.sum(axis=1), p, atol=1e-6)
+    print(f"   ✅ per-row contributions add up to the probability (base rate {forest.base_rate:.3f})")
+
+def test_served_forest(n_samples=20000, n_random=200000, n_requests=200):
+    """Raw request values through the served path must score exactly as predict_proba(scaler.transform(X))"""
+    from forest_scoring import coerce_features, compile_for_serving, is_forest, score_row
+    from score_csv import load_scoring_model, scale_features
+    from training_data import load_dataset
+
+    print("\n🧪 Testing the served forest path on raw inputs:")
+    model, scaler, feature_names = load_scoring_model('lifestyle')
+    if not is_forest(model):
+        print("   Lifestyle model is not a forest; skipped")
+        return
+    X, _, _ = load_dataset('lifestyle', n_samples=n_samples, seed=21)
+    X = np.asarray(X, dtype=np.float64)
+    # Values as JSON carries them, and float32 values spread around the training distribution
+    # (scaling those in float32 arithmetic puts a few of them on the other side of a split)
+    spread = scaler.mean_ + scaler.scale_ * np.random.default_rng(1).normal(size=(n_random, len(feature_names)))
+    X = np.vstack([np.round(X, 1), spread.astype(np.float32)])
+    expected_leaves = model.apply(scale_features(scaler, X))
+    expected = model.predict_proba(scale_features(scaler, X))[:, 1]
+
+    compiled = compile_for_serving(model, scaler)
+    forest, forest_scaler = compiled
+    assert (forest.leaves(forest_scaler.transform(X)) == expected_leaves).all(), \
+        "served scaling changes split decisions"
+    for i in np.random.default_rng(0).choice(len(X), n_requests, replace=False):
+        _, probabilities, _ = score_row(model, scaler, coerce_features(X[i].tolist(), feature_names), compiled)
+        assert abs(probabilities[1] - expected[i]) < 1e-6, (i, probabilities[1], expected[i])
+    print(f"   ✅ same leaves as sklearn on {len(X)} raw rows; {n_requests} requests match predict_proba")
+
+def test_drift_monitor(n_samples=2000):
+    """Served rows must land in the reference's bins; training-like traffic must read as stable"""
+    import tempfile
+    from drift_monitor import DriftMonitor, bin_counts, compare
+    from forest_scoring import coerce_features
+    from training_data import load_dataset
+
+    print("\n🧪 Testing the input drift monitor:")
+    X, _, feature_names = load_dataset('clinical', n_samples=n_samples, seed=11)
+    X = np.asarray(X)
+    with tempfile.TemporaryDirectory() as directory:
+        monitor = DriftMonitor('clinical', directory=directory, interval=10 ** 9)
+        if monitor.reference is None:
+            print("   No clinical drift reference; skipped")
+            return
+        for row in X[:500]:
+            monitor.observe(coerce_features(row.tolist(), feature_names))
+        rows = np.vstack([coerce_features(row.tolist()) for row in X[:500]])
+        assert (monitor.totals() == bin_counts(rows, monitor.reference['edges'])).all()
+    report = compare(monitor.reference, bin_counts(X, monitor.reference['edges']))
+    assert report['status'] == 'stable', report['max_psi_feature']
+    print(f"   ✅ counters match the reference bins; {report['n']} new training-like rows read as stable "
+          f"(max PSI {max(f['psi'] for f in report['features']):.3f})")
+
 def interactive_prediction():
     """Interactive mode for making predictions"""
     print("\n🎯 Interactive PCOS Prediction")
@@ -125,6 +238,10 @@ def interactive_prediction():
 if __name__ == "__main__":
     # Run tests with example patients
     test_model_with_examples()
+    test_early_exit_bands()
+    test_float32_forest()
+    test_served_forest()
+    test_drift_monitor()
     
     # Option for interactive mode
     interactive = input("\n🤔 Would you like to try interactive prediction mode? (y/n): ")
@@ -10,175 +10,222 @@ from sklearn.model_selection import train_test_split, cross_val_score
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
 import joblib
+import os
 import warnings
 warnings.filterwarnings('ignore')
 
+# Distributions of the synthetic features, as (healthy, PCOS) parameters.
+# Continuous features: normal (mean, std) clipped to a valid range;
+# ordinal features: category probabilities for the values 0..k-1.
+PCOS_PREVALENCE = 0.3
+NORMAL_FEATURES = {
+    'Age': ((28, 5), (28, 5), (18, 45)),
+    'BMI': ((23, 3), (28, 5), (15, 45)),  # Higher BMI in PCOS
+    'CycleLength': ((28, 3), (45, 15), (20, 90)),  # Longer cycles
+    'StressLevel': ((5, 2), (7, 2), (0, 10)),
+    'ExerciseFrequency': ((3, 1), (2, 1), (0, 7)),  # Less exercise
+    'SleepQuality': ((7, 2), (4, 2), (0, 10)),  # Worse sleep
+}
+CATEGORICAL_FEATURES = {
+    'CycleRegularity': ([0.7, 0.2, 0.1], [0.1, 0.2, 0.7]),  # 0=Regular, 1=Irregular, 2=VeryIrregular
+    'Hirsutism': ([0.6, 0.3, 0.1, 0.0], [0.2, 0.2, 0.3, 0.3]),  # 0-3 scale
+    'Acne': ([0.5, 0.3, 0.2, 0.0], [0.2, 0.3, 0.3, 0.2]),  # 0-3 scale
+    'HairLoss': ([0.7, 0.2, 0.1], [0.3, 0.4, 0.3]),  # 0-2 scale
+    'WeightGainDifficulty': ([0.5, 0.3, 0.2], [0.2, 0.3, 0.5]),  # 0-2 scale
+    'FamilyHistory': ([0.7, 0.3], [0.4, 0.6]),
+}
+LIFESTYLE_COLUMNS = [
+    'Age', 'BMI', 'CycleRegularity', 'CycleLength',
+    'Hirsutism', 'Acne', 'HairLoss', 'WeightGainDifficulty',
+    'FamilyHistory', 'StressLevel', 'ExerciseFrequency', 'SleepQuality', 'PCOS'
+]
+
+
+def generate_lifestyle_chunk(rng, n):
+    """
+    n synthetic rows drawn with the np.random.Generator `rng`, all features
+    at once: each normal feature is one standard-normal draw shifted and
+    scaled by the row's class, each ordinal feature one uniform draw mapped
+    through the class's cumulative probabilities.
+    """
+    has_pcos = (rng.random(n) < PCOS_PREVALENCE).astype(np.int64)
+    columns = {}
+
+    for name, (healthy, pcos, (low, high)) in NORMAL_FEATURES.items():
+        means = np.array([healthy[0], pcos[0]], dtype=float)[has_pcos]
+        stds = np.array([healthy[1], pcos[1]], dtype=float)[has_pcos]
+        columns[name] = np.clip(means + stds * rng.standard_normal(n), low, high)
+
+    for name, (healthy, pcos) in CATEGORICAL_FEATURES.items():
+        cumulative = np.cumsum([healthy, pcos], axis=1)[:, :-1]  # (2, k-1) category edges
+        u = rng.random(n)
+        columns[name] = (u[:, None] >= cumulative[has_pcos]).sum(axis=1)
+
+    columns['PCOS'] = has_pcos
+    return pd.DataFrame(columns, columns=LIFESTYLE_COLUMNS)
+
+
+def iter_lifestyle_chunks(n_samples, seed=42, chunk_size=1_000_000):
+    """
+    Yield the dataset as DataFrames of up to chunk_size rows. Every chunk has
+    its own generator spawned from `seed`, so output is reproducible for a
+    given (seed, chunk_size) and memory stays bounded by one chunk.
+    """
+    for index, start in enumerate(range(0, n_samples, chunk_size)):
+        rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(index,)))
+        yield generate_lifestyle_chunk(rng, min(chunk_size, n_samples - start))
+
+
 # Sample data creation (in real scenario, this would come from dataset)
-def create_sample_pcos_data(n_samples=1000):
+def create_sample_pcos_data(n_samples=1000, seed=42, chunk_size=1_000_000):
     """
     Create synthetic PCOS data based on known correlations
     In production, replace with real Kaggle dataset
     """
-    np.random.seed(42)
-    
-    data = []
-    for i in range(n_samples):
-        # PCOS status (target)
-        has_pcos = np.random.choice([0, 1], p=[0.7, 0.3])  # 30% PCOS prevalence
-        
-        # Features with different distributions based on PCOS status
-        if has_pcos:
-            age = np.random.normal(28, 5)
-            bmi = np.random.normal(28, 5)  # Higher BMI in PCOS
-            cycle_regularity = np.random.choice([0, 1, 2], p=[0.1, 0.2, 0.7])  # Mostly irregular
-            cycle_length = np.random.normal(45, 15)  # Longer cycles
-            hirsutism = np.random.choice([0, 1, 2, 3], p=[0.2, 0.2, 0.3, 0.3])  # More hair growth
-            acne = np.random.choice([0, 1, 2, 3], p=[0.2, 0.3, 0.3, 0.2])
-            hair_loss = np.random.choice([0, 1, 2], p=[0.3, 0.4, 0.3])
-            weight_gain_difficulty = np.random.choice([0, 1, 2], p=[0.2, 0.3, 0.5])
-            family_history = np.random.choice([0, 1], p=[0.4, 0.6])
-            stress_level = np.random.normal(7, 2)
-            exercise_frequency = np.random.normal(2, 1)  # Less exercise
-            sleep_quality = np.random.normal(4, 2)  # Worse sleep
-        else:
-            age = np.random.normal(28, 5)
-            bmi = np.random.normal(23, 3)  # Normal BMI
-            cycle_regularity = np.random.choice([0, 1, 2], p=[0.7, 0.2, 0.1])  # Mostly regular
-            cycle_length = np.random.normal(28, 3)  # Normal cycles
-            hirsutism = np.random.choice([0, 1, 2, 3], p=[0.6, 0.3, 0.1, 0.0])
-            acne = np.random.choice([0, 1, 2, 3], p=[0.5, 0.3, 0.2, 0.0])
-            hair_loss = np.random.choice([0, 1, 2], p=[0.7, 0.2, 0.1])
-            weight_gain_difficulty = np.random.choice([0, 1, 2], p=[0.5, 0.3, 0.2])
-            family_history = np.random.choice([0, 1], p=[0.7, 0.3])
-            stress_level = np.random.normal(5, 2)
-            exercise_frequency = np.random.normal(3, 1)
-            sleep_quality = np.random.normal(7, 2)
-        
-        # Clip values to valid ranges
-        age = np.clip(age, 18, 45)
-        bmi = np.clip(bmi, 15, 45)
-        cycle_length = np.clip(cycle_length, 20, 90)
-        stress_level = np.clip(stress_level, 0, 10)
-        exercise_frequency = np.clip(exercise_frequency, 0, 7)
-        sleep_quality = np.clip(sleep_quality, 0, 10)
-        
-        data.append({
-            'Age': age,
-            'BMI': bmi,
-            'CycleRegularity': cycle_regularity,  # 0=Regular, 1=Irregular, 2=VeryIrregular
-            'CycleLength': cycle_length,
-            'Hirsutism': hirsutism,  # 0-3 scale
-            'Acne': acne,  # 0-3 scale
-            'HairLoss': hair_loss,  # 0-2 scale
-            'WeightGainDifficulty': weight_gain_difficulty,  # 0-2 scale
-            'FamilyHistory': family_history,
-            'StressLevel': stress_level,
-            'ExerciseFrequency': exercise_frequency,
-            'SleepQuality': sleep_quality,
-            'PCOS': has_pcos
-        })
-    
-    return pd.DataFrame(data)
+    return pd.concat(list(iter_lifestyle_chunks(n_samples, seed, chunk_size)), ignore_index=True)
 
 
-def train_lifestyle_model():
-    """Train the lifestyle-based PCOS prediction model"""
-    print("🚀 Training Lifestyle-based PCOS Prediction Model...")
-    print("=" * 60)
-    
-    # Create/load data
-    print("\n📊 Creating dataset...")
-    df = create_sample_pcos_data(n_samples=2000)
-    
-    print(f"Dataset size: {len(df)} samples")
-    print(f"PCOS cases: {df['PCOS'].sum()} ({df['PCOS'].mean()*100:.1f}%)")
-    print(f"Healthy cases: {(1-df['PCOS']).sum()} ({(1-df['PCOS']).mean()*100:.1f}%)")
-    
-    # Features and target
-    feature_names = [
-        'Age', 'BMI', 'CycleRegularity', 'CycleLength', 
-        'Hirsutism', 'Acne', 'HairLoss', 'WeightGainDifficulty',
-        'FamilyHistory', 'StressLevel', 'ExerciseFrequency', 'SleepQuality'
-    ]
-    
-    X = df[feature_names]
-    y = df['PCOS']
-    
-    # Split data
+def write_lifestyle_dataset(path, n_samples, seed=42, chunk_size=1_000_000):
+    """Stream a synthetic dataset of any size to a CSV file, one chunk at a time"""
+    written = 0
+    with open(path, 'w', newline='') as f:
+        for chunk in iter_lifestyle_chunks(n_samples, seed, chunk_size):
+            chunk.to_csv(f, header=(written == 0), index=False, float_format='%.4f')
+            written += len(chunk)
+            print(f"  {written:,} / {n_samples:,} rows")
+    return written
+
+
+LIFESTYLE_FEATURES = LIFESTYLE_COLUMNS[:-1]
+LIFESTYLE_MODEL_PARAMS = {
+    'n_estimators': 200,
+    'max_depth': 15,
+    'min_samples_split': 5,
+    'min_samples_leaf': 2,
+    'random_state': 42,
+    'class_weight': 'balanced',
+}
+LIFESTYLE_ARTIFACTS = ['lifestyle_pcos_model.pkl', 'lifestyle_scaler.pkl', 'lifestyle_features.pkl']
+LIFESTYLE_MANIFEST_PATH = 'lifestyle_manifest.json'
+
+
+# ---- Pipeline stages (see pipeline.py); each is cached by its inputs and code ----
+
+def data_stage(n_samples, seed, dataset_key):
+    """Synthetic dataset split into train/test DataFrames (dataset_key only keys the cache)"""
+    from training_data import load_dataset
+    X, y, feature_names = load_dataset('lifestyle', n_samples=n_samples, seed=seed)
+    X = pd.DataFrame(np.asarray(X), columns=feature_names)
+    y = pd.Series(np.asarray(y).astype(np.int64), name='PCOS')
     X_train, X_test, y_train, y_test = train_test_split(
         X, y, test_size=0.2, random_state=42, stratify=y
     )
+    return {'X_train': X_train, 'X_test': X_test, 'y_train': y_train, 'y_test': y_test}
+
+
+def scaler_stage(data):
+    return StandardScaler().fit(data['X_train'])
+
+
+def fit_stage(data, scaler, **model_params):
+    model = RandomForestClassifier(**model_params)
+    model.fit(scaler.transform(data['X_train']), data['y_train'])
+    return model
+
+
+def evaluate_stage(data, scaler, model):
+    X_train_scaled = scaler.transform(data['X_train'])
+    X_test_scaled = scaler.transform(data['X_test'])
+    test_pred = model.predict(X_test_scaled)
+    cv_scores = cross_val_score(model, X_train_scaled, data['y_train'], cv=5)
+    return {
+        'train_accuracy': accuracy_score(data['y_train'], model.predict(X_train_scaled)),
+        'test_accuracy': accuracy_score(data['y_test'], test_pred),
+        'cv_mean': cv_scores.mean(),
+        'cv_std': cv_scores.std(),
+        'report': classification_report(data['y_test'], test_pred, target_names=['Healthy', 'PCOS']),
+        'feature_importance': sorted(zip(data['X_train'].columns, model.feature_importances_),
+                                     key=lambda item: item[1], reverse=True),
+    }
+
+
+def export_stage(scaler, model):
+    """Write the artifacts the API loads; returns {path: sha256}"""
+    from pipeline import file_sha256
+    joblib.dump(model, 'lifestyle_pcos_model.pkl')
+    joblib.dump(scaler, 'lifestyle_scaler.pkl')
+    joblib.dump(LIFESTYLE_FEATURES, 'lifestyle_features.pkl')
+    return {path: file_sha256(path) for path in LIFESTYLE_ARTIFACTS}
+
+
+def _artifacts_unchanged(hashes):
+    from pipeline import file_sha256
+    return all(os.path.exists(path) and file_sha256(path) == digest for path, digest in hashes.items())
+
+
+def train_lifestyle_model(n_samples=2000, seed=42, use_cache=True, compress=False, tolerance=0.005,
+                          max_depth=None):
+    """
+    Train the lifestyle-based PCOS prediction model. Stages whose inputs and
+    code are unchanged since the last run are loaded from the pipeline cache.
+    With compress=True a smaller forest is also written (see compress_forest.py).
+    """
+    from pipeline import Pipeline
+    from training_data import dataset_key
+    from drift_monitor import save_reference
+
+    print("🚀 Training Lifestyle-based PCOS Prediction Model...")
+    print("=" * 60)
     
-    print(f"\n📈 Training set: {len(X_train)} samples")
-    print(f"📉 Test set: {len(X_test)} samples")
-    
-    # Scale features
-    print("\n⚙️ Scaling features...")
-    scaler = StandardScaler()
-    X_train_scaled = scaler.fit_transform(X_train)
-    X_test_scaled = scaler.transform(X_test)
-    
-    # Train Random Forest model
-    print("\n🌲 Training Random Forest Classifier...")
-    model = RandomForestClassifier(
-        n_estimators=200,
-        max_depth=15,
-        min_samples_split=5,
-        min_samples_leaf=2,
-        random_state=42,
-        class_weight='balanced'
-    )
+    pipeline = Pipeline('lifestyle', use_cache=use_cache)
+    print("\n🔗 Running pipeline stages...")
+    data = pipeline.run('data', data_stage, params={
+        'n_samples': n_samples, 'seed': seed,
+        'dataset_key': dataset_key('lifestyle', n_samples, seed, {}),
+    })
+    scaler = pipeline.run('scaler', scaler_stage, inputs=['data'])
+    model = pipeline.run('fit', fit_stage, params=LIFESTYLE_MODEL_PARAMS, inputs=['data', 'scaler'])
+    metrics = pipeline.run('evaluate', evaluate_stage, inputs=['data', 'scaler', 'fit'])
+    pipeline.run('export', export_stage, inputs=['scaler', 'fit'], valid=_artifacts_unchanged)
+    pipeline.record_artifacts('export', LIFESTYLE_ARTIFACTS)
+    save_reference('lifestyle', data['X_train'], data['X_train'].columns)
+    pipeline.write_manifest(LIFESTYLE_MANIFEST_PATH)
     
-    model.fit(X_train_scaled, y_train)
+    y_all = pd.concat([data['y_train'], data['y_test']])
+    print(f"\n📊 Dataset size: {len(y_all)} samples")
+    print(f"PCOS cases: {y_all.sum()} ({y_all.mean()*100:.1f}%)")
+    print(f"Healthy cases: {(1-y_all).sum()} ({(1-y_all).mean()*100:.1f}%)")
+    print(f"\n📈 Training set: {len(data['X_train'])} samples")
+    print(f"📉 Test set: {len(data['X_test'])} samples")
     
-    # Evaluate
     print("\n✅ Model Training Complete!")
     print("=" * 60)
+    print(f"\n📊 Training Accuracy: {metrics['train_accuracy']*100:.2f}%")
+    print(f"📊 Test Accuracy: {metrics['test_accuracy']*100:.2f}%")
+    print(f"📊 Cross-Validation Accuracy: {metrics['cv_mean']*100:.2f}% (+/- {metrics['cv_std']*100:.2f}%)")
     
-    # Training accuracy
-    train_pred = model.predict(X_train_scaled)
-    train_accuracy = accuracy_score(y_train, train_pred)
-    print(f"\n📊 Training Accuracy: {train_accuracy*100:.2f}%")
-    
-    # Test accuracy
-    test_pred = model.predict(X_test_scaled)
-    test_accuracy = accuracy_score(y_test, test_pred)
-    print(f"📊 Test Accuracy: {test_accuracy*100:.2f}%")
-    
-    # Cross-validation
-    cv_scores = cross_val_score(model, X_train_scaled, y_train, cv=5)
-    print(f"📊 Cross-Validation Accuracy: {cv_scores.mean()*100:.2f}% (+/- {cv_scores.std()*100:.2f}%)")
-    
-    # Classification report
     print("\n📋 Classification Report:")
-    print(classification_report(y_test, test_pred, target_names=['Healthy', 'PCOS']))
+    print(metrics['report'])
     
-    # Feature importance
     print("\n🔍 Feature Importance:")
-    feature_importance = pd.DataFrame({
-        'Feature': feature_names,
-        'Importance': model.feature_importances_
-    }).sort_values('Importance', ascending=False)
-    
-    for idx, row in feature_importance.iterrows():
-        print(f"  {row['Feature']:25s}: {row['Importance']:.4f}")
-    
-    # Save model, scaler, and feature names
-    print("\n💾 Saving model files...")
-    joblib.dump(model, 'lifestyle_pcos_model.pkl')
-    joblib.dump(scaler, 'lifestyle_scaler.pkl')
-    joblib.dump(feature_names, 'lifestyle_features.pkl')
+    for feature, importance in metrics['feature_importance']:
+        print(f"  {feature:25s}: {importance:.4f}")
     
     print("\n✅ Model saved successfully!")
-    print("   - lifestyle_pcos_model.pkl")
-    print("   - lifestyle_scaler.pkl")
-    print("   - lifestyle_features.pkl")
+    for path in LIFESTYLE_ARTIFACTS:
+        print(f"   - {path}")
+    print(f"   Lineage: {LIFESTYLE_MANIFEST_PATH}")
+    
+    if compress:
+        from compress_forest import compress_and_save
+        compress_and_save(model, scaler, 'lifestyle_pcos_model.pkl', data['X_test'], data['y_test'],
+                          tolerance, max_depth, data['X_train'], data['y_train'])
     
     # Test prediction
     print("\n🧪 Testing sample predictions...")
-    test_sample_predictions(model, scaler, feature_names)
+    test_sample_predictions(model, scaler, LIFESTYLE_FEATURES)
     
-    return model, scaler, feature_names
+    return model, scaler, list(LIFESTYLE_FEATURES)
 
 
 def test_sample_predictions(model, scaler, feature_names):
@@ -228,11 +275,43 @@ def test_sample_predictions(model, scaler, feature_names):
 
 
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Train the lifestyle PCOS model on synthetic data")
+    parser.add_argument('--samples', type=int, default=2000, help='synthetic rows to generate')
+    parser.add_argument('--generate', metavar='CSV',
+                        help='only write the synthetic dataset to this file (streamed in chunks)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--chunk-size', type=int, default=1_000_000)
+    parser.add_argument('--no-cache', action='store_true', help='re-run every stage, ignoring cached outputs')
+    parser.add_argument('--stream', action='store_true',
+                        help='out-of-core training over chunks (SGD), for datasets larger than memory')
+    parser.add_argument('--csv', help='with --stream: training CSV (e.g. from --generate) instead of synthetic chunks')
+    parser.add_argument('--epochs', type=int, default=1)
+    parser.add_argument('--compress', action='store_true',
+                        help='also write a compressed forest (lifestyle_pcos_model_compressed.pkl) and its report')
+    parser.add_argument('--tolerance', type=float, default=0.005, help='with --compress: allowed ROC-AUC drop')
+    parser.add_argument('--max-depth', type=int, help='with --compress: refit the forest with this depth cap')
+    args = parser.parse_args()
+
+    if args.stream:
+        from streaming_train import csv_chunks, synthetic_chunks, train_and_save
+        chunks = (csv_chunks(args.csv, LIFESTYLE_FEATURES, args.chunk_size) if args.csv
+                  else synthetic_chunks('lifestyle', args.samples, args.chunk_size, args.seed))
+        train_and_save('lifestyle', chunks, list(LIFESTYLE_FEATURES), args.epochs, named=True)
+        raise SystemExit
+
+    if args.generate:
+        print(f"📊 Writing {args.samples:,} synthetic rows to {args.generate}...")
+        write_lifestyle_dataset(args.generate, args.samples, args.seed, args.chunk_size)
+        print("✅ Done")
+        raise SystemExit
+
     print("\n" + "="*60)
     print("  LIFESTYLE-BASED PCOS PREDICTION MODEL TRAINING")
     print("="*60 + "\n")
     
-    model, scaler, features = train_lifestyle_model()
+    model, scaler, features = train_lifestyle_model(args.samples, args.seed, not args.no_cache,
+                                                    args.compress, args.tolerance, args.max_depth)
     
     print("\n" + "="*60)
     print("  🎉 TRAINING COMPLETE!")
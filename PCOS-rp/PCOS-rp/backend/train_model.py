@@ -2,61 +2,106 @@ import pandas as pd
 import numpy as np
 from sklearn.linear_model import LogisticRegression
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split, cross_val_score, GridSearchCV
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401 (enables HalvingGridSearchCV)
+from sklearn.model_selection import train_test_split, HalvingGridSearchCV
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import classification_report, confusion_matrix, roc_auc_score, accuracy_score
 import joblib
+import json
+import os
+import time
 import matplotlib.pyplot as plt
 import seaborn as sns
+from training_data import load_dataset
+from drift_monitor import save_reference
 
-def generate_synthetic_pcos_data(n_samples=1000):
-    """Generate more realistic synthetic PCOS data"""
-    np.random.seed(42)
-    
-    # Generate features based on PCOS research
-    # Features: Age, BMI, Insulin, Testosterone, LH, FSH, Glucose, Cholesterol
-    
-    # Non-PCOS samples (approximately 70% of data)
-    n_healthy = int(n_samples * 0.7)
-    healthy_data = np.column_stack([
-        np.random.normal(28, 6, n_healthy),      # Age (20-40)
-        np.random.normal(23, 3, n_healthy),      # BMI (normal range)
-        np.random.normal(12, 4, n_healthy),      # Insulin
-        np.random.normal(35, 10, n_healthy),     # Testosterone
-        np.random.normal(6, 2, n_healthy),       # LH
-        np.random.normal(7, 2, n_healthy),       # FSH
-        np.random.normal(90, 10, n_healthy),     # Glucose
-        np.random.normal(180, 30, n_healthy),    # Cholesterol
-    ])
-    healthy_labels = np.zeros(n_healthy)
-    
-    # PCOS samples (approximately 30% of data)
-    n_pcos = n_samples - n_healthy
-    pcos_data = np.column_stack([
-        np.random.normal(26, 5, n_pcos),         # Age (slightly younger)
-        np.random.normal(28, 5, n_pcos),         # BMI (higher)
-        np.random.normal(18, 6, n_pcos),         # Insulin (higher)
-        np.random.normal(55, 15, n_pcos),        # Testosterone (elevated)
-        np.random.normal(12, 4, n_pcos),         # LH (elevated)
-        np.random.normal(6, 2, n_pcos),          # FSH
-        np.random.normal(105, 15, n_pcos),       # Glucose (higher)
-        np.random.normal(200, 40, n_pcos),       # Cholesterol (higher)
-    ])
-    pcos_labels = np.ones(n_pcos)
-    
-    # Combine data
-    X = np.vstack([healthy_data, pcos_data])
-    y = np.concatenate([healthy_labels, pcos_labels])
-    
-    # Create feature names
-    feature_names = ['Age', 'BMI', 'Insulin', 'Testosterone', 'LH', 'FSH', 'Glucose', 'Cholesterol']
-    
-    return X, y, feature_names
+# Hyperparameter grids searched with successive halving
+SEARCH_SPACES = {
+    'Logistic Regression': (
+        LogisticRegression(random_state=42, max_iter=1000),
+        {
+            'C': [0.01, 0.03, 0.1, 0.3, 1, 3, 10, 30],
+            'class_weight': [None, 'balanced'],
+        },
+    ),
+    'Random Forest': (
+        RandomForestClassifier(random_state=42),
+        {
+            'n_estimators': [100, 200, 400],
+            'max_depth': [None, 8, 15],
+            'min_samples_leaf': [1, 2, 5],
+            'max_features': ['sqrt', 0.5],
+        },
+    ),
+}
 
-def train_and_evaluate_model():
+SEARCH_REPORT_PATH = "search_report.json"
+
+
+def search_hyperparameters(X_train, y_train, n_jobs=-1, cv=5, factor=3):
+    """
+    Successive-halving search over SEARCH_SPACES. Every round fits all
+    surviving candidates on all folds in parallel (n_jobs), then keeps the
+    best 1/factor of them on factor x more samples.
+
+    Returns {name: (search, timings, wall seconds)}, where timings has one row per
+    candidate and round with its fit/score wall time summed over the folds.
+    """
+    results = {}
+    for name, (estimator, grid) in SEARCH_SPACES.items():
+        search = HalvingGridSearchCV(
+            estimator, grid, cv=cv, factor=factor, scoring='roc_auc',
+            n_jobs=n_jobs, random_state=42, refit=True
+        )
+        started = time.perf_counter()
+        search.fit(X_train, y_train)
+        elapsed = time.perf_counter() - started
+
+        cv_results = search.cv_results_
+        timings = pd.DataFrame({
+            'round': cv_results['iter'],
+            'n_samples': cv_results['n_resources'],
+            'params': [json.dumps(p, default=str) for p in cv_results['params']],
+            'mean_roc_auc': cv_results['mean_test_score'],
+            # Wall time of one candidate = its fits + scores over all folds
+            'candidate_seconds': (cv_results['mean_fit_time'] + cv_results['mean_score_time']) * cv,
+        })
+        total = timings['candidate_seconds'].sum()
+
+        print(f"\n{name}: {len(timings)} fits over {search.n_iterations_} rounds "
+              f"({search.n_candidates_} candidates per round)")
+        print(f"  Best params: {search.best_params_}")
+        print(f"  Best CV ROC-AUC: {search.best_score_:.3f}")
+        print(f"  Candidate time: {total:.1f}s total, {timings['candidate_seconds'].mean():.2f}s mean; "
+              f"wall {elapsed:.1f}s (x{total / max(elapsed, 1e-9):.1f} parallel)")
+
+        results[name] = (search, timings, elapsed)
+    return results
+
+
+def save_search_report(results, path=SEARCH_REPORT_PATH):
+    """Per-candidate timings, so the cost on an N-core machine is ~ total / N"""
+    report = {
+        'cpu_count': os.cpu_count(),
+        'models': {
+            name: {
+                'best_params': search.best_params_,
+                'best_cv_roc_auc': search.best_score_,
+                'wall_seconds': elapsed,
+                'candidate_seconds_total': float(timings['candidate_seconds'].sum()),
+                'candidates': timings.to_dict(orient='records'),
+            }
+            for name, (search, timings, elapsed) in results.items()
+        },
+    }
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2, default=str)
+
+
+def train_and_evaluate_model(n_jobs=-1, compress=False, tolerance=0.005, max_depth=None):
     """Train and evaluate PCOS prediction model"""
     print("🔄 Generating synthetic PCOS dataset...")
-    X, y, feature_names = generate_synthetic_pcos_data(1000)
+    X, y, feature_names = load_dataset('clinical', n_samples=1000)
     
     print(f"Dataset shape: {X.shape}")
     print(f"PCOS cases: {np.sum(y)} ({np.mean(y)*100:.1f}%)")
@@ -74,24 +119,23 @@ def train_and_evaluate_model():
     X_train_scaled = scaler.fit_transform(X_train)
     X_test_scaled = scaler.transform(X_test)
     
-    # ---- Model comparison ----
-    models = {
-        'Logistic Regression': LogisticRegression(random_state=42, max_iter=1000),
-        'Random Forest': RandomForestClassifier(random_state=42, n_estimators=100)
-    }
+    # ---- Hyperparameter search (successive halving, parallel folds/candidates) ----
+    print(f"\n🔎 Searching hyperparameters on {os.cpu_count()} cores...")
+    search_results = search_hyperparameters(X_train_scaled, y_train, n_jobs=n_jobs)
+    save_search_report(search_results)
+    print(f"📝 Search timings saved to {SEARCH_REPORT_PATH}")
     
+    # ---- Model comparison ----
     best_model = None
     best_score = 0
     model_results = {}
     
-    print("\n🔄 Training and evaluating models...")
+    print("\n🔄 Evaluating the best candidate of each model...")
     
-    for name, model in models.items():
-        # Cross-validation
-        cv_scores = cross_val_score(model, X_train_scaled, y_train, cv=5, scoring='roc_auc')
-        
-        # Train on full training set
-        model.fit(X_train_scaled, y_train)
+    for name, (search, _, _) in search_results.items():
+        # Refit on the full training set by the search
+        model = search.best_estimator_
+        best_index = search.best_index_
         
         # Predictions
         y_pred = model.predict(X_test_scaled)
@@ -103,8 +147,9 @@ def train_and_evaluate_model():
         
         model_results[name] = {
             'model': model,
-            'cv_mean': cv_scores.mean(),
-            'cv_std': cv_scores.std(),
+            'cv_mean': search.best_score_,
+            'cv_std': search.cv_results_['std_test_score'][best_index],
+            'best_params': search.best_params_,
             'test_accuracy': accuracy,
             'test_roc_auc': roc_auc,
             'predictions': y_pred,
@@ -112,7 +157,7 @@ def train_and_evaluate_model():
         }
         
         print(f"\n{name}:")
-        print(f"  CV ROC-AUC: {cv_scores.mean():.3f} (+/- {cv_scores.std() * 2:.3f})")
+        print(f"  CV ROC-AUC: {search.best_score_:.3f} (+/- {search.cv_results_['std_test_score'][best_index] * 2:.3f})")
         print(f"  Test Accuracy: {accuracy:.3f}")
         print(f"  Test ROC-AUC: {roc_auc:.3f}")
         
@@ -152,9 +197,44 @@ def train_and_evaluate_model():
     # Save feature names for later use
     joblib.dump(feature_names, "feature_names.pkl")
     
+    # Training histograms for the input drift monitor (see drift_monitor.py)
+    save_reference('clinical', X_train, feature_names)
+    
     print("✅ Model, scaler, and feature names saved successfully!")
     
+    # ---- Optional forest compression (see compress_forest.py) ----
+    if compress:
+        if isinstance(best_model, RandomForestClassifier):
+            from compress_forest import compress_and_save
+            compress_and_save(best_model, scaler, "pcos_model.pkl", X_test, y_test,
+                              tolerance, max_depth, X_train, y_train)
+        else:
+            print(f"\n⚠️  Skipping compression: the best model is a {best_model_name}, not a forest")
+    
     return best_model, scaler, feature_names, model_results
 
 if __name__ == "__main__":
-    train_and_evaluate_model()
+    import argparse
+    parser = argparse.ArgumentParser(description="Train the clinical PCOS model")
+    parser.add_argument('--n-jobs', type=int, default=-1, help='parallel fits (-1: all cores)')
+    parser.add_argument('--stream', action='store_true',
+                        help='out-of-core training over chunks (SGD), for datasets larger than memory')
+    parser.add_argument('--csv', help='with --stream: training CSV with the feature columns and a PCOS column')
+    parser.add_argument('--samples', type=int, default=1_000_000,
+                        help='with --stream and no --csv: synthetic rows to generate')
+    parser.add_argument('--chunk-size', type=int, default=100_000)
+    parser.add_argument('--epochs', type=int, default=1)
+    parser.add_argument('--compress', action='store_true',
+                        help='also write a compressed forest (pcos_model_compressed.pkl) and its report')
+    parser.add_argument('--tolerance', type=float, default=0.005, help='with --compress: allowed ROC-AUC drop')
+    parser.add_argument('--max-depth', type=int, help='with --compress: refit the forest with this depth cap')
+    args = parser.parse_args()
+
+    if args.stream:
+        from streaming_train import csv_chunks, synthetic_chunks, train_and_save
+        from training_data import CLINICAL_FEATURES
+        chunks = (csv_chunks(args.csv, CLINICAL_FEATURES, args.chunk_size) if args.csv
+                  else synthetic_chunks('clinical', args.samples, args.chunk_size))
+        train_and_save('clinical', chunks, list(CLINICAL_FEATURES), args.epochs)
+    else:
+        train_and_evaluate_model(args.n_jobs, args.compress, args.tolerance, args.max_depth)
@@ -0,0 +1,241 @@
+"""
+Shared synthetic datasets for the training and evaluation scripts.
+
+Each dataset is identified by (generator, n_samples, seed, params). The first
+load_dataset() call builds it and saves X and y as .npy files under
+DATASET_CACHE_DIR, keyed by a hash of those parameters and of the generator's
+source code; later calls, from any script, memory-map the cached files
+instead of regenerating them. Editing a generator invalidates its cache.
+
+    from training_data import load_dataset
+    X, y, feature_names = load_dataset('clinical', n_samples=1000)
+
+The real dataset (dataset/PCOS_infertility.csv) is parsed once by
+load_real_dataset(), which normalizes its column names and stores every
+column as its own typed .npy file, keyed by the CSV's content; later loads
+memory-map those columns without reading the CSV.
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import re
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DATASET_CACHE_DIR = os.environ.get('DATASET_CACHE_DIR', os.path.join(BACKEND_DIR, '.dataset_cache'))
+
+REAL_DATASET_PATH = os.path.join(BACKEND_DIR, '..', 'dataset', 'PCOS_infertility.csv')
+
+# Normalized CSV column name -> short name
+REAL_COLUMN_ALIASES = {
+    'pcos_y_n': 'pcos',
+    'i_beta_hcg_miu_ml': 'beta_hcg_1',
+    'ii_beta_hcg_miu_ml': 'beta_hcg_2',
+    'amh_ng_ml': 'amh',
+}
+REAL_ID_COLUMNS = ['sl_no', 'patient_file_no']
+REAL_TARGET = 'pcos'
+
+CLINICAL_FEATURES = ['Age', 'BMI', 'Insulin', 'Testosterone', 'LH', 'FSH', 'Glucose', 'Cholesterol']
+
+
+def generate_synthetic_pcos_data(n_samples=1000, seed=42):
+    """Generate more realistic synthetic PCOS data"""
+    rng = np.random.RandomState(seed)
+
+    # Generate features based on PCOS research
+    # Features: Age, BMI, Insulin, Testosterone, LH, FSH, Glucose, Cholesterol
+
+    # Non-PCOS samples (approximately 70% of data)
+    n_healthy = int(n_samples * 0.7)
+    healthy_data = np.column_stack([
+        rng.normal(28, 6, n_healthy),      # Age (20-40)
+        rng.normal(23, 3, n_healthy),      # BMI (normal range)
+        rng.normal(12, 4, n_healthy),      # Insulin
+        rng.normal(35, 10, n_healthy),     # Testosterone
+        rng.normal(6, 2, n_healthy),       # LH
+        rng.normal(7, 2, n_healthy),       # FSH
+        rng.normal(90, 10, n_healthy),     # Glucose
+        rng.normal(180, 30, n_healthy),    # Cholesterol
+    ])
+    healthy_labels = np.zeros(n_healthy)
+
+    # PCOS samples (approximately 30% of data)
+    n_pcos = n_samples - n_healthy
+    pcos_data = np.column_stack([
+        rng.normal(26, 5, n_pcos),         # Age (slightly younger)
+        rng.normal(28, 5, n_pcos),         # BMI (higher)
+        rng.normal(18, 6, n_pcos),         # Insulin (higher)
+        rng.normal(55, 15, n_pcos),        # Testosterone (elevated)
+        rng.normal(12, 4, n_pcos),         # LH (elevated)
+        rng.normal(6, 2, n_pcos),          # FSH
+        rng.normal(105, 15, n_pcos),       # Glucose (higher)
+        rng.normal(200, 40, n_pcos),       # Cholesterol (higher)
+    ])
+    pcos_labels = np.ones(n_pcos)
+
+    # Combine data
+    X = np.vstack([healthy_data, pcos_data])
+    y = np.concatenate([healthy_labels, pcos_labels])
+
+    return X, y, list(CLINICAL_FEATURES)
+
+
+def generate_lifestyle_data(n_samples=2000, seed=42, chunk_size=1_000_000):
+    """Synthetic self-reported symptom data (see train_lifestyle_model.py)"""
+    from train_lifestyle_model import create_sample_pcos_data, LIFESTYLE_COLUMNS
+    df = create_sample_pcos_data(n_samples, seed, chunk_size)
+    feature_names = LIFESTYLE_COLUMNS[:-1]
+    return df[feature_names].to_numpy(dtype=np.float64), df['PCOS'].to_numpy(dtype=np.float64), feature_names
+
+
+GENERATORS = {
+    'clinical': generate_synthetic_pcos_data,
+    'lifestyle': generate_lifestyle_data,
+}
+
+
+def _generator_source(generator):
+    source = inspect.getsource(GENERATORS[generator])
+    if generator == 'lifestyle':
+        # The distributions and the sampling code live in the training script;
+        # only they are hashed, so edits to its training stages keep the data
+        import train_lifestyle_model as t
+        for fn in (t.generate_lifestyle_chunk, t.iter_lifestyle_chunks, t.create_sample_pcos_data):
+            source += inspect.getsource(fn)
+        source += json.dumps([t.PCOS_PREVALENCE, t.NORMAL_FEATURES, t.CATEGORICAL_FEATURES,
+                              t.LIFESTYLE_COLUMNS])
+    return source
+
+
+def dataset_key(generator, n_samples, seed, params):
+    """Hash of everything that determines a dataset's contents"""
+    source = _generator_source(generator)
+    spec = json.dumps({
+        'generator': generator,
+        'n_samples': n_samples,
+        'seed': seed,
+        'params': params,
+        'code': hashlib.sha256(source.encode()).hexdigest(),
+    }, sort_keys=True)
+    return hashlib.sha256(spec.encode()).hexdigest()[:16]
+
+
+def _save_atomic(path, array):
+    tmp = f"{path}.{os.getpid()}.tmp.npy"
+    np.save(tmp, array)
+    os.replace(tmp, path)
+
+
+def load_dataset(generator='clinical', n_samples=1000, seed=42, cache=True, **params):
+    """
+    Return (X, y, feature_names) for the given generator and parameters.
+    X and y are read-only memory maps of the cached .npy files; pass
+    cache=False to generate in memory without touching the cache.
+    """
+    if generator not in GENERATORS:
+        raise ValueError(f"Unknown generator '{generator}', use one of {list(GENERATORS)}")
+    if not cache:
+        return GENERATORS[generator](n_samples, seed, **params)
+
+    key = dataset_key(generator, n_samples, seed, params)
+    base = os.path.join(DATASET_CACHE_DIR, f"{generator}-{key}")
+    meta_path = f"{base}.json"
+
+    if not os.path.exists(meta_path):
+        X, y, feature_names = GENERATORS[generator](n_samples, seed, **params)
+        os.makedirs(DATASET_CACHE_DIR, exist_ok=True)
+        _save_atomic(f"{base}.X.npy", np.ascontiguousarray(X, dtype=np.float64))
+        _save_atomic(f"{base}.y.npy", np.asarray(y, dtype=np.float64))
+        # Written last: its presence marks a complete cache entry
+        tmp = f"{meta_path}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump({'generator': generator, 'n_samples': n_samples, 'seed': seed,
+                       'params': params, 'feature_names': list(feature_names)}, f)
+        os.replace(tmp, meta_path)
+
+    with open(meta_path) as f:
+        feature_names = json.load(f)['feature_names']
+    X = np.load(f"{base}.X.npy", mmap_mode='r')
+    y = np.load(f"{base}.y.npy", mmap_mode='r')
+    return X, y, feature_names
+
+
+def normalize_column(name):
+    """'  I   beta-HCG(mIU/mL)' -> 'i_beta_hcg_miu_ml' -> alias 'beta_hcg_1'"""
+    normalized = re.sub(r'[^0-9a-z]+', '_', name.strip().lower()).strip('_')
+    return REAL_COLUMN_ALIASES.get(normalized, normalized)
+
+
+def _parse_real_csv(path):
+    """{column: typed array}: ids int64, target int8, measurements float64 (unparseable -> NaN)"""
+    import pandas as pd
+    df = pd.read_csv(path, dtype=str)
+    df.columns = [normalize_column(c) for c in df.columns]
+    columns = {}
+    for name in df.columns:
+        values = pd.to_numeric(df[name].str.strip(), errors='coerce')
+        if name in REAL_ID_COLUMNS:
+            columns[name] = values.to_numpy(dtype=np.int64)
+        elif name == REAL_TARGET:
+            columns[name] = values.to_numpy(dtype=np.int8)
+        else:
+            columns[name] = values.to_numpy(dtype=np.float64)
+    return columns
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_real_dataset(path=REAL_DATASET_PATH, cache=True):
+    """
+    Return {normalized column: array} for the real dataset. With cache=True
+    the arrays are read-only memory maps of per-column .npy files, rebuilt
+    only when the CSV or the parsing code changes.
+    """
+    if not cache:
+        return _parse_real_csv(path)
+
+    source = inspect.getsource(_parse_real_csv) + inspect.getsource(normalize_column)
+    spec = json.dumps({
+        'csv': _file_sha256(path),
+        'aliases': REAL_COLUMN_ALIASES,
+        'code': hashlib.sha256(source.encode()).hexdigest(),
+    }, sort_keys=True)
+    key = hashlib.sha256(spec.encode()).hexdigest()[:16]
+    base = os.path.join(DATASET_CACHE_DIR, f"real-{key}")
+    meta_path = f"{base}.json"
+
+    if not os.path.exists(meta_path):
+        columns = _parse_real_csv(path)
+        os.makedirs(DATASET_CACHE_DIR, exist_ok=True)
+        for i, array in enumerate(columns.values()):
+            _save_atomic(f"{base}.{i}.npy", array)
+        # Written last: its presence marks a complete cache entry
+        tmp = f"{meta_path}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump({'source': os.path.basename(path), 'columns': list(columns),
+                       'rows': len(next(iter(columns.values())))}, f)
+        os.replace(tmp, meta_path)
+
+    with open(meta_path) as f:
+        names = json.load(f)['columns']
+    return {name: np.load(f"{base}.{i}.npy", mmap_mode='r') for i, name in enumerate(names)}
+
+
+def load_real_features(path=REAL_DATASET_PATH, cache=True):
+    """(X, y, feature_names) from the real dataset; rows with a missing value are dropped"""
+    columns = load_real_dataset(path, cache)
+    feature_names = [c for c in columns if c not in REAL_ID_COLUMNS and c != REAL_TARGET]
+    X = np.column_stack([columns[c] for c in feature_names])
+    y = np.asarray(columns[REAL_TARGET])
+    complete = ~np.isnan(X).any(axis=1)
+    return X[complete], y[complete], feature_names
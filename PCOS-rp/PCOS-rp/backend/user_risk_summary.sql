@@ -0,0 +1,106 @@
+-- Per-user dashboard summary
+-- The app keeps this table current on every write (see risk_summary.py).
+-- Run this once against an existing database to create the table and
+-- backfill it from the history that was recorded before it existed:
+--   psql -U postgres -d pcos_db -f user_risk_summary.sql
+-- It works on both schemas: app.py's (lifestyle_predictions, symptom_logs.log_date)
+-- and app_with_auth.py's (lifestyle results in predictions, symptom_logs.log_data).
+
+CREATE TABLE IF NOT EXISTS user_risk_summary (
+    user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    assessment_count INTEGER NOT NULL DEFAULT 0,
+    clinical_count INTEGER NOT NULL DEFAULT 0,
+    lifestyle_count INTEGER NOT NULL DEFAULT 0,
+    probability_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    latest_probability FLOAT,
+    latest_risk_level VARCHAR(50),
+    latest_prediction_type VARCHAR(50),
+    last_assessment_at TIMESTAMP,
+    last_symptom_log_date DATE,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+SELECT to_regclass('lifestyle_predictions') IS NOT NULL AS has_lifestyle_predictions \gset
+\if :has_lifestyle_predictions
+CREATE TEMP VIEW legacy_lifestyle AS
+    SELECT user_id, risk_score AS probability, risk_level, created_at FROM lifestyle_predictions;
+\else
+CREATE TEMP VIEW legacy_lifestyle AS
+    SELECT NULL::INTEGER AS user_id, NULL::FLOAT AS probability, NULL::VARCHAR(50) AS risk_level,
+           NULL::TIMESTAMP AS created_at
+    WHERE FALSE;
+\endif
+
+BEGIN;
+
+-- to_jsonb(row) reads columns that only one of the schemas has.
+-- Lifestyle results stored in predictions are recognised by their
+-- prediction_text, like in migrate_feature_vectors.py: rows stored before
+-- prediction_type existed got its 'clinical' default.
+WITH assessments AS (
+    SELECT p.user_id, p.probability, p.risk_level,
+           CASE WHEN p.input_data ? 'prediction_text' THEN 'lifestyle'
+                ELSE COALESCE(to_jsonb(p) ->> 'prediction_type', 'clinical') END AS prediction_type,
+           p.created_at
+    FROM predictions p
+    UNION ALL
+    SELECT user_id, probability, risk_level, 'lifestyle', created_at
+    FROM legacy_lifestyle
+),
+totals AS (
+    SELECT user_id,
+           COUNT(*) AS assessment_count,
+           COUNT(*) FILTER (WHERE prediction_type = 'clinical') AS clinical_count,
+           COUNT(*) FILTER (WHERE prediction_type = 'lifestyle') AS lifestyle_count,
+           SUM(probability) AS probability_sum
+    FROM assessments
+    GROUP BY user_id
+),
+latest AS (
+    SELECT DISTINCT ON (user_id)
+           user_id, probability, risk_level, prediction_type, created_at
+    FROM assessments
+    ORDER BY user_id, created_at DESC
+),
+symptom_dates AS (
+    SELECT s.user_id,
+           COALESCE(to_jsonb(s) ->> 'log_date', to_jsonb(s) -> 'log_data' ->> 'date') AS log_date,
+           s.created_at
+    FROM symptom_logs s
+),
+symptoms AS (
+    SELECT user_id,
+           MAX(CASE WHEN log_date ~ '^\d{4}-\d{2}-\d{2}' THEN left(log_date, 10)::date
+                    ELSE created_at::date END) AS last_symptom_log_date
+    FROM symptom_dates
+    GROUP BY user_id
+)
+INSERT INTO user_risk_summary
+    (user_id, assessment_count, clinical_count, lifestyle_count, probability_sum,
+     latest_probability, latest_risk_level, latest_prediction_type,
+     last_assessment_at, last_symptom_log_date)
+SELECT u.id,
+       COALESCE(t.assessment_count, 0),
+       COALESCE(t.clinical_count, 0),
+       COALESCE(t.lifestyle_count, 0),
+       COALESCE(t.probability_sum, 0),
+       l.probability, l.risk_level, l.prediction_type, l.created_at,
+       s.last_symptom_log_date
+FROM users u
+LEFT JOIN totals t ON t.user_id = u.id
+LEFT JOIN latest l ON l.user_id = u.id
+LEFT JOIN symptoms s ON s.user_id = u.id
+WHERE t.user_id IS NOT NULL OR s.user_id IS NOT NULL
+ON CONFLICT (user_id) DO UPDATE SET
+    assessment_count = EXCLUDED.assessment_count,
+    clinical_count = EXCLUDED.clinical_count,
+    lifestyle_count = EXCLUDED.lifestyle_count,
+    probability_sum = EXCLUDED.probability_sum,
+    latest_probability = EXCLUDED.latest_probability,
+    latest_risk_level = EXCLUDED.latest_risk_level,
+    latest_prediction_type = EXCLUDED.latest_prediction_type,
+    last_assessment_at = EXCLUDED.last_assessment_at,
+    last_symptom_log_date = EXCLUDED.last_symptom_log_date,
+    updated_at = CURRENT_TIMESTAMP;
+
+COMMIT;
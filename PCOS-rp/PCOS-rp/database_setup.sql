@@ -43,10 +43,10 @@ CREATE TABLE IF NOT EXISTS user_profiles (
 CREATE INDEX IF NOT EXISTS idx_user_profiles_user_id ON user_profiles(user_id);
 
 -- ============================================
--- Symptom Logs Table
+-- Symptom Logs Table (monthly partitions on log_date)
 -- ============================================
 CREATE TABLE IF NOT EXISTS symptom_logs (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
     log_date DATE NOT NULL,
     acne_severity INTEGER DEFAULT 0,
@@ -62,11 +62,11 @@ CREATE TABLE IF NOT EXISTS symptom_logs (
     period_flow VARCHAR(20),
     period_active BOOLEAN DEFAULT FALSE,
     cycle_length INTEGER,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, log_date)
+) PARTITION BY RANGE (log_date);
 
-CREATE INDEX IF NOT EXISTS idx_symptom_logs_user_date ON symptom_logs(user_id, log_date);
-CREATE INDEX IF NOT EXISTS idx_symptom_logs_date ON symptom_logs(log_date);
+CREATE INDEX IF NOT EXISTS idx_symptom_logs_user_date ON symptom_logs(user_id, log_date DESC);
 
 -- ============================================
 -- Lifestyle Predictions Table
@@ -88,20 +88,61 @@ CREATE INDEX IF NOT EXISTS idx_lifestyle_predictions_user_id ON lifestyle_predic
 CREATE INDEX IF NOT EXISTS idx_lifestyle_predictions_created_at ON lifestyle_predictions(created_at);
 
 -- ============================================
--- Clinical Predictions Table
+-- Model Versions Table (feature order for stored feature vectors)
+-- ============================================
+CREATE TABLE IF NOT EXISTS model_versions (
+    version VARCHAR(64) PRIMARY KEY,
+    model_type VARCHAR(20) NOT NULL,
+    feature_names TEXT[] NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- ============================================
+-- Prediction Inputs Table (each distinct scored vector stored once)
+-- ============================================
+CREATE TABLE IF NOT EXISTS prediction_inputs (
+    id BIGSERIAL PRIMARY KEY,
+    input_hash BYTEA UNIQUE NOT NULL,    -- sha256(model_version, float32 vector)
+    model_version VARCHAR(64) NOT NULL,
+    feature_vector REAL[] NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- ============================================
+-- Clinical Predictions Table (monthly partitions on created_at)
 -- ============================================
 CREATE TABLE IF NOT EXISTS predictions (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
     prediction_result INTEGER NOT NULL,
     probability FLOAT NOT NULL,
     risk_level VARCHAR(50),
-    input_data JSONB,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
+    input_data JSONB,                -- raw request, only kept when STORE_RAW_INPUT=1
+    feature_vector REAL[],           -- legacy rows only; new rows point at prediction_inputs
+    model_version VARCHAR(64),
+    prediction_type VARCHAR(20) DEFAULT 'clinical',
+    input_id BIGINT REFERENCES prediction_inputs(id),
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+CREATE INDEX IF NOT EXISTS idx_predictions_user_created ON predictions(user_id, created_at DESC);
 
-CREATE INDEX IF NOT EXISTS idx_predictions_user_id ON predictions(user_id);
-CREATE INDEX IF NOT EXISTS idx_predictions_created_at ON predictions(created_at);
+-- Partitions for this month and the next three. The backend creates further
+-- months on startup; schedule `python backend/partitions.py maintain` monthly.
+DO $$
+DECLARE
+    m DATE;
+    t TEXT;
+BEGIN
+    FOR i IN 0..3 LOOP
+        m := date_trunc('month', CURRENT_DATE)::date + make_interval(months => i);
+        FOREACH t IN ARRAY ARRAY['predictions', 'symptom_logs'] LOOP
+            EXECUTE format('CREATE TABLE IF NOT EXISTS %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                           t || '_p' || to_char(m, 'YYYY_MM'), t, m, (m + interval '1 month')::date);
+        END LOOP;
+    END LOOP;
+END $$;
 
 -- ============================================
 -- Cycle Information Table
@@ -119,6 +160,68 @@ CREATE TABLE IF NOT EXISTS cycle_info (
 
 CREATE INDEX IF NOT EXISTS idx_cycle_info_user_id ON cycle_info(user_id);
 
+-- ============================================
+-- User Risk Summary Table (one row per user, kept current by the API)
+-- ============================================
+CREATE TABLE IF NOT EXISTS user_risk_summary (
+    user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    assessment_count INTEGER NOT NULL DEFAULT 0,
+    clinical_count INTEGER NOT NULL DEFAULT 0,
+    lifestyle_count INTEGER NOT NULL DEFAULT 0,
+    probability_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    latest_probability FLOAT,
+    latest_risk_level VARCHAR(50),
+    latest_prediction_type VARCHAR(50),
+    last_assessment_at TIMESTAMP,
+    last_symptom_log_date DATE,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- ============================================
+-- Score Jobs Table (background batch scoring of uploaded CSV files)
+-- ============================================
+CREATE TABLE IF NOT EXISTS score_jobs (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+    model_type VARCHAR(20) NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'queued',   -- queued, running, done, failed
+    input_path TEXT NOT NULL,
+    result_path TEXT NOT NULL,
+    id_column VARCHAR(255),
+    rows_total BIGINT,
+    rows_done BIGINT NOT NULL DEFAULT 0,
+    rows_unscored BIGINT NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMP,
+    finished_at TIMESTAMP
+);
+
+-- ============================================
+-- Prediction Scores Table (re-scores of stored predictions per model version,
+-- written by backend/rescore_predictions.py)
+-- ============================================
+CREATE TABLE IF NOT EXISTS prediction_scores (
+    prediction_id INTEGER NOT NULL,
+    model_version VARCHAR(64) NOT NULL REFERENCES model_versions(version),
+    probability FLOAT NOT NULL,
+    risk_level VARCHAR(50),
+    scored_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (model_version, prediction_id)
+);
+
+-- ============================================
+-- Prediction Labels Table (confirmed diagnoses sent to
+-- POST /predictions/<id>/feedback, read by backend/incremental_train.py)
+-- ============================================
+CREATE TABLE IF NOT EXISTS prediction_labels (
+    id BIGSERIAL PRIMARY KEY,
+    prediction_id INTEGER UNIQUE NOT NULL,
+    user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+    label SMALLINT NOT NULL CHECK (label IN (0, 1)),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
 -- ============================================
 -- Print Success Message
 -- ============================================
@@ -131,5 +234,11 @@ CREATE INDEX IF NOT EXISTS idx_cycle_info_user_id ON cycle_info(user_id);
 \echo '  - lifestyle_predictions (lifestyle assessment results)'
 \echo '  - predictions (clinical prediction results)'
 \echo '  - cycle_info (menstrual cycle information)'
+\echo '  - user_risk_summary (per-user dashboard summary)'
+\echo '  - model_versions (feature order of stored feature vectors)'
+\echo '  - prediction_inputs (deduplicated scored feature vectors)'
+\echo '  - score_jobs (background batch scoring jobs)'
+\echo '  - prediction_scores (re-scores per model version)'
+\echo '  - prediction_labels (confirmed diagnoses for predictions)'
 \echo ''
 \echo 'You can now start the backend server!'